@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import User, Profile, Achievement, News
+from .search import search_users
 
 
 class ProfileInline(admin.StackedInline):
@@ -29,9 +30,13 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('username', 'email', 'password1', 'password2', 'is_coach', 'is_student'),
         }),
     )
-    search_fields = ('username', 'first_name', 'last_name', 'email')
+    # Поле нужно, чтобы админка показала строку поиска; ищет get_search_results
+    search_fields = ('search_text',)
     ordering = ('username',)
 
+    def get_search_results(self, request, queryset, search_term):
+        return search_users(queryset, search_term), False
+
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
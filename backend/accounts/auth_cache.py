@@ -0,0 +1,98 @@
+"""
+Кэш пользователя запроса в памяти процесса (config.middleware.CachedAuthenticationMiddleware).
+
+Запись ищется по (id пользователя, хэш сессии, бэкенд) и действует AUTH_USER_CACHE_TTL
+секунд, но только пока совпадает версия пользователя в общем кэше Django. Любое
+сохранение/удаление User и изменение его групп и прав меняет версию — роли из
+кэша не бывают устаревшими. Изменения через QuerySet.update() версию не меняют:
+после них нужно вызвать bump_user_version().
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user, get_user_model
+from django.contrib.auth.models import Group as AuthGroup
+from django.core.cache import cache
+
+MAX_ENTRIES = 1000
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f'auth-user-version:{user_id}'
+
+
+def bump_user_version(*user_ids):
+    """Делает недействительными закэшированные копии пользователей во всех процессах."""
+    if not user_ids:
+        return
+    cache.set_many({_version_key(pk): uuid.uuid4().hex for pk in user_ids}, None)
+    forgotten = {str(pk) for pk in user_ids}
+    with _lock:
+        for key in [key for key in _entries if key[0] in forgotten]:
+            del _entries[key]
+
+
+def get_cached_user(request):
+    ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 0)
+    session = request.session
+    user_id = session.get(SESSION_KEY)
+    session_hash = session.get(HASH_SESSION_KEY)
+    if ttl <= 0 or user_id is None or session_hash is None:
+        return get_user(request)
+
+    key = (str(user_id), session_hash, session.get(BACKEND_SESSION_KEY))
+    version_key = _version_key(user_id)
+    version = cache.get(version_key)
+    now = time.monotonic()
+    if version is not None:
+        with _lock:
+            entry = _entries.get(key)
+        if entry is not None and entry[1] == version and entry[2] > now:
+            # Копия: атрибуты и кэш связей, навешенные за запрос, не попадают в общий объект
+            return copy.copy(entry[0])
+
+    # Полная проверка Django (в т.ч. хэша сессии после смены пароля)
+    user = get_user(request)
+    if not user.is_authenticated:
+        return user
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    with _lock:
+        _entries[key] = (user, version, now + ttl)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return copy.copy(user)
+
+
+def forget_cached_user(sender, instance, **kwargs):
+    """post_save/post_delete User."""
+    bump_user_version(instance.pk)
+
+
+def forget_cached_users_m2m(sender, instance, action, model, pk_set, **kwargs):
+    """m2m_changed для групп и прав пользователей и прав групп."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    User = get_user_model()
+    if isinstance(instance, User):
+        user_ids = [instance.pk]
+    elif model is User:
+        # Со стороны группы/права: pk_set — пользователи (при очистке берём всех)
+        user_ids = pk_set if pk_set is not None else instance.user_set.values_list('pk', flat=True)
+    else:
+        # Права группы: затронуты все её участники
+        if isinstance(instance, AuthGroup):
+            group_ids = [instance.pk]
+        else:
+            group_ids = pk_set if pk_set is not None else instance.group_set.values_list('pk', flat=True)
+        user_ids = User.objects.filter(groups__in=list(group_ids)).values_list('pk', flat=True).distinct()
+    bump_user_version(*user_ids)
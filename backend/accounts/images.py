@@ -0,0 +1,169 @@
+"""
+Уменьшенные копии загруженных изображений (WebP) для списков и карточек.
+
+После сохранения объекта с новым файлом задача уходит в пул потоков (после
+коммита транзакции), запрос не ждёт Pillow. Копии кладутся рядом с оригиналом
+в то же хранилище, их имена пишутся в JSON-поле модели:
+{'source': <имя оригинала>, '64': <имя копии>, ...}.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from config.media import forget_file_urls
+from .auth_cache import bump_user_version
+
+logger = logging.getLogger(__name__)
+
+# (модель, поле с файлом) -> (поле с копиями, размеры, обрезать ли до квадрата)
+VARIANT_SPECS = {
+    ('accounts.User', 'avatar'): ('avatar_variants', (64, 256), True),
+    ('accounts.Achievement', 'image'): ('image_variants', (256, 1024), False),
+}
+WEBP_QUALITY = 80
+
+
+def _update_variants(model, pk, variants_field, variants, **filters):
+    """UPDATE поля с копиями в обход save(); закэшированный пользователь запроса сбрасывается."""
+    updated = model._base_manager.filter(pk=pk, **filters).update(**{variants_field: variants})
+    if updated and model._meta.label == 'accounts.User':
+        bump_user_version(pk)
+    return updated
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-variants')
+    return _executor
+
+
+def _spec(instance, field_name):
+    return VARIANT_SPECS[(instance._meta.label, field_name)]
+
+
+def variant_files(instance, field_name):
+    """Готовые копии текущего файла: {'64': FieldFile, ...}; пусто, пока не сгенерированы."""
+    variants_field, _, _ = _spec(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    source = getattr(instance, field_name)
+    if not source or variants.get('source') != source.name:
+        return {}
+    field = instance._meta.get_field(field_name)
+    return {
+        size: field.attr_class(instance, field, name)
+        for size, name in variants.items()
+        if size != 'source'
+    }
+
+
+def render_variant(image, size, crop):
+    from PIL import ImageOps
+
+    if crop:
+        variant = ImageOps.fit(image, (size, size))
+    else:
+        variant = image.copy()
+        variant.thumbnail((size, size))
+    buffer = io.BytesIO()
+    variant.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+    return buffer.getvalue()
+
+
+def generate_variants(model_label, pk, field_name):
+    """Строит копии для текущего файла объекта и сохраняет их имена. Старые копии удаляет."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    model = apps.get_model(model_label)
+    variants_field, sizes, crop = VARIANT_SPECS[(model_label, field_name)]
+    instance = model._base_manager.filter(pk=pk).only(field_name, variants_field).first()
+    if instance is None:
+        return
+    source = getattr(instance, field_name)
+    previous = getattr(instance, variants_field) or {}
+    if not source or previous.get('source') == source.name:
+        return
+
+    storage = source.storage
+    try:
+        with storage.open(source.name, 'rb') as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Не удалось открыть изображение %s для копий', source.name)
+        return
+
+    stem, _ = os.path.splitext(source.name)
+    head, tail = os.path.split(stem)
+    variants = {'source': source.name}
+    for size in sizes:
+        name = os.path.join(head, 'variants', f'{tail}_{size}.webp')
+        variants[str(size)] = storage.save(name, ContentFile(render_variant(image, size, crop)))
+
+    # Файл могли заменить, пока мы работали: пишем, только если оригинал тот же
+    updated = _update_variants(model, pk, variants_field, variants, **{field_name: source.name})
+    stale = previous if updated else variants
+    delete_variant_files(storage, stale)
+
+
+def delete_variant_files(storage, variants):
+    names = [name for key, name in variants.items() if key != 'source' and name]
+    for name in names:
+        storage.delete(name)
+    forget_file_urls(names)
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка обработки изображения: %s%s', func.__name__, args)
+    finally:
+        # Поток пула держит своё соединение с БД — закрываем, чтобы не копились
+        connections.close_all()
+
+
+def _submit(func, *args):
+    if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        _get_executor().submit(_run, func, *args)
+    else:
+        func(*args)
+
+
+def schedule_variants(sender, instance, raw=False, **kwargs):
+    """post_save: если файл новый, после коммита строит копии в фоне."""
+    if raw:
+        return
+    for (label, field_name), (variants_field, _, _) in VARIANT_SPECS.items():
+        if label != sender._meta.label:
+            continue
+        source = getattr(instance, field_name)
+        variants = getattr(instance, variants_field) or {}
+        if source and variants.get('source') != source.name:
+            transaction.on_commit(
+                lambda m=label, f=field_name: _submit(generate_variants, m, instance.pk, f)
+            )
+        elif not source and variants:
+            # Файл убрали — копии больше не нужны
+            storage = instance._meta.get_field(field_name).storage
+            _update_variants(type(instance), instance.pk, variants_field, {})
+            setattr(instance, variants_field, {})
+            transaction.on_commit(lambda v=variants, s=storage: _submit(delete_variant_files, s, v))
+
+
+def drop_variants(sender, instance, **kwargs):
+    """post_delete: удаляет копии вместе с объектом."""
+    for (label, field_name), (variants_field, _, _) in VARIANT_SPECS.items():
+        variants = getattr(instance, variants_field, None) if label == sender._meta.label else None
+        if variants:
+            storage = instance._meta.get_field(field_name).storage
+            transaction.on_commit(lambda v=variants, s=storage: _submit(delete_variant_files, s, v))
@@ -0,0 +1,228 @@
+"""
+Массовый импорт учеников из CSV/XLSX.
+
+Строки проверяются целиком до записи, пароли хэшируются (в management-команде —
+в пуле процессов: PBKDF2 упирается в CPU и GIL), затем пользователи, профили и
+членство в группах создаются bulk_create в одной транзакции. Строки с ошибками
+пропускаются и попадают в отчёт с номером строки файла.
+"""
+import csv
+import io
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from config.xlsx import XlsxError, read_xlsx
+from .models import Profile
+from .password_pool import hash_passwords
+from .search import SEARCH_TEXT_FIELDS, normalize_search_text
+
+User = get_user_model()
+
+MAX_IMPORT_ROWS = 5000
+MIN_PASSWORD_LENGTH = 6
+
+# Заголовок столбца (в нижнем регистре) -> поле
+COLUMN_ALIASES = {
+    'username': 'username', 'логин': 'username',
+    'password': 'password', 'пароль': 'password',
+    'email': 'email', 'почта': 'email',
+    'last_name': 'last_name', 'фамилия': 'last_name',
+    'first_name': 'first_name', 'имя': 'first_name',
+    'patronymic': 'patronymic', 'отчество': 'patronymic',
+    'date_of_birth': 'date_of_birth', 'дата рождения': 'date_of_birth',
+    'phone': 'phone', 'телефон': 'phone',
+    'group': 'group', 'группа': 'group',
+    'parent_name': 'parent_name', 'имя родителя': 'parent_name', 'родитель': 'parent_name',
+    'parent_phone': 'parent_phone', 'телефон родителя': 'parent_phone',
+    'grade': 'grade', 'разряд': 'grade', 'разряд/кю/дан': 'grade',
+}
+REQUIRED_COLUMNS = ('username', 'first_name', 'last_name')
+PROFILE_FIELDS = ('parent_name', 'parent_phone', 'grade')
+EXCEL_EPOCH = date(1899, 12, 30)
+# Серийный номер 31.12.9999 — последней даты, которую понимает Excel
+MAX_EXCEL_SERIAL = (date(9999, 12, 31) - EXCEL_EPOCH).days
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def read_rows(fileobj, filename):
+    """Строки файла как списки значений; формат — по расширению."""
+    if filename.lower().endswith('.xlsx'):
+        try:
+            return list(read_xlsx(fileobj))
+        except XlsxError as exc:
+            raise ImportFileError(str(exc))
+    try:
+        text = fileobj.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ImportFileError('CSV должен быть в кодировке UTF-8.')
+    first_line = text.split('\n', 1)[0]
+    delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+    return list(csv.reader(io.StringIO(text), delimiter=delimiter))
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Телефоны и номера групп из XLSX приходят числами
+        return str(int(value))
+    return str(value).strip()
+
+
+def _parse_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, float):
+        # NaN и бесконечность не проходят сравнение и тоже отбрасываются
+        if not 1 <= value <= MAX_EXCEL_SERIAL:
+            raise ValueError
+        return EXCEL_EPOCH + timedelta(days=int(value))
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            pass
+    raise ValueError
+
+
+def _resolve_groups(values):
+    from trainings.models import Group
+
+    ids = {int(value) for value in values if value.isdigit()}
+    names = {value for value in values if value and not value.isdigit()}
+    groups = {}
+    for group in Group.objects.filter(pk__in=ids):
+        groups[str(group.pk)] = group
+    for group in Group.objects.filter(name__in=names):
+        groups.setdefault(group.name, group)
+    return groups
+
+
+def import_students(rows, default_group=None, dry_run=False, workers=1):
+    """
+    rows — строки файла, первая строка — заголовок.
+    Возвращает отчёт: {'created', 'errors': [{'row', 'errors'}], 'dry_run'}.
+    """
+    from trainings.models import Group, GroupStudent, memberships_changed
+
+    rows = list(rows)
+    if not rows:
+        raise ImportFileError('Файл пуст.')
+    header = [COLUMN_ALIASES.get(_text(title).lower()) for title in rows[0]]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFileError(f'Нет обязательных столбцов: {", ".join(missing)}.')
+    if len(rows) - 1 > MAX_IMPORT_ROWS:
+        raise ImportFileError(f'Не больше {MAX_IMPORT_ROWS} строк за один импорт.')
+
+    records = []
+    for number, row in enumerate(rows[1:], start=2):
+        record = {'row': number}
+        for column, value in zip(header, row):
+            if column:
+                record[column] = value if column == 'date_of_birth' else _text(value)
+        if any(record.get(column) for column in COLUMN_ALIASES.values()):
+            records.append(record)
+
+    usernames = [record.get('username', '') for record in records]
+    emails = [record.get('email', '').lower() for record in records if record.get('email')]
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    taken_emails = set(
+        User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+        .values_list('email_lower', flat=True)
+    )
+    groups = _resolve_groups({record.get('group', '') for record in records})
+
+    username_validator = UnicodeUsernameValidator()
+    seen_usernames, seen_emails = set(), set()
+    valid, errors = [], []
+    for record in records:
+        problems = []
+        for column in REQUIRED_COLUMNS:
+            if not record.get(column):
+                problems.append(f'Не заполнено поле {column}.')
+        username = record.get('username', '')
+        if username:
+            try:
+                username_validator(username)
+            except ValidationError:
+                problems.append('Логин может содержать только буквы, цифры и символы @/./+/-/_.')
+            if username in taken_usernames:
+                problems.append(f'Пользователь {username} уже существует.')
+            elif username in seen_usernames:
+                problems.append(f'Логин {username} повторяется в файле.')
+            seen_usernames.add(username)
+        email = record.get('email', '').lower()
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                problems.append('Некорректный email.')
+            if email in taken_emails:
+                problems.append('Пользователь с таким email уже существует.')
+            elif email in seen_emails:
+                problems.append('Email повторяется в файле.')
+            seen_emails.add(email)
+        password = record.get('password', '')
+        if password and len(password) < MIN_PASSWORD_LENGTH:
+            problems.append(f'Пароль короче {MIN_PASSWORD_LENGTH} символов.')
+        try:
+            record['date_of_birth'] = _parse_date(record.get('date_of_birth'))
+        except ValueError:
+            problems.append('Дата рождения должна быть в формате ГГГГ-ММ-ДД или ДД.ММ.ГГГГ.')
+        group_key = record.get('group', '')
+        record['group'] = groups.get(group_key) if group_key else default_group
+        if group_key and record['group'] is None:
+            problems.append(f'Группа «{group_key}» не найдена.')
+
+        if problems:
+            errors.append({'row': record['row'], 'errors': problems})
+        else:
+            valid.append(record)
+
+    report = {'created': len(valid), 'errors': errors, 'dry_run': dry_run}
+    if dry_run or not valid:
+        return report
+
+    hashes = hash_passwords([record.get('password', '') for record in valid], workers=workers)
+    users = []
+    for record, password_hash in zip(valid, hashes):
+        user = User(
+            username=record['username'],
+            password=password_hash,
+            email=record.get('email', ''),
+            first_name=record['first_name'],
+            last_name=record['last_name'],
+            patronymic=record.get('patronymic', ''),
+            phone=record.get('phone') or None,
+            date_of_birth=record['date_of_birth'],
+            is_student=True,
+        )
+        # bulk_create не вызывает save(): поисковую строку заполняем сами
+        user.search_text = normalize_search_text(*(getattr(user, field) for field in SEARCH_TEXT_FIELDS))
+        users.append(user)
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=500)
+        Profile.objects.bulk_create([
+            Profile(user=user, **{field: record.get(field, '') for field in PROFILE_FIELDS})
+            for user, record in zip(users, valid)
+        ], batch_size=500)
+        memberships = [
+            GroupStudent(group=record['group'], student=user)
+            for user, record in zip(users, valid)
+            if record['group'] is not None
+        ]
+        GroupStudent.objects.bulk_create(memberships, batch_size=500)
+        Group.refresh_student_counts({membership.group_id for membership in memberships})
+        memberships_changed.send(sender=GroupStudent, student_ids=[membership.student_id for membership in memberships])
+    return report
@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from accounts.images import VARIANT_SPECS, generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные WebP-копии для уже загруженных аватаров и изображений достижений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать копии, даже если они уже есть')
+
+    def handle(self, *args, **options):
+        for (label, field_name), (variants_field, _, _) in VARIANT_SPECS.items():
+            model = apps.get_model(label)
+            objects = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            if options['force']:
+                objects.update(**{variants_field: {}})
+            processed = 0
+            for pk in objects.values_list('pk', flat=True).iterator():
+                generate_variants(label, pk, field_name)
+                processed += 1
+            self.stdout.write(self.style.SUCCESS(f'{label}.{field_name}: обработано {processed}'))
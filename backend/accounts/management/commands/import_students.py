@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importing import ImportFileError, import_students, read_rows
+from accounts.password_pool import default_workers
+from trainings.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовый импорт учеников из CSV/XLSX: логин, пароль, фамилия, имя, отчество, email, '
+        'дата рождения, телефон, группа (id или название), имя и телефон родителя, разряд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .xlsx')
+        parser.add_argument('--group', type=int, help='Группа для строк без столбца «группа»')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл, ничего не создавать')
+        parser.add_argument('--workers', type=int, help='Процессов для хэширования паролей (по умолчанию — по числу CPU)')
+
+    def handle(self, *args, **options):
+        default_group = None
+        if options['group']:
+            default_group = Group.objects.filter(pk=options['group']).first()
+            if default_group is None:
+                raise CommandError(f'Группа {options["group"]} не найдена')
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                rows = read_rows(fileobj, options['path'])
+            report = import_students(rows, default_group=default_group, dry_run=options['dry_run'],
+                                     workers=options['workers'] or default_workers())
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["row"]}: {" ".join(error["errors"])}')
+        verb = 'Будет создано' if report['dry_run'] else 'Создано'
+        self.stdout.write(self.style.SUCCESS(f'{verb} учеников: {report["created"]}, строк с ошибками: {len(report["errors"])}'))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+from accounts.search import SEARCH_TEXT_FIELDS, normalize_search_text
+
+
+def fill_search_text(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    users = list(User.objects.only('pk', *SEARCH_TEXT_FIELDS))
+    for user in users:
+        user.search_text = normalize_search_text(*(getattr(user, field) for field in SEARCH_TEXT_FIELDS))
+    User.objects.bulk_update(users, ['search_text'], batch_size=1000)
+
+
+# Триграммный GIN-индекс: LIKE '%...%' и <% идут по индексу. На SQLite вместо
+# него FTS5-таблица, её создаёт accounts.search.install_sqlite_fts после migrate.
+ADD_TRGM_INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+    "CREATE INDEX IF NOT EXISTS accounts_user_search_trgm ON accounts_user USING gin (search_text gin_trgm_ops);",
+]
+
+DROP_TRGM_INDEX_SQL = "DROP INDEX IF EXISTS accounts_user_search_trgm;"
+
+
+def add_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in ADD_TRGM_INDEX_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRGM_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_achievement_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(add_trgm_index, drop_trgm_index),
+    ]
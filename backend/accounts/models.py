@@ -1,24 +1,37 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group as AuthGroup
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 from datetime import date
 
+from config.dirty_fields import DirtyFieldsMixin
+from config.media import forget_deleted_file_urls, forget_replaced_file_urls
+from .auth_cache import forget_cached_user, forget_cached_users_m2m
+from .images import drop_variants, schedule_variants
+from .news_feed import forget_feed, forget_feed_on_author_rename
+from .search import SEARCH_TEXT_FIELDS, normalize_search_text
 
-def age_from_birth(birth_date):
+
+def age_from_birth(birth_date, today=None):
+    """Полных лет на дату today (по умолчанию — на сегодня)."""
     if not birth_date:
         return None
-    today = date.today()
+    today = today or date.today()
     return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
 
 
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     patronymic = models.CharField('Отчество', max_length=150, blank=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     is_coach = models.BooleanField(default=False)
     is_student = models.BooleanField(default=True)
     date_of_birth = models.DateField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Уменьшенные WebP-копии аватара (accounts.images)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # ФИО, логин и email в одной строке для поиска (accounts.search)
+    search_text = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         verbose_name = 'Пользователь'
@@ -34,10 +47,18 @@ class User(AbstractUser):
     def save(self, *args, **kwargs):
         if self.is_staff:
             self.is_coach = True
+        self.search_text = normalize_search_text(*(getattr(self, field) for field in SEARCH_TEXT_FIELDS))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(SEARCH_TEXT_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
         super().save(*args, **kwargs)
+        # Профиль сохраняется вместе с пользователем, только если он уже загружен и изменён
+        # (раньше post_save на каждое сохранение, в т.ч. last_login при входе, делал SELECT и UPDATE профиля)
+        if User.profile.is_cached(self) and self.profile.is_dirty():
+            self.profile.save()
 
 
-class Profile(models.Model):
+class Profile(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     
     bio = models.TextField('Биография', max_length=1000, blank=True)
@@ -65,12 +86,13 @@ class Profile(models.Model):
         return f"Профиль {self.user.first_name} {self.user.last_name}"
 
 
-class Achievement(models.Model):
+class Achievement(DirtyFieldsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='achievements')
     title = models.CharField(max_length=255)
     description = models.TextField()
     date = models.DateField()
     image = models.ImageField(upload_to='achievements/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     class Meta:
         verbose_name = 'Достижение'
@@ -80,7 +102,7 @@ class Achievement(models.Model):
         return self.title
 
 
-class News(models.Model):
+class News(DirtyFieldsMixin, models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     content = models.TextField()
@@ -101,7 +123,24 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+
+# Подписанные URL файлов кэшируются (config.media) — сбрасываем их при замене и удалении
+for _model in (User, Achievement, News):
+    pre_save.connect(forget_replaced_file_urls, sender=_model)
+    post_delete.connect(forget_deleted_file_urls, sender=_model)
+
+# Кэш ленты новостей (accounts.news_feed) сбрасывается при изменении новостей и имён авторов
+post_save.connect(forget_feed, sender=News)
+post_delete.connect(forget_feed, sender=News)
+post_save.connect(forget_feed_on_author_rename, sender=User)
+
+# Уменьшенные копии аватаров и изображений достижений строятся в фоне
+for _model in (User, Achievement):
+    post_save.connect(schedule_variants, sender=_model)
+    post_delete.connect(drop_variants, sender=_model)
+
+# Пользователь запроса кэшируется (accounts.auth_cache) — сбрасываем при изменении ролей и прав
+post_save.connect(forget_cached_user, sender=User)
+post_delete.connect(forget_cached_user, sender=User)
+for _through in (User.groups.through, User.user_permissions.through, AuthGroup.permissions.through):
+    m2m_changed.connect(forget_cached_users_m2m, sender=_through)
@@ -0,0 +1,85 @@
+"""
+Кэш ленты новостей (NewsViewSet.list).
+
+Лента одна для всех пользователей, поэтому готовые данные ответа кэшируются в
+общем кэше по версии ленты и URL запроса. Версия — случайный токен и время
+последнего изменения; она меняется при создании, изменении и удалении новости и
+при смене имени автора. Из версии получаются ETag и Last-Modified, и повторный
+запрос с If-None-Match/If-Modified-Since получает 304 без обращения к БД.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+STATE_KEY = 'news-feed-state'
+AUTHOR_NAME_FIELDS = {'first_name', 'last_name'}
+
+
+def feed_cache_ttl():
+    return getattr(settings, 'NEWS_FEED_CACHE_TTL', 0)
+
+
+def feed_state():
+    """(токен версии, время изменения в секундах)."""
+    state = cache.get(STATE_KEY)
+    if state is None:
+        # Версия потерялась (очистка кэша) — начинаем новую от текущего момента
+        cache.add(STATE_KEY, (uuid.uuid4().hex, int(time.time())), None)
+        state = cache.get(STATE_KEY)
+    return state
+
+
+def bump_feed_version():
+    previous = cache.get(STATE_KEY)
+    modified = int(time.time())
+    if previous is not None:
+        # Last-Modified с точностью до секунды: два изменения за секунду не должны совпасть
+        modified = max(modified, previous[1] + 1)
+    cache.set(STATE_KEY, (uuid.uuid4().hex, modified), None)
+
+
+def _request_digest(request):
+    # next-ссылки абсолютные — в ключ входит и хост, и параметры запроса
+    return hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+
+
+def feed_etag(state, request):
+    return f'"{state[0]}-{_request_digest(request)[:12]}"'
+
+
+def _data_key(state, request):
+    return f'news-feed:{state[0]}:{_request_digest(request)}'
+
+
+def get_cached_feed(state, request):
+    return cache.get(_data_key(state, request))
+
+
+def set_cached_feed(state, request, data):
+    cache.set(_data_key(state, request), data, feed_cache_ttl())
+
+
+def _bump_after_commit():
+    # Сбрасываем после коммита: иначе параллельный запрос закэширует старые данные под новой версией
+    if feed_cache_ttl() > 0:
+        transaction.on_commit(bump_feed_version)
+
+
+def forget_feed(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete News."""
+    if not raw:
+        _bump_after_commit()
+
+
+def forget_feed_on_author_rename(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    """post_save User: в ленте показывается имя автора."""
+    if raw or created or feed_cache_ttl() <= 0:
+        return
+    if update_fields is not None and not AUTHOR_NAME_FIELDS & set(update_fields):
+        return
+    if instance.news_set.exists():
+        _bump_after_commit()
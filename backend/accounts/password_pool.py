@@ -0,0 +1,37 @@
+"""
+Хэширование паролей для массового импорта (accounts.importing).
+
+Пул процессов запускается только вне веб-воркера (management-команда) и через
+spawn, а не fork: дочерние процессы — новые интерпретаторы, они не наследуют
+соединения с БД (дескрипторы закрываются при exec), блокировки и потоки родителя.
+
+Модуль не импортирует модели: дочерний процесс загружает его до django.setup().
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Меньше стольких паролей хэшируем в текущем процессе: запуск пула дороже
+POOL_THRESHOLD = 20
+
+
+def default_workers():
+    return min(os.cpu_count() or 1, 8)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=1):
+    """make_password для списка паролей; пустой пароль — непригодный для входа. workers > 1 — пул процессов."""
+    from django.contrib.auth.hashers import make_password
+
+    passwords = [password or None for password in passwords]
+    if workers <= 1 or len(passwords) < POOL_THRESHOLD:
+        return [make_password(password) for password in passwords]
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as executor:
+        chunksize = max(len(passwords) // (workers * 4), 1)
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
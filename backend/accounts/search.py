@@ -0,0 +1,140 @@
+"""
+Поиск пользователей по одной нормализованной колонке User.search_text.
+
+PostgreSQL: GIN-индекс pg_trgm (LIKE и оператор <% идут по индексу),
+ранжирование по word_similarity — находит и опечатки.
+SQLite: теневая FTS5-таблица accounts_user_fts на триггерах, префиксный
+поиск "термин"* и ранжирование bm25.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+SEARCH_TEXT_FIELDS = ('last_name', 'first_name', 'patronymic', 'username', 'email')
+MAX_SEARCH_TERMS = 5
+MAX_TERM_LENGTH = 50
+
+FTS_TABLE = 'accounts_user_fts'
+
+
+# Теневая таблица с внешним содержимым: хранит только индекс, текст берёт из accounts_user.
+# Создаётся после каждого migrate (IF NOT EXISTS): SQLite пересоздаёт accounts_user
+# при части миграций, и триггеры старой таблицы при этом пропадают.
+SQLITE_FTS_SQL = [
+    # remove_diacritics 0: иначе «й» превращается в «и»
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        search_text, content='accounts_user', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 0'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON accounts_user BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON accounts_user BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON accounts_user BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def install_sqlite_fts(using='default', **kwargs):
+    """Обработчик post_migrate: FTS5-индекс и триггеры для SQLite."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        # migrate до 0008_user_search_text: колонки ещё нет, индекс создастся позже
+        if 'accounts_user' not in connection.introspection.table_names(cursor):
+            return
+        columns = connection.introspection.get_table_description(cursor, 'accounts_user')
+        if 'search_text' not in {column.name for column in columns}:
+            return
+        for sql in SQLITE_FTS_SQL:
+            cursor.execute(sql)
+
+
+def normalize_search_text(*parts):
+    """Нижний регистр (в т.ч. кириллица) и ё → е."""
+    return ' '.join(str(part) for part in parts if part).lower().replace('ё', 'е')
+
+
+def search_terms(query):
+    return [term[:MAX_TERM_LENGTH] for term in re.findall(r'\w+', normalize_search_text(query))][:MAX_SEARCH_TERMS]
+
+
+class WordSimilarity(Func):
+    function = 'word_similarity'
+    output_field = FloatField()
+
+
+class WordSimilar(Func):
+    """term <% search_text: word_similarity выше pg_trgm.word_similarity_threshold."""
+    template = '%(expressions)s'
+    arg_joiner = ' <%% '
+    output_field = BooleanField()
+
+
+def _postgresql_search(queryset, terms):
+    rank = None
+    for term in terms:
+        queryset = queryset.filter(
+            Q(search_text__contains=term) | Q(WordSimilar(Value(term), 'search_text'))
+        )
+        similarity = WordSimilarity(Value(term), 'search_text')
+        rank = similarity if rank is None else rank + similarity
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', 'last_name', 'first_name', 'pk')
+
+
+def _sqlite_search(queryset, terms):
+    match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    table = queryset.model._meta.db_table
+    matched = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    # bm25 тем меньше, чем лучше совпадение; меняем знак, чтобы сортировать как на PostgreSQL
+    rank = RawSQL(
+        f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+        [match],
+        output_field=FloatField(),
+    )
+    return (
+        queryset.filter(pk__in=matched)
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', 'last_name', 'first_name', 'pk')
+    )
+
+
+def search_users(queryset, query):
+    """Фильтрует и ранжирует queryset пользователей по строке поиска."""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        return _postgresql_search(queryset, terms)
+    if vendor == 'sqlite':
+        return _sqlite_search(queryset, terms)
+    for term in terms:
+        queryset = queryset.filter(search_text__contains=term)
+    return queryset
+
+
+class UserSearchFilter(filters.SearchFilter):
+    """?search= для пользователей через индексированный search_users вместо OR из icontains."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return search_users(queryset, query)
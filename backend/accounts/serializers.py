@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 import re
+from config.fieldsets import SparseFieldsetMixin
+from config.media import file_url
+from .images import variant_files
 from .models import User, Profile, Achievement, News
 
 User = get_user_model()
@@ -10,7 +13,7 @@ def build_file_url(file_field, request=None):
     if not file_field:
         return None
     try:
-        url = file_field.url
+        url = file_url(file_field)
     except Exception:
         return None
 
@@ -19,17 +22,45 @@ def build_file_url(file_field, request=None):
     return url
 
 
-class UserSerializer(serializers.ModelSerializer):
+class CachedImageField(serializers.ImageField):
+    """ImageField, который отдаёт URL через build_file_url (кэш подписанных ссылок)."""
+
+    def to_representation(self, value):
+        return build_file_url(value, self.context.get('request'))
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URL уменьшенных копий файла: {'64': url, '256': url}; пусто, пока копии не готовы."""
+
+    def __init__(self, file_field_name, **kwargs):
+        self.file_field_name = file_field_name
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        return {
+            size: build_file_url(variant, request)
+            for size, variant in variant_files(instance, self.file_field_name).items()
+        }
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False, min_length=6, allow_blank=False)
     age = serializers.IntegerField(read_only=True)
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar = CachedImageField(required=False, allow_null=True)
+    avatar_variants = ImageVariantsField('avatar')
     
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'patronymic',
                  'phone', 'is_coach', 'is_student', 'is_staff',
-                 'date_of_birth', 'age', 'avatar', 'is_active', 'password']
+                 'date_of_birth', 'age', 'avatar', 'avatar_variants', 'is_active', 'password']
         read_only_fields = ['id', 'is_active']
+        field_dependencies = {
+            'age': ['date_of_birth'],
+            'avatar_variants': ['avatar', 'avatar_variants'],
+        }
         extra_kwargs = {
             'password': {'write_only': True, 'min_length': 6},
             'username': {'required': True},
@@ -38,12 +69,6 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name': {'required': True},
         }
     
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        if instance.avatar:
-            representation['avatar'] = build_file_url(instance.avatar, self.context.get('request'))
-        return representation
-    
     def validate_email(self, value):
         if value and User.objects.filter(email=value).exclude(pk=self.instance.pk if self.instance else None).exists():
             raise serializers.ValidationError('Пользователь с таким email уже существует.')
@@ -79,7 +104,7 @@ class UserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -89,24 +114,18 @@ class ProfileSerializer(serializers.ModelSerializer):
                  'competitions_participated', 'competitions_won',
                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
-    
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        # Убеждаемся, что вложенный UserSerializer получает контекст
-        if 'user' in representation and isinstance(representation['user'], dict):
-            user_serializer = UserSerializer(instance.user, context=self.context)
-            representation['user'] = user_serializer.data
-        return representation
 
 
-class AchievementSerializer(serializers.ModelSerializer):
+class AchievementSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
-    image = serializers.ImageField(required=False, allow_null=True)
+    image = CachedImageField(required=False, allow_null=True)
+    image_variants = ImageVariantsField('image')
     
     class Meta:
         model = Achievement
-        fields = ['id', 'user', 'user_name', 'title', 'description', 'date', 'image']
+        fields = ['id', 'user', 'user_name', 'title', 'description', 'date', 'image', 'image_variants']
         read_only_fields = ['id']
+        field_dependencies = {'image_variants': ['image', 'image_variants']}
     
     def update(self, instance, validated_data):
         # Обработка удаления изображения
@@ -118,16 +137,11 @@ class AchievementSerializer(serializers.ModelSerializer):
                     instance.image.delete(save=False)
                 validated_data['image'] = None
         return super().update(instance, validated_data)
-    
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        if instance.image:
-            representation['image'] = build_file_url(instance.image, self.context.get('request'))
-        return representation
 
 
-class NewsSerializer(serializers.ModelSerializer):
+class NewsSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.get_full_name', read_only=True)
+    image = CachedImageField(required=False, allow_null=True)
     
     class Meta:
         model = News
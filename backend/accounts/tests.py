@@ -0,0 +1,474 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import Group as AuthGroup
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from accounts import auth_cache
+from accounts.images import generate_variants
+from accounts.password_pool import hash_passwords
+from accounts.models import Achievement, News, Profile, User
+from config.media import _cache_key, file_url
+from config.testing import ApiTestCase
+from config.xlsx import XlsxError, read_xlsx, stream_xlsx
+from trainings.models import Group, GroupStudent
+
+
+class StudentImportTests(ApiTestCase):
+    url = '/api/auth/users/import/'
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='admin', password=self.password)
+
+    def upload(self, content, name='students.csv', **data):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(self.url, {'file': upload, **data}, format='multipart')
+
+    def test_csv_import_reports_bad_rows(self):
+        content = (
+            'логин;пароль;фамилия;имя;дата рождения;группа\n'
+            f'new1;secret1;Сидоров;Пётр;01.02.2015;{self.group.name}\n'
+            'new2;;Кузнецова;Анна;2014-03-04;\n'
+            'student0;secret1;Петров;Иван;;\n'
+            'new3;123;Иванов;;31.31.2015;Нет такой\n'
+        )
+        response = self.upload(content, group=self.group.pk)
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [4, 5])
+        self.assertEqual(len(report['errors'][1]['errors']), 4)
+
+        created = User.objects.get(username='new1')
+        self.assertTrue(created.is_student)
+        self.assertTrue(created.check_password('secret1'))
+        self.assertFalse(User.objects.get(username='new2').has_usable_password())
+        self.assertEqual(GroupStudent.objects.filter(group=self.group, is_active=True).count(), 7)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.active_student_count, 7)
+
+    def test_xlsx_date_serials_out_of_range_are_row_errors(self):
+        serials = [1e12, float('inf'), float('nan'), -5.0, 0.0, 42005.0]
+        rows = [['username', 'first_name', 'last_name', 'date_of_birth']] + [
+            [f'new{index}', 'Пётр', 'Сидоров', serial] for index, serial in enumerate(serials)
+        ]
+        upload = SimpleUploadedFile('students.xlsx', b''.join(stream_xlsx(rows)))
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3, 4, 5, 6])
+        self.assertTrue(all('Дата рождения' in error['errors'][0] for error in report['errors']))
+        self.assertEqual(User.objects.get(username='new5').date_of_birth, date(2015, 1, 1))
+
+    def test_dry_run_creates_nothing(self):
+        response = self.upload('username,first_name,last_name\nnew1,Пётр,Сидоров\n', dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertFalse(User.objects.filter(username='new1').exists())
+
+    def test_missing_columns(self):
+        response = self.upload('username,first_name\nnew1,Пётр\n')
+        self.assertEqual(response.status_code, 400)
+
+    def test_coach_cannot_import(self):
+        client = self.client_for(self.coach)
+        upload = SimpleUploadedFile('students.csv', b'username,first_name,last_name\n')
+        self.assertEqual(client.post(self.url, {'file': upload}, format='multipart').status_code, 403)
+
+
+class PasswordHashingTests(ApiTestCase):
+    def test_process_pool_matches_inline_hashing(self):
+        passwords = [f'secret{index}' for index in range(25)] + ['']
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertTrue(all(check_password(password, hashed) for password, hashed in zip(passwords[:-1], hashes)))
+        self.assertFalse(check_password('', hashes[-1]))
+
+
+def workbook_with_sheet(sheet_xml, shared_strings=None):
+    """Книга из stream_xlsx с подменённым листом (и общими строками)."""
+    original = zipfile.ZipFile(io.BytesIO(b''.join(stream_xlsx([['x']]))))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in original.namelist():
+            if name.endswith('worksheets/sheet1.xml'):
+                archive.writestr(name, sheet_xml)
+            else:
+                archive.writestr(name, original.read(name))
+        if shared_strings is not None:
+            archive.writestr('xl/sharedStrings.xml', shared_strings)
+    buffer.seek(0)
+    return buffer
+
+
+def sheet(cells):
+    return (
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        f'<row r="1">{cells}</row></sheetData></worksheet>'
+    )
+
+
+class XlsxReaderTests(ApiTestCase):
+    def test_round_trip(self):
+        rows = [['username', 'first_name', 'age'], ['ivan', 'Иван', 12], ['anna', None, 10.5]]
+        data = list(read_xlsx(io.BytesIO(b''.join(stream_xlsx(rows)))))
+        self.assertEqual(data, [['username', 'first_name', 'age'], ['ivan', 'Иван', 12.0], ['anna', None, 10.5]])
+
+    def test_malformed_cells_are_validation_errors(self):
+        shared = (
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<si><t>a</t></si></sst>'
+        )
+        cases = [
+            ('<c r="B1" t="s"><v>7</v></c>', 'B1'),
+            ('<c r="C1" t="s"><v>-1</v></c>', 'C1'),
+            ('<c r="A1" t="s"><v>x</v></c>', 'A1'),
+            ('<c r="D1"><v>12abc</v></c>', 'D1'),
+            ('<c r="ZZZZZZ1"><v>1</v></c>', 'ZZZZZZ1'),
+        ]
+        for cells, ref in cases:
+            with self.subTest(ref=ref), self.assertRaisesMessage(XlsxError, ref):
+                list(read_xlsx(workbook_with_sheet(sheet(cells), shared)))
+
+    def test_broken_xml(self):
+        with self.assertRaises(XlsxError):
+            list(read_xlsx(workbook_with_sheet('<worksheet><sheetData><row>')))
+
+    def test_upload_of_malformed_workbook_is_400(self):
+        self.client.login(username='admin', password=self.password)
+        upload = SimpleUploadedFile(
+            'students.xlsx', workbook_with_sheet(sheet('<c r="A1"><v>nope</v></c>')).getvalue()
+        )
+        response = self.client.post('/api/auth/users/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('A1', response.json()['detail'])
+
+
+@override_settings(MEDIA_URL_CACHE_TTL=600)
+class MediaUrlCacheTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.achievement = Achievement.objects.create(
+            user=self.students[0], title='Кубок', description='', date=date(2026, 5, 1), image='achievements/a.png'
+        )
+
+    def test_url_is_cached_by_storage_name(self):
+        url = file_url(self.achievement.image)
+        self.assertEqual(cache.get(_cache_key('achievements/a.png')), url)
+
+    def test_replaced_file_is_forgotten_without_select(self):
+        achievement = Achievement.objects.get(pk=self.achievement.pk)
+        file_url(achievement.image)
+        achievement.image = 'achievements/b.png'
+        with self.assertNumQueries(1):
+            achievement.save()
+        self.assertIsNone(cache.get(_cache_key('achievements/a.png')))
+
+    def test_unchanged_file_stays_cached(self):
+        achievement = Achievement.objects.get(pk=self.achievement.pk)
+        url = file_url(achievement.image)
+        achievement.title = 'Кубок города'
+        with self.assertNumQueries(1):
+            achievement.save()
+        self.assertEqual(cache.get(_cache_key('achievements/a.png')), url)
+
+    def test_instance_without_snapshot_reads_old_name(self):
+        file_url(self.achievement.image)
+        detached = Achievement(
+            pk=self.achievement.pk, user=self.students[0], title='Кубок', description='',
+            date=date(2026, 5, 1), image='achievements/c.png'
+        )
+        detached.save()
+        self.assertIsNone(cache.get(_cache_key('achievements/a.png')))
+
+    def test_deleted_object_is_forgotten(self):
+        file_url(self.achievement.image)
+        self.achievement.delete()
+        self.assertIsNone(cache.get(_cache_key('achievements/a.png')))
+
+
+class UserSearchTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alena = User.objects.create(
+            username='alena', first_name='Алёна', last_name='Йорданова', patronymic='Сергеевна', email='alena@example.com'
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/auth/users/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [user['id'] for user in response.json()['results']]
+
+    def test_case_and_yo_insensitive_prefix_search(self):
+        self.assertEqual(self.search('алена'), [self.alena.pk])
+        self.assertEqual(self.search('ЙОРД серг'), [self.alena.pk])
+        self.assertEqual(self.search('alena@exa'), [self.alena.pk])
+        self.assertEqual(len(self.search('петров')), 5)
+
+    def test_best_match_first(self):
+        self.assertEqual(self.search('петров иван3')[0], self.students[3].pk)
+
+    def test_index_follows_updates(self):
+        self.alena.last_name = 'Смирнова'
+        self.alena.save(update_fields=['last_name'])
+        self.assertEqual(self.search('смирн'), [self.alena.pk])
+        self.assertEqual(self.search('йорд'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        # Без слов поиск не фильтрует, операторы FTS ищутся как обычные слова
+        self.assertEqual(len(self.search('"*')), User.objects.count())
+        self.assertEqual(self.search('петров OR NOT'), [])
+
+
+class UnassignedStudentsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Родились 1 января: сегодня им ровно 6 + index лет
+        self.free = [
+            User.objects.create(username=f'free{index}', first_name='Свободный', last_name=f'Ученик{index}',
+                                date_of_birth=date(date.today().year - 6 - index, 1, 1))
+            for index in range(6)
+        ]
+        User.objects.create(username='nodob', first_name='Без', last_name='Даты')
+        # Неактивное членство не считается группой
+        GroupStudent.objects.create(group=self.group, student=self.free[5], is_active=False)
+
+    def test_filter_and_action_use_anti_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/users/', {'not_in_any_group': 'true', 'page_size': 200})
+        self.assertEqual(response.json()['count'], 9)
+        self.assertTrue(any('NOT (EXISTS' in query['sql'] or 'NOT EXISTS' in query['sql']
+                            for query in queries.captured_queries))
+        response = self.client.get('/api/auth/users/unassigned/', {'page_size': 3})
+        self.assertEqual(response.json()['count'], 9)
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_candidates_match_group_ages(self):
+        kids = Group.objects.create(name='Дети', coach=self.coach, gym=self.gym, min_age=7, max_age=9)
+        response = self.client.get(f'/api/trainings/groups/{kids.pk}/candidates/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(user['username'] for user in response.json()['results']), ['free1', 'free2', 'free3'])
+        response = self.client.get('/api/auth/users/unassigned/', {'group': kids.pk, 'search': 'ученик2'})
+        self.assertEqual([user['username'] for user in response.json()['results']], ['free2'])
+
+    def test_students_cannot_list(self):
+        self.assertEqual(self.client_for(self.students[0]).get('/api/auth/users/unassigned/').status_code, 403)
+
+
+class ImageVariantTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANTS_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+
+    def upload_avatar(self, avatar):
+        # Копии пишутся в БД в обход save(), поэтому пользователь запроса — свежий из БД
+        client = self.client_for(User.objects.get(pk=self.students[0].pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch('/api/auth/users/me/', {'avatar': avatar}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return User.objects.get(pk=self.students[0].pk)
+
+    def jpeg(self, size=(1200, 800)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile('avatar.jpg', buffer.getvalue(), 'image/jpeg')
+
+    def test_variants_are_built_and_removed(self):
+        user = self.upload_avatar(self.jpeg())
+        self.assertEqual(set(user.avatar_variants), {'source', '64', '256'})
+        self.assertEqual(user.avatar_variants['source'], user.avatar.name)
+        variant_path = os.path.join(self.media_root, user.avatar_variants['256'])
+        with Image.open(variant_path) as variant:
+            self.assertEqual((variant.format, variant.size), ('WEBP', (256, 256)))
+
+        urls = self.client_for(user).get('/api/auth/users/me/').json()['avatar_variants']
+        self.assertTrue(urls['64'].endswith('_64.webp'))
+
+        user = self.upload_avatar('')
+        self.assertEqual(user.avatar_variants, {})
+        self.assertFalse(os.path.exists(variant_path))
+
+
+class SessionCoalescingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.browser = Client()
+        self.browser.login(username='coach', password=self.password)
+        self.browser.get('/api/trainings/groups/')
+
+    def session_writes(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.browser.get('/api/trainings/groups/', **headers).status_code, 200)
+        return [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']
+                and not query['sql'].startswith('SELECT')]
+
+    def test_reads_do_not_write_session(self):
+        for _ in range(3):
+            self.assertEqual(self.session_writes(), [])
+
+    def test_session_is_extended_once_per_interval(self):
+        later = time.time() + 86400 * 0.2
+        with mock.patch('config.middleware.time.time', return_value=later):
+            self.assertEqual(len(self.session_writes()), 1)
+            self.assertEqual(self.session_writes(), [])
+
+    def test_logout_still_ends_session(self):
+        self.browser.post('/api/auth/logout/')
+        self.assertEqual(self.browser.get('/api/auth/users/me/').status_code, 403)
+
+
+@override_settings(AUTH_USER_CACHE_TTL=30)
+class AuthUserCacheTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        auth_cache._entries.clear()
+        self.browser = Client()
+        self.browser.login(username='coach', password=self.password)
+        self.me()
+
+    def me(self):
+        return self.browser.get('/api/auth/users/me/')
+
+    def test_repeat_requests_skip_user_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.me().status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "accounts_user"' in query['sql'] and 'accounts_user_groups' not in query['sql']])
+
+    def test_save_and_group_change_invalidate(self):
+        self.coach.is_staff = True
+        self.coach.save()
+        self.assertTrue(self.me().json()['is_staff'])
+        entries = len(auth_cache._entries)
+        AuthGroup.objects.create(name='Судьи').user_set.add(self.coach)
+        self.assertEqual(len(auth_cache._entries), entries - 1)
+
+    def test_password_change_logs_out(self):
+        self.coach.set_password('new-pass')
+        self.coach.save()
+        self.assertEqual(self.me().status_code, 403)
+
+    @override_settings(IMAGE_VARIANTS_ASYNC=False)
+    def test_variant_update_invalidates(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 300), 'blue').save(buffer, 'JPEG')
+        with override_settings(MEDIA_ROOT=media_root):
+            self.coach.avatar = SimpleUploadedFile('coach.jpg', buffer.getvalue(), 'image/jpeg')
+            self.coach.save()
+            self.me()
+            generate_variants('accounts.User', self.coach.pk, 'avatar')
+            self.assertEqual(set(self.me().json()['avatar_variants']), {'64', '256'})
+
+
+class DirtyFieldsTests(ApiTestCase):
+    def updates(self, queries, table):
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith(f'UPDATE "{table}"')]
+
+    def test_login_touches_only_last_login(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().post('/api/auth/login/', {'username': 'coach', 'password': self.password},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries if 'accounts_profile' in query['sql']])
+        [update] = self.updates(queries, 'accounts_user')
+        self.assertIn('"last_login"', update)
+        self.assertNotIn('"first_name"', update)
+
+    def test_save_writes_changed_fields_only(self):
+        user = User.objects.get(pk=self.students[0].pk)
+        user.first_name = 'Пётр'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        [update] = self.updates(queries, 'accounts_user')
+        self.assertIn('"first_name"', update)
+        self.assertIn('"search_text"', update)
+        self.assertNotIn('"email"', update)
+        with self.assertNumQueries(0):
+            user.save()
+
+    def test_loaded_profile_is_saved_with_user(self):
+        user = User.objects.select_related('profile').get(pk=self.students[0].pk)
+        user.profile.grade = '5 кю'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"grade"', queries[0]['sql'])
+        self.assertIn('"updated_at"', queries[0]['sql'])
+        self.assertEqual(Profile.objects.get(user=user).grade, '5 кю')
+
+    def test_api_update_persists(self):
+        response = self.client_for(self.students[0]).patch('/api/auth/users/me/', {'last_name': 'Новый'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(pk=self.students[0].pk).last_name, 'Новый')
+
+
+@override_settings(NEWS_FEED_CACHE_TTL=300)
+class NewsFeedTests(ApiTestCase):
+    url = '/api/auth/news/'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for index in range(3):
+            News.objects.create(author=self.admin, title=f'Новость {index}', content='Текст')
+        # Без сессии: запросы к БД в ответе — только запросы самой ленты
+        self.client = self.client_for(self.coach)
+        self.first = self.client.get(self.url)
+
+    def test_cached_feed_and_not_modified(self):
+        self.assertEqual(len(self.first.json()), 3)
+        self.assertIn('ETag', self.first)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json(), self.first.json())
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=self.first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_paginated_requests_bypass_cache(self):
+        response = self.client.get(self.url + '?cursor=', HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_author_rename_and_delete_change_feed(self):
+        etag = self.first['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.first_name = 'Мария'
+            self.admin.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Мария', response.json()[0]['author_name'])
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coach.first_name = 'Игорь'
+            self.coach.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            News.objects.first().delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()), 2)
@@ -5,9 +5,16 @@ from rest_framework.pagination import PageNumberPagination
 from django.contrib.auth import get_user_model, authenticate, login, logout
 from django.db.models import Q
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
+from config.fieldsets import SparseFieldsetViewMixin
+from config.pagination import KeysetPagination
 from .models import User, Profile, Achievement, News
+from .importing import ImportFileError, import_students, read_rows
+from . import news_feed
+from .search import UserSearchFilter
 from .permissions import IsAdmin, IsCoachOrAdmin, IsAdminOrSelfUser
 from .serializers import (
     UserSerializer, ProfileSerializer, AchievementSerializer, 
@@ -23,25 +30,27 @@ class UserPageNumberPagination(PageNumberPagination):
     max_page_size = 500
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserPagination(KeysetPagination):
+    # По умолчанию — прежняя постраничная навигация; ?cursor= включает keyset
+    fallback_class = UserPageNumberPagination
+
+
+class UserViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = UserPageNumberPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['username', 'first_name', 'last_name', 'email']
+    pagination_class = UserPagination
+    # ?search= ищет по ФИО, отчеству, логину и email с ранжированием (accounts.search)
+    filter_backends = [DjangoFilterBackend, UserSearchFilter, filters.OrderingFilter]
     ordering_fields = ['date_joined', 'last_name', 'first_name']
+    keyset_ordering = ['last_name', 'first_name', 'pk']
     
     def get_queryset(self):
         user = self.request.user
-        from trainings.models import GroupStudent
+        from trainings.services import unassigned_students
         not_in_any_group = self.request.query_params.get('not_in_any_group', '').lower() in ('1', 'true', 'yes')
         if not_in_any_group and (user.is_staff or user.is_coach):
-            ids_in_any_group = set(
-                GroupStudent.objects.filter(is_active=True).values_list('student_id', flat=True).distinct()
-            )
-            qs = User.objects.filter(is_student=True).exclude(id__in=ids_in_any_group)
-            return qs.order_by('last_name', 'first_name')
+            return unassigned_students()
         if user.is_staff:
             return User.objects.all().order_by('-is_staff', '-is_coach', 'last_name', 'first_name')
         elif user.is_coach:
@@ -50,12 +59,54 @@ class UserViewSet(viewsets.ModelViewSet):
         return User.objects.filter(id=user.id)
     
     def get_permissions(self):
-        if self.action in ['create', 'destroy']:
+        if self.action in ['create', 'destroy', 'import_students']:
             return [IsAdmin()]
         if self.action in ['update', 'partial_update']:
             return [IsAdminOrSelfUser()]
         return [permissions.IsAuthenticated()]
     
+    @action(detail=False, methods=['get'], pagination_class=UserPageNumberPagination)
+    def unassigned(self, request):
+        """Ученики без активной группы (?search=, постранично с count); ?group= — подходящие группе по возрасту."""
+        from trainings.models import Group
+        from trainings.services import unassigned_students
+        user = request.user
+        if not (user.is_staff or user.is_coach):
+            return Response({'detail': 'Доступно только тренерам и администраторам.'}, status=status.HTTP_403_FORBIDDEN)
+        group = None
+        group_id = request.query_params.get('group')
+        if group_id:
+            group = Group.objects.filter(pk=group_id).first() if group_id.isdigit() else None
+            if group is None:
+                return Response({'detail': 'Группа не найдена.'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = self.filter_queryset(unassigned_students(group))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_students(self, request):
+        """
+        Массовый импорт учеников из CSV/XLSX (file). Необязательно: group — группа для строк
+        без столбца «группа», dry_run — только проверить. Ответ: created и ошибки по строкам.
+        """
+        from trainings.models import Group
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Загрузите файл CSV или XLSX в поле file.'}, status=status.HTTP_400_BAD_REQUEST)
+        default_group = None
+        group_id = str(request.data.get('group', ''))
+        if group_id:
+            default_group = Group.objects.filter(pk=group_id).first() if group_id.isdigit() else None
+            if default_group is None:
+                return Response({'detail': 'Группа не найдена.'}, status=status.HTTP_404_NOT_FOUND)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            report = import_students(read_rows(upload, upload.name), default_group=default_group, dry_run=dry_run)
+        except ImportFileError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get', 'patch'])
     def me(self, request):
         if request.method == 'PATCH':
@@ -67,7 +118,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -90,7 +141,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class AchievementViewSet(viewsets.ModelViewSet):
+class AchievementViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Achievement.objects.all()
     serializer_class = AchievementSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -98,6 +149,7 @@ class AchievementViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user']
     ordering_fields = ['date']
     ordering = ['-date']
+    keyset_ordering = ['-date', '-pk']
     
     def get_queryset(self):
         user = self.request.user
@@ -114,19 +166,44 @@ class AchievementViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
 
-class NewsViewSet(viewsets.ModelViewSet):
+class NewsViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = News.objects.all()
     serializer_class = NewsSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    keyset_ordering = ['-created_at', '-pk']
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAdmin()]
         return [permissions.IsAuthenticated()]
     
+    def get_queryset(self):
+        return News.objects.select_related('author')
+
+    def list(self, request, *args, **kwargs):
+        # Лента кэшируется целиком по версии (accounts.news_feed); 304 — без запросов к БД
+        if news_feed.feed_cache_ttl() <= 0:
+            return super().list(request, *args, **kwargs)
+        state = news_feed.feed_state()
+        etag = news_feed.feed_etag(state, request)
+        last_modified = state[1]
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is None:
+            data = news_feed.get_cached_feed(state, request)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                news_feed.set_cached_feed(state, request, data)
+            response = Response(data)
+        else:
+            response = not_modified
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import Competition, CompetitionCategory, CompetitionRegistration
+from .models import Bracket, Competition, CompetitionCategory, CompetitionRegistration, IdempotencyRecord
 
 admin.site.register(Competition)
 admin.site.register(CompetitionCategory)
 admin.site.register(CompetitionRegistration)
+admin.site.register(Bracket)
+admin.site.register(IdempotencyRecord)
@@ -0,0 +1,258 @@
+"""
+Турнирные сетки для категорий соревнования.
+
+Олимпийская система (с добором или без) и круговая система. Посев — по разряду
+(кю/дан): сильнейшие разводятся по разным частям сетки и получают проходы
+(bye), а ученики одной группы («клуба») разводятся как можно дальше друг от
+друга, чтобы не встретиться в первых кругах.
+
+Сетка хранится компактно (модель Bracket): для олимпийской системы — только
+жеребьёвка первого круга, список из size мест (id спортсмена или null), поединки
+следующих кругов и добора однозначно выводятся из неё (bracket_matches). Для
+круговой системы — порядок туров с парами.
+"""
+import random
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from accounts.models import Profile
+from trainings.models import GroupStudent
+from .models import Bracket, CompetitionCategory, CompetitionRegistration
+
+SINGLE_ELIMINATION = 'single_elimination'
+ROUND_ROBIN = 'round_robin'
+AUTO = 'auto'
+# До стольких участников включительно при format=auto — круговая система
+ROUND_ROBIN_MAX = 5
+# Добор (утешительные поединки за бронзу) возможен, когда в сетке есть четвертьфиналы
+REPECHAGE_MIN_SIZE = 8
+
+GRADE_PATTERN = re.compile(r'(\d+)\s*(кю|kyu|дан|dan)', re.IGNORECASE)
+
+
+def grade_rank(grade):
+    """Числовой ранг разряда: N дан выше любого кю, 1 кю выше 10 кю; неизвестный — 0."""
+    match = GRADE_PATTERN.search(grade or '')
+    if not match:
+        return 0
+    number, kind = int(match.group(1)), match.group(2).lower()
+    if kind in ('дан', 'dan'):
+        return 100 + number
+    return max(100 - number, 1)
+
+
+class Athlete:
+    __slots__ = ('id', 'club', 'rank')
+
+    def __init__(self, id, club=None, rank=0):
+        self.id = id
+        self.club = club
+        self.rank = rank
+
+
+def _split(athletes, size):
+    """
+    Раскладывает спортсменов (уже по убыванию силы) по size местам. На каждом уровне
+    делит на две половины: сначала разводит одноклубников, затем уравнивает число
+    спортсменов и силу половин. Сильнейший попадает в меньшую половину — туда, где
+    проходов больше.
+    """
+    if size == 1:
+        return [athletes[0].id if athletes else None]
+    half = size // 2
+    targets = (len(athletes) // 2, (len(athletes) + 1) // 2)
+    halves = ([], [])
+    clubs = (Counter(), Counter())
+    strength = [0, 0]
+    for athlete in athletes:
+        options = [side for side in (0, 1) if len(halves[side]) < targets[side]]
+        side = min(options, key=lambda side: (
+            clubs[side][athlete.club] if athlete.club is not None else 0,
+            len(halves[side]),
+            strength[side],
+        ))
+        halves[side].append(athlete)
+        strength[side] += athlete.rank
+        if athlete.club is not None:
+            clubs[side][athlete.club] += 1
+    return _split(halves[0], half) + _split(halves[1], half)
+
+
+def _bracket_size(count):
+    size = 1
+    while size < count:
+        size *= 2
+    return size
+
+
+def seed_order(athletes, rng=None):
+    """Сильнейшие первыми; равные по рангу — в случайном (или исходном) порядке."""
+    athletes = list(athletes)
+    if rng is not None:
+        rng.shuffle(athletes)
+    return sorted(athletes, key=lambda athlete: -athlete.rank)
+
+
+def single_elimination(athletes, repechage=True, rng=None):
+    size = _bracket_size(max(len(athletes), 2))
+    return {
+        'format': SINGLE_ELIMINATION,
+        'slots': _split(seed_order(athletes, rng), size),
+        'repechage': repechage and size >= REPECHAGE_MIN_SIZE,
+    }
+
+
+def round_robin(athletes, rng=None):
+    """Туры по круговому методу; туры с одноклубниками — в конце."""
+    ids = [athlete.id for athlete in seed_order(athletes, rng)]
+    clubs = {athlete.id: athlete.club for athlete in athletes}
+    players = ids + [None] if len(ids) % 2 else list(ids)
+    rounds = []
+    for _ in range(len(players) - 1):
+        pairs = [
+            [players[i], players[-1 - i]]
+            for i in range(len(players) // 2)
+            if players[i] is not None and players[-1 - i] is not None
+        ]
+        if pairs:
+            rounds.append(pairs)
+        players = [players[0], players[-1]] + players[1:-1]
+
+    def clubmates(pairs):
+        return sum(1 for a, b in pairs if clubs[a] is not None and clubs[a] == clubs[b])
+
+    rounds.sort(key=clubmates)
+    return {'format': ROUND_ROBIN, 'participants': ids, 'rounds': rounds}
+
+
+def build_bracket(athletes, bracket_format=AUTO, repechage=True, rng=None):
+    if bracket_format == AUTO:
+        bracket_format = ROUND_ROBIN if len(athletes) <= ROUND_ROBIN_MAX else SINGLE_ELIMINATION
+    if bracket_format == ROUND_ROBIN:
+        return round_robin(athletes, rng)
+    return single_elimination(athletes, repechage, rng)
+
+
+def _side(source):
+    kind, value = source
+    return {kind: value} if kind != 'athlete' or value is not None else None
+
+
+def bracket_matches(bracket_format, data):
+    """Поединки сетки: [{'id', 'round', 'a', 'b'}], сторона — {'athlete'|'winner'|'loser': ...} или None."""
+    if bracket_format == ROUND_ROBIN:
+        return [
+            {'id': f'R{number}-{index}', 'round': number, 'a': {'athlete': a}, 'b': {'athlete': b}}
+            for number, pairs in enumerate(data['rounds'], start=1)
+            for index, (a, b) in enumerate(pairs, start=1)
+        ]
+
+    matches = []
+    # Источник места: ('athlete', id) — известный спортсмен (или None — пусто), ('winner', id матча)
+    sources = [('athlete', athlete_id) for athlete_id in data['slots']]
+    number = 0
+    rounds = []
+    while len(sources) > 1:
+        number += 1
+        next_sources, round_matches = [], []
+        for index in range(0, len(sources), 2):
+            a, b = sources[index], sources[index + 1]
+            empty_a, empty_b = a == ('athlete', None), b == ('athlete', None)
+            if empty_a or empty_b:
+                # Проход (bye): соперника нет, поединка нет
+                next_sources.append(b if empty_a else a)
+                round_matches.append(None)
+                continue
+            match_id = f'R{number}-{index // 2 + 1}'
+            matches.append({'id': match_id, 'round': number, 'a': _side(a), 'b': _side(b)})
+            next_sources.append(('winner', match_id))
+            round_matches.append(match_id)
+        rounds.append(round_matches)
+        sources = next_sources
+
+    if data.get('repechage') and len(rounds) >= 3:
+        # Добор: проигравшие в четвертьфиналах одной половины сетки встречаются между
+        # собой, победитель борется за бронзу с проигравшим в полуфинале другой половины
+        quarterfinals, semifinals = rounds[-3], rounds[-2]
+
+        def loser(match_id):
+            return ('loser', match_id) if match_id else None
+
+        for index, (first, second) in enumerate(((0, 1), (2, 3)), start=1):
+            a, b = loser(quarterfinals[first]), loser(quarterfinals[second])
+            semifinal_loser = loser(semifinals[2 - index])
+            repechage_id = f'REP-{index}'
+            if a and b:
+                matches.append({'id': repechage_id, 'round': number + 1, 'a': _side(a), 'b': _side(b)})
+                finalist = ('winner', repechage_id)
+            else:
+                finalist = a or b
+            if finalist and semifinal_loser:
+                matches.append({
+                    'id': f'BRONZE-{index}', 'round': number + 2,
+                    'a': _side(finalist), 'b': _side(semifinal_loser),
+                })
+    return matches
+
+
+def load_athletes(competition):
+    """Участники по категориям: {category_id: [Athlete]} — три запроса на всё соревнование."""
+    by_category = defaultdict(list)
+    for category_id, user_id in (
+        CompetitionRegistration.objects.filter(competition=competition)
+        .order_by('pk').values_list('category_id', 'user_id')
+    ):
+        by_category[category_id].append(user_id)
+    user_ids = {user_id for users in by_category.values() for user_id in users}
+    clubs = dict(
+        GroupStudent.objects.filter(student_id__in=user_ids, is_active=True)
+        .values_list('student_id', 'group_id')
+    )
+    ranks = {
+        user_id: grade_rank(grade)
+        for user_id, grade in Profile.objects.filter(user_id__in=user_ids).values_list('user_id', 'grade')
+    }
+    return {
+        category_id: [
+            Athlete(user_id, clubs.get(user_id), ranks.get(user_id, 0))
+            for user_id in dict.fromkeys(users)
+        ]
+        for category_id, users in by_category.items()
+    }
+
+
+def generate_brackets(competition, bracket_format=AUTO, repechage=True, seed=None):
+    """
+    Сетки для всех категорий соревнования одним проходом: участники грузятся тремя
+    запросами, сетки записываются одним INSERT ... ON CONFLICT. Категории без
+    участников остаются без сетки. Возвращает сохранённые Bracket.
+    """
+    rng = random.Random(seed)
+    athletes = load_athletes(competition)
+    category_ids = list(CompetitionCategory.objects.filter(competition=competition).values_list('pk', flat=True))
+    brackets = []
+    for category_id in category_ids:
+        entrants = athletes.get(category_id)
+        if not entrants:
+            continue
+        data = build_bracket(entrants, bracket_format, repechage, rng)
+        brackets.append(Bracket(
+            category_id=category_id,
+            format=data.pop('format'),
+            athlete_count=len(entrants),
+            data=data,
+        ))
+    with transaction.atomic():
+        Bracket.objects.filter(category_id__in=category_ids).exclude(
+            category_id__in=[bracket.category_id for bracket in brackets]
+        ).delete()
+        Bracket.objects.bulk_create(
+            brackets,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['category'],
+            update_fields=['format', 'athlete_count', 'data', 'generated_at'],
+        )
+    return brackets
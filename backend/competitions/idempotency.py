@@ -0,0 +1,89 @@
+"""
+Заголовок Idempotency-Key: повтор запроса с тем же ключом возвращает сохранённый
+ответ вместо повторной регистрации (двойной клик, повтор после обрыва связи).
+
+Запись с ключом вставляется в той же транзакции, что и сама операция. Параллельный
+дубль ждёт на уникальном индексе (user, key), пока первый запрос не завершится, и
+получает его ответ. Сохраняются только успешные ответы: при ошибке транзакция
+откатывается вместе с записью, и запрос можно повторить с тем же ключом.
+Ключ действует IDEMPOTENCY_KEY_TTL секунд.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def expired_before():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+
+def idempotent(view):
+    """Декоратор метода вьюсета: ответ на запрос с Idempotency-Key выполняется один раз."""
+
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or not request.user.is_authenticated:
+            return view(self, request, *args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{HEADER} должен содержать от 1 до {MAX_KEY_LENGTH} символов.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        scope = f'{request.method} {request.path}'
+        fingerprint = _fingerprint(request)
+        IdempotencyRecord.objects.filter(user=request.user, key=key, created_at__lt=expired_before()).delete()
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyRecord.objects.create(
+                        user=request.user, key=key, scope=scope, fingerprint=fingerprint
+                    )
+            except IntegrityError:
+                record = None
+            if record is not None:
+                response = view(self, request, *args, **kwargs)
+                if response.status_code >= 400:
+                    transaction.set_rollback(True)
+                    return response
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+                return response
+
+        previous = IdempotencyRecord.objects.filter(user=request.user, key=key).first()
+        if previous is None or previous.response_status is None:
+            return Response(
+                {'detail': 'Запрос с этим ключом ещё обрабатывается, повторите позже.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if previous.scope != scope or previous.fingerprint != fingerprint:
+            return Response(
+                {'detail': f'{HEADER} уже использован для другого запроса.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        response = Response(previous.response_body, status=previous.response_status)
+        response[REPLAYED_HEADER] = 'true'
+        return response
+
+    return wrapper
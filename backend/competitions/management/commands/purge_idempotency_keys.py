@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from competitions.idempotency import expired_before
+from competitions.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ключи Idempotency-Key старше IDEMPOTENCY_KEY_TTL.'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyRecord.objects.filter(created_at__lt=expired_before()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено ключей: {deleted}'))
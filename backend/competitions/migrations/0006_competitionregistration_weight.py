@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0005_delete_competitionresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competitionregistration',
+            name='weight',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Вес на взвешивании, кг'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0006_competitionregistration_weight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bracket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('single_elimination', 'Олимпийская система'), ('round_robin', 'Круговая система')], max_length=20, verbose_name='Система')),
+                ('athlete_count', models.PositiveIntegerField(default=0, verbose_name='Участников')),
+                ('data', models.JSONField(default=dict)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bracket', to='competitions.competitioncategory')),
+            ],
+            options={
+                'verbose_name': 'Турнирная сетка',
+                'verbose_name_plural': 'Турнирные сетки',
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:47
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def dedupe_and_count(apps, schema_editor):
+    """Удаляет повторные регистрации перед уникальным ограничением и заполняет счётчики мест."""
+    CompetitionRegistration = apps.get_model('competitions', 'CompetitionRegistration')
+    CompetitionCategory = apps.get_model('competitions', 'CompetitionCategory')
+    seen, duplicates = set(), []
+    # Из повторов остаётся подтверждённая, иначе самая ранняя регистрация
+    for pk, user_id, competition_id, category_id in CompetitionRegistration.objects.order_by(
+        '-is_confirmed', 'pk'
+    ).values_list('pk', 'user_id', 'competition_id', 'category_id').iterator():
+        key = (user_id, competition_id, category_id)
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+    for start in range(0, len(duplicates), 500):
+        CompetitionRegistration.objects.filter(pk__in=duplicates[start:start + 500]).delete()
+
+    counts = dict(
+        CompetitionRegistration.objects.values('category').annotate(total=models.Count('pk'))
+        .values_list('category', 'total')
+    )
+    categories = list(CompetitionCategory.objects.filter(pk__in=counts).only('pk'))
+    for category in categories:
+        category.registered_count = counts[category.pk]
+    CompetitionCategory.objects.bulk_update(categories, ['registered_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('competitions', '0007_bracket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('scope', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('response_status', models.PositiveSmallIntegerField(null=True)),
+                ('response_body', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+            },
+        ),
+        migrations.AddField(
+            model_name='competitioncategory',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Пусто — без ограничения', null=True, verbose_name='Мест'),
+        ),
+        migrations.AddField(
+            model_name='competitioncategory',
+            name='registered_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Зарегистрировано'),
+        ),
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_idempotency_key'),
+        ),
+        migrations.RunPython(dedupe_and_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0008_registration_capacity_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='competitionregistration',
+            constraint=models.UniqueConstraint(fields=('user', 'competition', 'category'), name='unique_competition_registration'),
+        ),
+    ]
@@ -1,5 +1,12 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.conf import settings
+from trainings.models import Group, GroupStudent, memberships_changed
+from .visibility import (
+    forget_all_visibility, forget_students_visibility, forget_user_visibility, forget_visibility_m2m
+)
 
 User = settings.AUTH_USER_MODEL
 
@@ -25,6 +32,9 @@ class CompetitionCategory(models.Model):
     weight_max = models.IntegerField(null=True, blank=True)
     age_min = models.IntegerField(null=True, blank=True)
     age_max = models.IntegerField(null=True, blank=True)
+    capacity = models.PositiveIntegerField('Мест', null=True, blank=True, help_text='Пусто — без ограничения')
+    # Счётчик регистраций: меняется только условным UPDATE (competitions.services)
+    registered_count = models.PositiveIntegerField('Зарегистрировано', default=0, editable=False)
     
     class Meta:
         verbose_name = 'Категория'
@@ -33,16 +43,95 @@ class CompetitionCategory(models.Model):
     def __str__(self):
         return f"{self.name} ({self.competition.name})"
 
+    def save(self, *args, **kwargs):
+        # Обычное сохранение не перезаписывает счётчик: его меняют параллельные регистрации
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'registered_count'
+            ]
+        super().save(*args, **kwargs)
+
 class CompetitionRegistration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     competition = models.ForeignKey(Competition, on_delete=models.CASCADE)
     category = models.ForeignKey(CompetitionCategory, on_delete=models.CASCADE)
     registered_at = models.DateTimeField(auto_now_add=True)
     is_confirmed = models.BooleanField(default=False)
+    weight = models.DecimalField('Вес на взвешивании, кг', max_digits=5, decimal_places=2, null=True, blank=True)
     
     class Meta:
         verbose_name = 'Регистрация'
         verbose_name_plural = 'Регистрации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'competition', 'category'], name='unique_competition_registration'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.competition}"
+
+
+class Bracket(models.Model):
+    """Турнирная сетка категории (competitions.brackets): жеребьёвка в компактном JSON."""
+    FORMAT_CHOICES = [
+        ('single_elimination', 'Олимпийская система'),
+        ('round_robin', 'Круговая система'),
+    ]
+
+    category = models.OneToOneField(CompetitionCategory, on_delete=models.CASCADE, related_name='bracket')
+    format = models.CharField('Система', max_length=20, choices=FORMAT_CHOICES)
+    athlete_count = models.PositiveIntegerField('Участников', default=0)
+    # single_elimination: {'slots': [id|null, ...], 'repechage': bool}; round_robin: {'participants', 'rounds'}
+    data = models.JSONField(default=dict)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Турнирная сетка'
+        verbose_name_plural = 'Турнирные сетки'
+
+    def __str__(self):
+        return f"Сетка {self.category}"
+
+
+class IdempotencyRecord(models.Model):
+    """Ответ на запрос с заголовком Idempotency-Key (competitions.idempotency)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+
+def release_place(sender, instance, **kwargs):
+    """Освобождает место в категории при удалении регистрации (в том числе каскадном)."""
+    CompetitionCategory.objects.filter(pk=instance.category_id, registered_count__gt=0).update(
+        registered_count=F('registered_count') - 1
+    )
+
+
+post_delete.connect(release_place, sender=CompetitionRegistration)
+
+# Кэш видимости соревнований (competitions.visibility)
+for _model in (Competition, CompetitionCategory):
+    post_save.connect(forget_all_visibility, sender=_model)
+    post_delete.connect(forget_all_visibility, sender=_model)
+m2m_changed.connect(forget_visibility_m2m, sender=Competition.visible_groups.through)
+# Удаление группы удаляет строки visible_groups без m2m_changed
+post_delete.connect(forget_all_visibility, sender=Group)
+post_save.connect(forget_user_visibility, sender=GroupStudent)
+post_delete.connect(forget_user_visibility, sender=GroupStudent)
+memberships_changed.connect(forget_students_visibility)
@@ -1,24 +1,25 @@
 from rest_framework import serializers
-from .models import Competition, CompetitionCategory, CompetitionRegistration
+from config.fieldsets import SparseFieldsetMixin
+from trainings.models import Group
+from .brackets import bracket_matches
+from .models import Bracket, Competition, CompetitionCategory, CompetitionRegistration
 
-class CompetitionSerializer(serializers.ModelSerializer):
+class CompetitionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    visible_groups = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=Group.objects.all(),
+        required=False,
+        allow_null=True
+    )
     visible_groups_names = serializers.SerializerMethodField()
     
     class Meta:
         model = Competition
         fields = '__all__'
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        from trainings.models import Group
-        self.fields['visible_groups'] = serializers.PrimaryKeyRelatedField(
-            many=True, 
-            queryset=Group.objects.all(), 
-            required=False, 
-            allow_null=True
-        )
+        field_dependencies = {'visible_groups_names': ['visible_groups']}
     
     def get_visible_groups_names(self, obj):
+        # visible_groups предзагружены во вьюсете — и id, и названия берутся из одного запроса
         return [group.name for group in obj.visible_groups.all()]
     
     def create(self, validated_data):
@@ -37,13 +38,27 @@ class CompetitionSerializer(serializers.ModelSerializer):
             instance.visible_groups.set(visible_groups)
         return instance
 
-class CompetitionCategorySerializer(serializers.ModelSerializer):
+class CompetitionCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CompetitionCategory
         fields = '__all__'
 
-class CompetitionRegistrationSerializer(serializers.ModelSerializer):
+class CompetitionRegistrationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CompetitionRegistration
         fields = '__all__'
         read_only_fields = ['user', 'registered_at']
+
+
+class BracketSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    matches = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Bracket
+        fields = ['id', 'category', 'category_name', 'format', 'athlete_count', 'data', 'matches', 'generated_at']
+        read_only_fields = fields
+        field_dependencies = {'matches': ['format', 'data']}
+
+    def get_matches(self, obj):
+        return bracket_matches(obj.format, obj.data)
@@ -0,0 +1,285 @@
+"""
+Допуск учеников к категориям соревнования и регистрация (одиночная и командная).
+
+Возраст считается на дату соревнования. Границы категории необязательны:
+пустая граница не ограничивает. Весовые границы проверяются по весу на
+взвешивании, который передаётся вместе с регистрацией.
+
+Места в категории (capacity) учитываются счётчиком registered_count, который
+меняется только условным UPDATE: место занимается, лишь если оно есть, а
+строка категории остаётся заблокированной до конца транзакции. Поэтому
+регистрации в одну категорию выстраиваются в очередь, а в разные — идут
+параллельно. Дубли отсекает уникальное ограничение (user, competition, category).
+"""
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from accounts.models import age_from_birth
+from trainings.models import GroupStudent
+from .models import CompetitionCategory, CompetitionRegistration
+
+User = get_user_model()
+
+MAX_TEAM_SIZE = 500
+
+
+class RegistrationError(ValueError):
+    """Регистрация невозможна; status — HTTP-статус ответа."""
+    status = 400
+
+
+class CategoryFullError(RegistrationError):
+    status = 409
+
+
+def _within(value, low, high):
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def has_age_limits(category):
+    return category.age_min is not None or category.age_max is not None
+
+
+def has_weight_limits(category):
+    return category.weight_min is not None or category.weight_max is not None
+
+
+def fits_age(category, age):
+    if not has_age_limits(category):
+        return True
+    return age is not None and _within(age, category.age_min, category.age_max)
+
+
+def fits_weight(category, weight):
+    """True/False; None — у категории есть весовые границы, а вес неизвестен."""
+    if not has_weight_limits(category):
+        return True
+    if weight is None:
+        return None
+    return _within(weight, category.weight_min, category.weight_max)
+
+
+def category_errors(category, age, weight):
+    errors = []
+    if not fits_age(category, age):
+        errors.append(
+            'Не указана дата рождения.' if age is None
+            else f'Возраст {age} не подходит для категории «{category.name}».'
+        )
+    fits = fits_weight(category, weight)
+    if fits is None:
+        errors.append(f'Для категории «{category.name}» нужен вес на взвешивании.')
+    elif not fits:
+        errors.append(f'Вес {weight} не подходит для категории «{category.name}».')
+    return errors
+
+
+def eligibility_matrix(competition, students):
+    """
+    Матрица ученики × категории за один проход: категории и регистрации загружаются
+    одним запросом каждая, возраст каждого ученика считается один раз.
+    """
+    categories = list(CompetitionCategory.objects.filter(competition=competition).order_by('name', 'pk'))
+    registered = {}
+    for user_id, category_id in CompetitionRegistration.objects.filter(
+        competition=competition, user__in=[student.pk for student in students]
+    ).values_list('user_id', 'category_id'):
+        registered.setdefault(user_id, []).append(category_id)
+
+    rows = []
+    for student in students:
+        age = age_from_birth(student.date_of_birth, competition.date)
+        rows.append({
+            'id': student.pk,
+            'name': student.get_full_name(),
+            'age': age,
+            # Подходит по возрасту; для весовых категорий вес проверяется при регистрации
+            'eligible': [category.pk for category in categories if fits_age(category, age)],
+            'registered': registered.get(student.pk, []),
+        })
+    return {
+        'categories': [
+            {
+                'id': category.pk,
+                'name': category.name,
+                'age_min': category.age_min,
+                'age_max': category.age_max,
+                'weight_min': category.weight_min,
+                'weight_max': category.weight_max,
+                'needs_weight': has_weight_limits(category),
+            }
+            for category in categories
+        ],
+        'students': rows,
+    }
+
+
+def _to_id(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def _parse_weight(value):
+    if value in (None, ''):
+        return None
+    try:
+        weight = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError
+    if not weight.is_finite() or weight <= 0 or weight >= 1000:
+        raise ValueError
+    return weight.quantize(Decimal('0.01'))
+
+
+def _take_place(category_id):
+    """Занимает место в категории, если оно есть. Строка категории блокируется до конца транзакции."""
+    return CompetitionCategory.objects.filter(
+        Q(capacity__isnull=True) | Q(registered_count__lt=F('capacity')), pk=category_id,
+    ).update(registered_count=F('registered_count') + 1) == 1
+
+
+def _release_place(category_id):
+    CompetitionCategory.objects.filter(pk=category_id, registered_count__gt=0).update(
+        registered_count=F('registered_count') - 1
+    )
+
+
+def _check_category(competition, category, user, weight):
+    """Те же проверки, что в register_team и матрице допуска: соревнование, возраст и вес."""
+    if not competition.is_active:
+        raise RegistrationError('Регистрация на соревнование закрыта.')
+    if category.competition_id != competition.pk:
+        raise RegistrationError('Категория не относится к этому соревнованию.')
+    errors = category_errors(category, age_from_birth(user.date_of_birth, competition.date), weight)
+    if errors:
+        raise RegistrationError(' '.join(errors))
+
+
+def register(user, competition, category, **fields):
+    """
+    Регистрирует пользователя в категории: сначала занимает место, затем вставляет
+    регистрацию. Дубль отсекается уникальным ограничением, и место возвращается
+    откатом транзакции.
+    """
+    _check_category(competition, category, user, fields.get('weight'))
+    try:
+        with transaction.atomic():
+            if not _take_place(category.pk):
+                raise CategoryFullError(f'В категории «{category.name}» не осталось мест.')
+            return CompetitionRegistration.objects.create(
+                user=user, competition=competition, category=category, **fields
+            )
+    except IntegrityError:
+        raise RegistrationError('Пользователь уже зарегистрирован в этой категории.')
+
+
+def update_registration(registration, **fields):
+    """Изменяет регистрацию; при переходе в другую категорию место переносится."""
+    competition = fields.get('competition', registration.competition)
+    category = fields.get('category', registration.category)
+    old_category_id = registration.category_id
+    weight = fields.get('weight', registration.weight)
+    moved = category.pk != old_category_id
+    if moved or competition.pk != registration.competition_id or weight != registration.weight:
+        _check_category(competition, category, registration.user, weight)
+    try:
+        with transaction.atomic():
+            if moved and not _take_place(category.pk):
+                raise CategoryFullError(f'В категории «{category.name}» не осталось мест.')
+            for attr, value in fields.items():
+                setattr(registration, attr, value)
+            registration.save()
+            if moved:
+                _release_place(old_category_id)
+    except IntegrityError:
+        raise RegistrationError('Пользователь уже зарегистрирован в этой категории.')
+    return registration
+
+
+def register_team(competition, entries, coach):
+    """
+    Регистрирует учеников тренера: entries — [{'student', 'category', 'weight'?}].
+    Каждая запись проверяется отдельно; ошибочные пропускаются и попадают в отчёт
+    с индексом записи. Возвращает {'created', 'errors': [{'index', 'student', 'errors'}]}.
+
+    Строки затронутых категорий блокируются (по возрастанию id — без взаимных
+    блокировок), поэтому уже сделанные регистрации и свободные места читаются
+    под блокировкой и не меняются до записи.
+    """
+    student_ids = {_to_id(entry.get('student')) for entry in entries} - {None}
+    category_ids = {_to_id(entry.get('category')) for entry in entries} - {None}
+    students = User.objects.only('id', 'first_name', 'last_name', 'date_of_birth').in_bulk(student_ids)
+    if coach.is_staff:
+        allowed = set(students)
+    else:
+        allowed = set(GroupStudent.objects.filter(
+            student_id__in=student_ids, is_active=True, group__coach=coach
+        ).values_list('student_id', flat=True))
+
+    with transaction.atomic():
+        categories = {
+            category.pk: category
+            for category in CompetitionCategory.objects.select_for_update()
+            .filter(competition=competition, pk__in=category_ids).order_by('pk')
+        }
+        taken = set(CompetitionRegistration.objects.filter(
+            competition=competition, user_id__in=student_ids
+        ).values_list('user_id', 'category_id'))
+        free = {
+            category.pk: category.capacity - category.registered_count
+            for category in categories.values() if category.capacity is not None
+        }
+
+        registrations, errors, seen = [], [], set()
+        for index, entry in enumerate(entries):
+            student_id, category_id = _to_id(entry.get('student')), _to_id(entry.get('category'))
+            problems = []
+            student = students.get(student_id)
+            category = categories.get(category_id)
+            if student is None:
+                problems.append('Ученик не найден.')
+            elif student_id not in allowed:
+                problems.append('Можно регистрировать только учеников своих групп.')
+            if category is None:
+                problems.append('Категория не найдена в этом соревновании.')
+            try:
+                weight = _parse_weight(entry.get('weight'))
+            except ValueError:
+                problems.append('Некорректный вес.')
+                weight = None
+            if student is not None and category is not None and not problems:
+                key = (student_id, category_id)
+                if key in taken:
+                    problems.append('Ученик уже зарегистрирован в этой категории.')
+                elif key in seen:
+                    problems.append('Запись повторяется.')
+                seen.add(key)
+                problems.extend(
+                    category_errors(category, age_from_birth(student.date_of_birth, competition.date), weight)
+                )
+                if not problems and free.get(category_id, 1) <= 0:
+                    problems.append(f'В категории «{category.name}» не осталось мест.')
+            if problems:
+                errors.append({'index': index, 'student': entry.get('student'), 'errors': problems})
+                continue
+            if category_id in free:
+                free[category_id] -= 1
+            registrations.append(CompetitionRegistration(
+                user_id=student_id, competition=competition, category_id=category_id, weight=weight,
+            ))
+
+        CompetitionRegistration.objects.bulk_create(registrations)
+        counts = Counter(registration.category_id for registration in registrations)
+        if counts:
+            CompetitionCategory.objects.filter(pk__in=counts).update(registered_count=F('registered_count') + Case(
+                *[When(pk=category_id, then=Value(count)) for category_id, count in counts.items()],
+                default=Value(0),
+            ))
+    return {'created': len(registrations), 'errors': errors}
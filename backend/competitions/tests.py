@@ -0,0 +1,337 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from competitions.brackets import Athlete, bracket_matches, generate_brackets, grade_rank, round_robin, single_elimination
+from competitions.models import Bracket, Competition, CompetitionCategory, CompetitionRegistration
+from config.testing import ApiTestCase
+from trainings.models import Group
+
+
+class CompetitionTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.competition = Competition.objects.create(
+            name='Кубок', location='Москва', date=datetime.date(2027, 6, 1)
+        )
+        # Возраст на дату соревнования: 10, 11, 12, 13, 14
+        for index, student in enumerate(self.students):
+            student.date_of_birth = datetime.date(2016 - index, 7, 1)
+            student.save()
+
+    def url(self, action):
+        return f'/api/competitions/competitions/{self.competition.pk}/{action}/'
+
+
+class EligibilityTests(CompetitionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.open = CompetitionCategory.objects.create(competition=self.competition, name='Абсолютная')
+        self.kids = CompetitionCategory.objects.create(
+            competition=self.competition, name='Дети', age_min=10, age_max=12
+        )
+        self.kids_light = CompetitionCategory.objects.create(
+            competition=self.competition, name='Дети до 40 кг', age_min=10, age_max=12, weight_max=40
+        )
+
+    def test_matrix(self):
+        response = self.client.get(self.url('eligibility') + f'?group={self.group.pk}')
+        self.assertEqual(response.status_code, 200)
+        eligible = {row['age']: set(row['eligible']) for row in response.json()['students']}
+        self.assertEqual(eligible[10], {self.open.pk, self.kids.pk, self.kids_light.pk})
+        self.assertEqual(eligible[13], {self.open.pk})
+        needs_weight = {row['id']: row['needs_weight'] for row in response.json()['categories']}
+        self.assertTrue(needs_weight[self.kids_light.pk])
+
+    def test_anonymous_is_rejected(self):
+        response = APIClient().get(self.url('eligibility') + f'?group={self.group.pk}')
+        self.assertEqual(response.status_code, 403)
+
+    def test_student_is_rejected(self):
+        client = self.client_for(self.students[0])
+        self.assertEqual(client.get(self.url('eligibility') + f'?group={self.group.pk}').status_code, 403)
+        response = client.post(self.url('register_team'), {'registrations': [{}]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_register_team_reports_errors_per_entry(self):
+        first = self.students[0]
+        entries = [
+            {'student': first.pk, 'category': self.kids_light.pk, 'weight': 38.5},
+            {'student': self.students[1].pk, 'category': self.kids_light.pk},
+            {'student': self.students[3].pk, 'category': self.kids.pk},
+            {'student': first.pk, 'category': self.kids_light.pk, 'weight': 38.5},
+            {'student': self.admin.pk, 'category': self.open.pk},
+            {'student': self.students[2].pk, 'category': self.open.pk, 'weight': 'abc'},
+            {'student': self.students[4].pk, 'category': self.open.pk},
+        ]
+        response = self.client.post(self.url('register_team'), {'registrations': entries}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3, 4, 5])
+        self.assertEqual(CompetitionRegistration.objects.get(user=first).weight, Decimal('38.50'))
+
+        response = self.client.get(self.url('eligibility') + f'?group={self.group.pk}')
+        row = next(row for row in response.json()['students'] if row['id'] == first.pk)
+        self.assertEqual(row['registered'], [self.kids_light.pk])
+
+
+class RegistrationTests(CompetitionTestCase):
+    url = '/api/competitions/registrations/'
+
+    def setUp(self):
+        super().setUp()
+        self.open = CompetitionCategory.objects.create(competition=self.competition, name='Абсолютная', capacity=2)
+        self.other = CompetitionCategory.objects.create(competition=self.competition, name='Открытая')
+        self.kids = CompetitionCategory.objects.create(
+            competition=self.competition, name='Дети до 40 кг', age_min=10, age_max=12, weight_max=40
+        )
+        self.clients = [self.client_for(student) for student in self.students]
+
+    def register(self, index, category, key=None, **extra):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        body = {'competition': self.competition.pk, 'category': category.pk, **extra}
+        return self.clients[index].post(self.url, body, format='json', **headers)
+
+    def count(self, category):
+        category.refresh_from_db()
+        return category.registered_count
+
+    def test_register_sets_user_and_rejects_duplicates(self):
+        response = self.register(0, self.open)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['user'], self.students[0].pk)
+        self.assertEqual(self.register(0, self.open).status_code, 400)
+        self.assertEqual(self.count(self.open), 1)
+
+    def test_capacity(self):
+        self.assertEqual(self.register(0, self.open).status_code, 201)
+        self.assertEqual(self.register(1, self.open).status_code, 201)
+        self.assertEqual(self.register(2, self.open).status_code, 409)
+        self.assertEqual(self.count(self.open), 2)
+        self.assertEqual(CompetitionRegistration.objects.filter(category=self.open).count(), 2)
+
+    def test_category_save_keeps_counter(self):
+        self.register(0, self.open)
+        stale = CompetitionCategory.objects.get(pk=self.open.pk)
+        stale.registered_count = 0
+        stale.name = 'Абсолютная (все)'
+        stale.save()
+        self.assertEqual(self.count(self.open), 1)
+        response = self.client.patch(
+            f'/api/competitions/categories/{self.open.pk}/', {'capacity': 3}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['registered_count'], 1)
+
+    def test_move_and_delete_release_places(self):
+        registration_id = self.register(1, self.open).json()['id']
+        response = self.clients[1].patch(f'{self.url}{registration_id}/', {'category': self.other.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.count(self.open), self.count(self.other)), (0, 1))
+        self.assertEqual(self.clients[1].delete(f'{self.url}{registration_id}/').status_code, 204)
+        self.assertEqual(self.count(self.other), 0)
+
+    def test_age_and_weight_are_checked(self):
+        # student3 — 13 лет, старше категории
+        self.assertEqual(self.register(3, self.kids, weight='35').status_code, 400)
+        self.assertEqual(self.register(0, self.kids).status_code, 400)
+        self.assertEqual(self.register(0, self.kids, weight='45').status_code, 400)
+        self.assertEqual(self.count(self.kids), 0)
+        response = self.register(0, self.kids, weight='38.5')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.count(self.kids), 1)
+
+        registration_id = self.register(3, self.other).json()['id']
+        response = self.clients[3].patch(f'{self.url}{registration_id}/', {'category': self.kids.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((self.count(self.kids), self.count(self.other)), (1, 1))
+
+    def test_idempotent_replay(self):
+        first = self.register(0, self.open, key='key-1')
+        self.assertEqual(first.status_code, 201)
+        replay = self.register(0, self.open, key='key-1')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(self.register(0, self.other, key='key-1').status_code, 422)
+        self.assertEqual(CompetitionRegistration.objects.count(), 1)
+
+    def test_failed_request_keeps_key_reusable(self):
+        self.register(0, self.open)
+        self.register(1, self.open)
+        self.assertEqual(self.register(2, self.open, key='key-2').status_code, 409)
+        self.assertEqual(self.register(2, self.other, key='key-2').status_code, 201)
+
+    def test_team_registration_respects_capacity(self):
+        self.register(0, self.open)
+        entries = [{'student': student.pk, 'category': self.open.pk} for student in self.students]
+        url = f'/api/competitions/competitions/{self.competition.pk}/register_team/'
+        response = self.client.post(url, {'registrations': entries}, format='json', HTTP_IDEMPOTENCY_KEY='team')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0, 2, 3, 4])
+        self.assertEqual(self.count(self.open), 2)
+        replay = self.client.post(url, {'registrations': entries}, format='json', HTTP_IDEMPOTENCY_KEY='team')
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(CompetitionRegistration.objects.filter(category=self.open).count(), 2)
+
+
+@override_settings(COMPETITION_VISIBILITY_CACHE_TTL=300)
+class VisibilityTests(CompetitionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.other = Group.objects.create(name='Старшая', coach=self.coach, gym=self.gym)
+        self.mine = Competition.objects.create(name='Первенство группы', location='Зал', date=datetime.date(2027, 1, 1))
+        self.mine.visible_groups.add(self.group)
+        self.theirs = Competition.objects.create(name='Первенство старших', location='Зал',
+                                                 date=datetime.date(2027, 1, 1))
+        self.theirs.visible_groups.add(self.other)
+
+    def visible(self, student, query=''):
+        response = self.client_for(student).get('/api/competitions/competitions/' + query)
+        return sorted(competition['id'] for competition in response.json())
+
+    def test_student_sees_public_and_own_group(self):
+        self.assertEqual(self.visible(self.students[0]), [self.competition.pk, self.mine.pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.visible(self.students[0])
+        self.assertFalse([query for query in queries.captured_queries if 'trainings_groupstudent' in query['sql']])
+        self.assertEqual(len(self.client_for(self.admin).get('/api/competitions/competitions/').json()), 3)
+
+    def test_group_changes_are_visible_immediately(self):
+        student = self.students[0]
+        self.visible(student)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.theirs.visible_groups.add(self.group)
+        self.assertEqual(self.visible(student), [self.competition.pk, self.mine.pk, self.theirs.pk])
+
+        self.client.login(username='admin', password=self.password)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/trainings/group-students/',
+                                        {'group': self.other.pk, 'student': student.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.visible(student), [self.competition.pk, self.theirs.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertEqual(self.visible(student), [self.competition.pk])
+
+    def test_age_filter_uses_categories(self):
+        self.visible(self.students[0], '?filter_by_age=true')
+        with self.captureOnCommitCallbacks(execute=True):
+            CompetitionCategory.objects.create(competition=self.competition, name='Взрослые', age_min=18, age_max=40)
+        self.assertEqual(self.visible(self.students[0], '?filter_by_age=true'), [self.mine.pk])
+
+
+class CompetitionSerializerTests(CompetitionTestCase):
+    url = '/api/competitions/competitions/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.admin)
+        self.other = Group.objects.create(name='Старшая', coach=self.coach, gym=self.gym)
+        for index in range(30):
+            competition = Competition.objects.create(name=f'Турнир {index}', location='Зал',
+                                                     date=datetime.date(2027, 1, 1))
+            if index % 2:
+                competition.visible_groups.add(self.group, self.other)
+
+    def test_list_prefetches_visible_groups(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.url).json()
+        self.assertEqual(len(data), 31)
+        self.assertLessEqual(len(queries), 3)
+        row = next(row for row in data if row['name'] == 'Турнир 1')
+        self.assertEqual(sorted(row['visible_groups']), sorted([self.group.pk, self.other.pk]))
+        self.assertEqual(sorted(row['visible_groups_names']), ['Младшая', 'Старшая'])
+
+    def test_sparse_list_skips_prefetch(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url + '?fields=id,name')
+
+    def test_write_visible_groups(self):
+        response = self.client.post(self.url, {
+            'name': 'Новый', 'location': 'Зал', 'date': '2027-02-02', 'visible_groups': [self.other.pk],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['visible_groups_names'], ['Старшая'])
+        response = self.client.patch(f"{self.url}{response.json()['id']}/", {'visible_groups': []}, format='json')
+        self.assertEqual(response.json()['visible_groups'], [])
+
+
+class BracketEngineTests(SimpleTestCase):
+    def test_grade_rank(self):
+        self.assertEqual(sorted(['10 кю', '1 кю', '2 дан', '', '1 dan'], key=grade_rank),
+                         ['', '10 кю', '1 кю', '1 dan', '2 дан'])
+
+    def test_club_mates_are_split(self):
+        athletes = [Athlete(index, club=index % 2, rank=10 - index) for index in range(8)]
+        slots = single_elimination(athletes, rng=random.Random(1))['slots']
+        self.assertEqual(slots[0], 0)
+        for half in (slots[:4], slots[4:]):
+            self.assertEqual({athlete_id % 2 for athlete_id in half}, {0, 1})
+
+    def test_byes_and_repechage(self):
+        data = single_elimination([Athlete(index, rank=index) for index in range(11)])
+        self.assertEqual(len(data['slots']), 16)
+        matches = bracket_matches('single_elimination', data)
+        self.assertEqual(len([match for match in matches if match['round'] == 1]), 3)
+        self.assertEqual(len([match for match in matches if match['id'][1].isdigit()]), 10)
+        self.assertTrue({'BRONZE-1', 'BRONZE-2'} <= {match['id'] for match in matches})
+
+    def test_round_robin_pairs_everyone_once(self):
+        rounds = round_robin([Athlete(index) for index in range(5)])['rounds']
+        pairs = [tuple(sorted(pair)) for round_pairs in rounds for pair in round_pairs]
+        self.assertEqual(len(pairs), 10)
+        self.assertEqual(len(set(pairs)), 10)
+
+
+class BracketApiTests(CompetitionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.open = CompetitionCategory.objects.create(competition=self.competition, name='Абсолютная')
+        CompetitionCategory.objects.create(competition=self.competition, name='Пустая')
+        for student in self.students:
+            CompetitionRegistration.objects.create(user=student, competition=self.competition, category=self.open)
+
+    def test_generate_and_regenerate(self):
+        url = self.url('brackets')
+        self.assertEqual(self.client.post(url, {'format': 'олимпийская'}, format='json').status_code, 400)
+        response = self.client.post(url, {'seed': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        [bracket] = response.json()
+        self.assertEqual(bracket['format'], 'round_robin')
+        self.assertEqual(len(bracket['matches']), 10)
+        response = self.client.post(url, {'format': 'single_elimination'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Bracket.objects.count(), 1)
+        self.assertEqual(self.client.get(url).json()[0]['format'], 'single_elimination')
+
+    def test_students_can_only_read(self):
+        client = self.client_for(self.students[0])
+        self.assertEqual(client.post(self.url('brackets'), {}, format='json').status_code, 403)
+        self.assertEqual(client.get(self.url('brackets') + '?fields=category,matches').status_code, 200)
+
+    def test_query_count_does_not_grow_with_categories(self):
+        with CaptureQueriesContext(connection) as few:
+            generate_brackets(self.competition)
+        users = User.objects.bulk_create([User(username=f'athlete{index}', is_student=True) for index in range(200)])
+        categories = CompetitionCategory.objects.bulk_create([
+            CompetitionCategory(competition=self.competition, name=f'Категория {index}') for index in range(20)
+        ])
+        CompetitionRegistration.objects.bulk_create([
+            CompetitionRegistration(user=user, competition=self.competition, category=categories[index % 20])
+            for index, user in enumerate(users)
+        ])
+        with CaptureQueriesContext(connection) as many:
+            generate_brackets(self.competition)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(Bracket.objects.filter(category__competition=self.competition).count(), 21)
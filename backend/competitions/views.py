@@ -1,8 +1,23 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Exists, OuterRef
-from .models import Competition, CompetitionCategory, CompetitionRegistration
-from .serializers import CompetitionSerializer, CompetitionCategorySerializer, CompetitionRegistrationSerializer
+from django.db.models import Prefetch
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from config.fieldsets import SparseFieldsetViewMixin
+from .brackets import AUTO, ROUND_ROBIN, SINGLE_ELIMINATION, generate_brackets
+from .idempotency import idempotent
+from .models import Bracket, Competition, CompetitionCategory, CompetitionRegistration
+from .serializers import (
+    BracketSerializer, CompetitionSerializer, CompetitionCategorySerializer, CompetitionRegistrationSerializer
+)
+from .services import (
+    MAX_TEAM_SIZE, RegistrationError, eligibility_matrix, register, register_team, update_registration
+)
+from .visibility import age_matched_competition_ids, visible_competition_ids
+
+User = get_user_model()
 
 
 def _user_age(user):
@@ -10,60 +25,130 @@ def _user_age(user):
     return age_from_birth(user.date_of_birth) if getattr(user, 'date_of_birth', None) else None
     
 
-class CompetitionViewSet(viewsets.ModelViewSet):
+class CompetitionViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Competition.objects.all()
     serializer_class = CompetitionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    keyset_ordering = ['-date', '-pk']
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             from accounts.permissions import IsCoachOrAdmin
             return [IsCoachOrAdmin()]
+        if self.action == 'eligibility':
+            return [permissions.IsAuthenticated()]
         return [permissions.IsAuthenticatedOrReadOnly()]
     
     def get_queryset(self):
+        from trainings.models import Group
         user = self.request.user
-        queryset = Competition.objects.all()
+        queryset = Competition.objects.prefetch_related(
+            Prefetch('visible_groups', queryset=Group.objects.only('id', 'name'))
+        )
         
         if user.is_staff:
             return queryset
         
         if user.is_authenticated:
-            from trainings.models import GroupStudent
-            user_groups = list(GroupStudent.objects.filter(
-                student=user,
-                is_active=True
-            ).values_list('group_id', flat=True))
-            
-            queryset = queryset.annotate(
-                visible_groups_count=Count('visible_groups')
-            )
-            
-            if user_groups:
-                queryset = queryset.filter(
-                    Q(visible_groups__in=user_groups) | Q(visible_groups_count=0)
-                ).distinct()
-            else:
-                queryset = queryset.filter(visible_groups_count=0)
-            
+            # Видимость по группам и возрасту посчитана заранее (competitions.visibility)
+            competition_ids = set(visible_competition_ids(user))
             filter_by_age = self.request.query_params.get('filter_by_age', 'false').lower() == 'true'
             user_age = _user_age(user)
             if filter_by_age and user_age is not None:
-                has_any_category = CompetitionCategory.objects.filter(competition_id=OuterRef('pk'))
-                age_match = CompetitionCategory.objects.filter(
-                    competition_id=OuterRef('pk')
-                ).filter(
-                    Q(age_min__isnull=True, age_max__isnull=True)
-                    | Q(age_min__lte=user_age, age_max__gte=user_age)
-                )
-                queryset = queryset.filter(
-                    ~Exists(has_any_category) | Exists(age_match)
-                )
+                competition_ids.intersection_update(age_matched_competition_ids(user_age))
+            queryset = queryset.filter(pk__in=competition_ids)
         
         return queryset
-    
 
-class CompetitionCategoryViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def eligibility(self, request, pk=None):
+        """
+        Допуск учеников группы (?group=) к категориям соревнования: возраст на дату
+        соревнования, подходящие по возрасту категории и уже сделанные регистрации.
+        """
+        from trainings.models import Group
+        competition = get_object_or_404(Competition, pk=pk)
+        group_id = request.query_params.get('group', '')
+        group = Group.objects.filter(pk=group_id).first() if group_id.isdigit() else None
+        if group is None:
+            return Response({'detail': 'Группа не найдена.'}, status=status.HTTP_404_NOT_FOUND)
+        user = request.user
+        if not (user.is_staff or (user.is_coach and group.coach_id == user.id)):
+            return Response(
+                {'detail': 'Смотреть допуск может только тренер группы или администратор.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        students = list(
+            User.objects.filter(training_groups__group=group, training_groups__is_active=True)
+            .only('id', 'first_name', 'last_name', 'date_of_birth')
+            .order_by('last_name', 'first_name', 'pk')
+        )
+        return Response(eligibility_matrix(competition, students))
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def register_team(self, request, pk=None):
+        """Регистрация команды одним запросом: registrations[{student, category, weight?}]."""
+        user = request.user
+        if not (user.is_coach or user.is_staff):
+            return Response(
+                {'detail': 'Регистрировать команду может только тренер или администратор.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        competition = get_object_or_404(Competition, pk=pk)
+        if not competition.is_active:
+            return Response({'detail': 'Регистрация на соревнование закрыта.'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = request.data.get('registrations')
+        if not isinstance(entries, list) or not entries or not all(isinstance(entry, dict) for entry in entries):
+            return Response(
+                {'detail': 'Передайте список registrations: [{student, category, weight}].'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(entries) > MAX_TEAM_SIZE:
+            return Response(
+                {'detail': f'Не больше {MAX_TEAM_SIZE} регистраций за один запрос.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        report = register_team(competition, entries, user)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get', 'post'])
+    def brackets(self, request, pk=None):
+        """
+        GET — сетки всех категорий соревнования с поединками.
+        POST — жеребьёвка заново для всех категорий: format (auto|single_elimination|round_robin),
+        repechage (добор, по умолчанию да), seed (для воспроизводимой жеребьёвки).
+        """
+        competition = get_object_or_404(Competition, pk=pk)
+        if request.method == 'POST':
+            user = request.user
+            if not (user.is_coach or user.is_staff):
+                return Response(
+                    {'detail': 'Проводить жеребьёвку может только тренер или администратор.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            bracket_format = request.data.get('format', AUTO)
+            if bracket_format not in (AUTO, SINGLE_ELIMINATION, ROUND_ROBIN):
+                return Response(
+                    {'detail': 'format должен быть auto, single_elimination или round_robin.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            repechage = str(request.data.get('repechage', 'true')).lower() in ('1', 'true', 'yes')
+            seed = request.data.get('seed')
+            if seed is not None and not str(seed).isdigit():
+                return Response({'detail': 'seed должен быть целым числом.'}, status=status.HTTP_400_BAD_REQUEST)
+            generate_brackets(competition, bracket_format, repechage, int(seed) if seed is not None else None)
+        brackets = Bracket.objects.filter(category__competition=competition).select_related('category').order_by(
+            'category__name', 'category_id'
+        )
+        serializer = BracketSerializer(brackets, many=True, context=self.get_serializer_context())
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+        )
+
+
+class CompetitionCategoryViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = CompetitionCategory.objects.all()
     serializer_class = CompetitionCategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -76,7 +161,29 @@ class CompetitionCategoryViewSet(viewsets.ModelViewSet):
             return [IsCoachOrAdmin()]
         return [permissions.IsAuthenticatedOrReadOnly()]
 
-class CompetitionRegistrationViewSet(viewsets.ModelViewSet):
+class CompetitionRegistrationViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = CompetitionRegistration.objects.all()
     serializer_class = CompetitionRegistrationSerializer
     permission_classes = [permissions.IsAuthenticated]
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        fields = dict(serializer.validated_data)
+        try:
+            registration = register(request.user, fields.pop('competition'), fields.pop('category'), **fields)
+        except RegistrationError as error:
+            return Response({'detail': str(error)}, status=error.status)
+        return Response(self.get_serializer(registration).data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        registration = self.get_object()
+        serializer = self.get_serializer(registration, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        try:
+            registration = update_registration(registration, **serializer.validated_data)
+        except RegistrationError as error:
+            return Response({'detail': str(error)}, status=error.status)
+        return Response(self.get_serializer(registration).data)
@@ -0,0 +1,116 @@
+"""
+Какие соревнования видит пользователь (CompetitionViewSet).
+
+Соревнование видно всем, если у него нет visible_groups, иначе — ученикам этих
+групп. Множества id считаются одним запросом и кэшируются: видимые пользователю
+— по версии пользователя (меняется при изменении его членства в группах), id с
+подходящей по возрасту категорией — по возрасту. Обе записи зависят и от общей
+версии, которая меняется при изменении соревнований, их групп и категорий.
+Список соревнований после этого — выборка по первичному ключу.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+GLOBAL_VERSION_KEY = 'competition-visibility-version'
+
+
+def _user_version_key(user_id):
+    return f'competition-visibility-version:{user_id}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'COMPETITION_VISIBILITY_CACHE_TTL', 0)
+
+
+def _versions(user_id):
+    keys = [GLOBAL_VERSION_KEY, _user_version_key(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return versions[GLOBAL_VERSION_KEY], versions[keys[1]]
+
+
+def _cached_ids(key, compute):
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(compute())
+        cache.set(key, ids, _cache_ttl())
+    return ids
+
+
+def _compute_visible_ids(user_id):
+    from trainings.models import GroupStudent
+    from .models import Competition
+
+    through = Competition.visible_groups.through
+    user_groups = GroupStudent.objects.filter(student_id=user_id, is_active=True).values('group_id')
+    return Competition.objects.filter(
+        ~Exists(through.objects.filter(competition_id=OuterRef('pk')))
+        | Exists(through.objects.filter(competition_id=OuterRef('pk'), group_id__in=user_groups))
+    ).values_list('pk', flat=True)
+
+
+def _compute_age_ids(age):
+    from .models import Competition, CompetitionCategory
+
+    has_any_category = CompetitionCategory.objects.filter(competition_id=OuterRef('pk'))
+    age_match = CompetitionCategory.objects.filter(competition_id=OuterRef('pk')).filter(
+        Q(age_min__isnull=True, age_max__isnull=True)
+        | Q(age_min__lte=age, age_max__gte=age)
+    )
+    return Competition.objects.filter(~Exists(has_any_category) | Exists(age_match)).values_list('pk', flat=True)
+
+
+def visible_competition_ids(user):
+    """id соревнований, видимых пользователю по группам."""
+    if _cache_ttl() <= 0:
+        return list(_compute_visible_ids(user.pk))
+    global_version, user_version = _versions(user.pk)
+    key = f'competition-visible:{user.pk}:{global_version}:{user_version}'
+    return _cached_ids(key, lambda: _compute_visible_ids(user.pk))
+
+
+def age_matched_competition_ids(age):
+    """id соревнований без категорий или с категорией, подходящей по возрасту."""
+    if _cache_ttl() <= 0:
+        return list(_compute_age_ids(age))
+    global_version = cache.get(GLOBAL_VERSION_KEY)
+    if global_version is None:
+        cache.add(GLOBAL_VERSION_KEY, uuid.uuid4().hex, None)
+        global_version = cache.get(GLOBAL_VERSION_KEY)
+    return _cached_ids(f'competition-age:{global_version}:{age}', lambda: _compute_age_ids(age))
+
+
+def _bump(keys):
+    # После коммита: иначе параллельный запрос закэширует старые данные под новой версией
+    if _cache_ttl() > 0 and keys:
+        transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def forget_all_visibility(sender, raw=False, **kwargs):
+    """post_save/post_delete Competition и CompetitionCategory."""
+    if not raw:
+        _bump([GLOBAL_VERSION_KEY])
+
+
+def forget_visibility_m2m(sender, action, **kwargs):
+    """m2m_changed Competition.visible_groups."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _bump([GLOBAL_VERSION_KEY])
+
+
+def forget_user_visibility(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete GroupStudent."""
+    if not raw:
+        _bump([_user_version_key(instance.student_id)])
+
+
+def forget_students_visibility(sender, student_ids, **kwargs):
+    """trainings.models.memberships_changed: членство изменено в обход save()."""
+    _bump([_user_version_key(student_id) for student_id in set(student_ids)])
@@ -0,0 +1,90 @@
+import copy
+
+from django.db.models import FileField
+
+
+def _snapshot_value(field, value):
+    if isinstance(field, FileField):
+        return getattr(value, 'name', value) or None
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def _is_changed(field, old, current):
+    if isinstance(field, FileField):
+        # Новый файл (ещё не сохранённый в хранилище) или другое имя
+        if not isinstance(current, str) and not getattr(current, '_committed', False) and current:
+            return True
+        return (getattr(current, 'name', current) or None) != old
+    return old != current
+
+
+class DirtyFieldsMixin:
+    """
+    Отслеживание изменённых полей модели.
+
+    При загрузке из БД (from_db) запоминается снимок значений, и save() без
+    update_fields записывает только изменившиеся поля (и поля auto_now). Если
+    ничего не изменилось, save() не делает запроса и не шлёт сигналы.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_snapshot()
+        return instance
+
+    def _take_snapshot(self, fields=None):
+        if fields is None:
+            self._snapshot = {}
+            fields = self._meta.concrete_fields
+        else:
+            fields = [self._meta.get_field(name) for name in fields]
+        for field in fields:
+            if field.attname in self.__dict__:
+                self._snapshot[field.attname] = _snapshot_value(field, self.__dict__[field.attname])
+
+    def get_dirty_fields(self):
+        """Имена изменённых полей; None, если объект не из БД и сравнивать не с чем."""
+        snapshot = getattr(self, '_snapshot', None)
+        if snapshot is None:
+            return None
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            current = self.__dict__[field.attname]
+            if field.attname not in snapshot or _is_changed(field, snapshot[field.attname], current):
+                dirty.append(field.name)
+        return dirty
+
+    def is_dirty(self):
+        # Без снимка (объект не из БД) сравнивать не с чем — считаем изменённым
+        dirty = self.get_dirty_fields()
+        return dirty is None or bool(dirty)
+
+    def save(self, *args, **kwargs):
+        dirty = None
+        if not (self._state.adding or args or kwargs.get('update_fields') is not None or kwargs.get('force_insert')):
+            dirty = self.get_dirty_fields()
+        if dirty is not None:
+            if dirty:
+                dirty += [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) and field.name not in dirty
+                ]
+            kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not hasattr(self, '_snapshot'):
+            self._take_snapshot()
+        else:
+            self._take_snapshot(update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or not hasattr(self, '_snapshot'):
+            self._take_snapshot()
+        else:
+            self._take_snapshot(fields)
@@ -0,0 +1,178 @@
+"""
+Выборочные поля ответа: ?fields=id,name и ?omit=content.
+
+SparseFieldsetMixin (для сериализаторов) оставляет в ответе только запрошенные
+поля корневого сериализатора; вложенные сериализаторы отдаются целиком. Запись и
+валидация не меняются — отбрасываются только поля ответа.
+
+SparseFieldsetViewMixin (для вьюсетов) в list/retrieve подгоняет queryset под
+оставшиеся поля: only() по нужным столбцам, select_related только по нужным
+связям и prefetch_related только для используемых связей. Источники полей
+берутся из source сериализатора; для полей без источника (SerializerMethodField,
+source='*') нужные пути ORM перечисляются в Meta.field_dependencies, иначе
+объект этого уровня загружается целиком.
+"""
+import re
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+# Методы моделей, которые читают известные столбцы
+ATTRIBUTE_DEPENDENCIES = {
+    'get_full_name': ('first_name', 'last_name'),
+    'get_short_name': ('first_name',),
+}
+DISPLAY_METHOD = re.compile(r'^get_(\w+)_display$')
+
+
+def _param_names(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsetMixin:
+    """Сериализатор, отдающий только поля из ?fields= (и без полей из ?omit=)."""
+
+    def is_sparse_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_sparse_names(self):
+        """(fields, omit) из запроса; None — параметр не передан."""
+        request = self.context.get('request')
+        if request is None or not self.is_sparse_root():
+            return None, None
+        return _param_names(request, FIELDS_PARAM), _param_names(request, OMIT_PARAM)
+
+    @property
+    def _readable_fields(self):
+        if not hasattr(self, '_sparse_names'):
+            self._sparse_names = self.get_sparse_names()
+        only, omit = self._sparse_names
+        for field in super()._readable_fields:
+            if only is not None and field.field_name not in only:
+                continue
+            if omit is not None and field.field_name in omit:
+                continue
+            yield field
+
+
+class _QueryPlan:
+    def __init__(self):
+        self.columns = set()
+        self.relations = set()
+        self.roots = set()
+        self.prefetch_all = False
+
+    def add_model(self, model, prefix):
+        # Загрузить объект уровня целиком
+        for field in model._meta.concrete_fields:
+            self.columns.add(prefix + field.name)
+        if not prefix:
+            self.prefetch_all = True
+
+    def add_path(self, model, attrs, prefix='', nested=None):
+        if not attrs:
+            if nested is not None:
+                self.add_serializer(nested, model, prefix)
+            return
+        attr = attrs[0]
+        if not prefix:
+            self.roots.add(attr)
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            display = DISPLAY_METHOD.match(attr)
+            if display:
+                self.columns.add(prefix + display.group(1))
+            elif attr in ATTRIBUTE_DEPENDENCIES:
+                self.columns.update(prefix + name for name in ATTRIBUTE_DEPENDENCIES[attr])
+            else:
+                # Свойство или метод модели: неизвестно, что он читает
+                self.add_model(model, prefix)
+            return
+        if field.many_to_many or field.one_to_many:
+            # Такие связи загружаются отдельными запросами (prefetch_related)
+            return
+        if not field.is_relation:
+            self.columns.add(prefix + field.name)
+            return
+        if field.concrete:
+            self.columns.add(prefix + field.name)
+        if len(attrs) > 1 or nested is not None:
+            self.relations.add(prefix + field.name)
+            self.add_path(field.related_model, attrs[1:], f'{prefix}{field.name}__', nested)
+
+    def add_serializer(self, serializer, model, prefix=''):
+        dependencies = getattr(getattr(serializer, 'Meta', None), 'field_dependencies', {})
+        for field in serializer._readable_fields:
+            if field.field_name in dependencies:
+                for path in dependencies[field.field_name]:
+                    self.add_path(model, path.split('__'), prefix)
+                continue
+            nested = field if isinstance(field, serializers.BaseSerializer) else None
+            if isinstance(field, serializers.ListSerializer):
+                # Вложенный список — обратная связь или M2M, грузится отдельно
+                if not prefix and field.source_attrs:
+                    self.roots.add(field.source_attrs[0])
+                continue
+            if not field.source_attrs:
+                if nested is not None:
+                    self.add_serializer(nested, model, prefix)
+                else:
+                    self.add_model(model, prefix)
+                continue
+            self.add_path(model, field.source_attrs, prefix, nested)
+
+
+def _prefetch_root(lookup):
+    path = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+    return path.split('__')[0]
+
+
+def prune_queryset(queryset, serializer, dependencies=()):
+    """
+    Оставляет в queryset только столбцы, JOIN и prefetch, нужные полям сериализатора
+    и путям dependencies (то, что читает сам вьюсет).
+    """
+    plan = _QueryPlan()
+    plan.add_serializer(serializer, queryset.model)
+    for path in dependencies:
+        plan.add_path(queryset.model, path.split('__'))
+    queryset = queryset.select_related(None)
+    if plan.relations:
+        queryset = queryset.select_related(*sorted(plan.relations))
+    if not plan.prefetch_all:
+        lookups = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if _prefetch_root(lookup) in plan.roots
+        ]
+        queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+    return queryset.only(*sorted(plan.columns or {queryset.model._meta.pk.name}))
+
+
+class SparseFieldsetViewMixin:
+    """Вьюсет, который сужает queryset под ?fields=/?omit= (см. SparseFieldsetMixin)."""
+    sparse_actions = ('list', 'retrieve')
+    # Пути ORM, которые вьюсет читает сам, помимо полей сериализатора
+    sparse_dependencies = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if getattr(self, 'action', None) not in self.sparse_actions:
+            return queryset
+        if FIELDS_PARAM not in params and OMIT_PARAM not in params:
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsetMixin):
+            return queryset
+        return prune_queryset(queryset, serializer, self.sparse_dependencies)
@@ -0,0 +1,80 @@
+"""
+Кэш подписанных URL медиафайлов.
+
+С USE_S3 каждый file.url — это SigV4-подпись (HMAC) на стороне boto3; на странице
+из сотен пользователей это сотни подписей. URL кэшируются в общем кэше Django по
+имени файла в хранилище на MEDIA_URL_CACHE_TTL (не больше четверти срока жизни
+подписи, чтобы выданная из кэша ссылка ещё долго оставалась рабочей).
+
+Кэш включается только с общим бэкендом (Redis): сброс при замене файла должен
+дойти до всех воркеров, а кэш в памяти процесса сбрасывается только у своего.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FileField
+
+CACHE_KEY_PREFIX = 'media-url'
+
+
+def _cache_key(name):
+    # Имена файлов бывают длинными и с кириллицей — в ключ кладём хэш
+    return f'{CACHE_KEY_PREFIX}:{hashlib.sha1(name.encode()).hexdigest()}'
+
+
+def file_url(file_field):
+    """URL файла из FieldFile; при включённом кэше подпись считается раз в MEDIA_URL_CACHE_TTL."""
+    ttl = getattr(settings, 'MEDIA_URL_CACHE_TTL', 0)
+    if ttl <= 0:
+        return file_field.url
+    key = _cache_key(file_field.name)
+    url = cache.get(key)
+    if url is None:
+        url = file_field.url
+        cache.set(key, url, ttl)
+    return url
+
+
+def forget_file_urls(names):
+    names = [name for name in names if name]
+    if names:
+        cache.delete_many([_cache_key(name) for name in names])
+
+
+def _file_fields(model, update_fields=None):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and (update_fields is None or field.name in update_fields)
+    ]
+
+
+def forget_replaced_file_urls(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    pre_save: сбрасывает кэш для файлов, которые заменяются или удаляются этим сохранением.
+
+    Старые имена берутся из снимка DirtyFieldsMixin; запрос в БД — только для
+    объектов, созданных не из БД (без снимка).
+    """
+    if raw or instance.pk is None or not getattr(settings, 'MEDIA_URL_CACHE_TTL', 0):
+        return
+    fields = _file_fields(sender, update_fields)
+    if not fields:
+        return
+    snapshot = getattr(instance, '_snapshot', None)
+    if snapshot is not None:
+        old = {field.attname: snapshot[field.attname] for field in fields if field.attname in snapshot}
+    else:
+        old = sender._base_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+        if old is None:
+            return
+    forget_file_urls(
+        old[field.attname] for field in fields
+        if field.attname in old and old[field.attname] != getattr(instance, field.attname).name
+    )
+
+
+def forget_deleted_file_urls(sender, instance, **kwargs):
+    """post_delete: сбрасывает кэш для файлов удалённого объекта."""
+    if getattr(settings, 'MEDIA_URL_CACHE_TTL', 0):
+        forget_file_urls(getattr(instance, field.attname).name for field in _file_fields(sender))
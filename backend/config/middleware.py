@@ -1,3 +1,9 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.utils.functional import SimpleLazyObject
 from django.utils.deprecation import MiddlewareMixin
 from django.middleware.csrf import get_token
 
@@ -7,3 +13,39 @@ class CSRFExemptForAPI(MiddlewareMixin):
         if request.path.startswith('/api/'):
             get_token(request)
         return None
+
+
+class CoalescingSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware без записи сессии на каждый запрос.
+
+    Сессия сохраняется, только если изменились данные или с прошлого продления
+    срока прошло больше SESSION_REFRESH_FRACTION * SESSION_COOKIE_AGE. Так срок
+    жизни остаётся «скользящим», а чтение API не превращается в UPDATE django_session.
+    """
+    refreshed_key = '_refreshed_at'
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed and not session.is_empty():
+            now = int(time.time())
+            if session.modified:
+                session[self.refreshed_key] = now
+            else:
+                interval = settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION
+                if now - session.get(self.refreshed_key, 0) >= interval:
+                    session[self.refreshed_key] = now
+        return super().process_response(request, response)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware, который берёт request.user из кэша процесса
+    (accounts.auth_cache) вместо SELECT из accounts_user на каждый запрос.
+    """
+
+    def process_request(self, request):
+        from accounts.auth_cache import get_cached_user
+
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,151 @@
+import base64
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Типы значений ключа в курсоре: JSON их не различает, а DjangoJSONEncoder
+# обрезает время до миллисекунд — границу WHERE нужно восстановить точно
+CURSOR_TYPES = {
+    'datetime': (datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    'date': (datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    'time': (datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+    'decimal': (Decimal, str, Decimal),
+    'uuid': (uuid.UUID, str, uuid.UUID),
+}
+
+
+def encode_cursor_value(value):
+    for name, (kind, dump, _) in CURSOR_TYPES.items():
+        # datetime — подкласс date, поэтому он проверяется первым
+        if isinstance(value, kind):
+            return {name: dump(value)}
+    return value
+
+
+def decode_cursor_value(value):
+    if not isinstance(value, dict):
+        return value
+    if len(value) != 1:
+        raise ValueError
+    (name, raw), = value.items()
+    if name not in CURSOR_TYPES or not isinstance(raw, str):
+        raise ValueError
+    return CURSOR_TYPES[name][2](raw)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация (WHERE (a, b) < (x, y) ... LIMIT n) по стабильному порядку
+    view.keyset_ordering, например ('-training__date', '-pk'). Без OFFSET и COUNT(*).
+
+    Включается клиентом: ?cursor= (пустое значение — первая страница), размер — ?page_size=.
+    Без cursor отдаёт прежний ответ: fallback_class или весь список без пагинации.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_ordering = ('-pk',)
+    fallback_class = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.cursor_query_param not in request.query_params:
+            if self.fallback_class is None:
+                return None
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.aliases = [f'_keyset_{i}' for i in range(len(self.ordering))]
+
+        queryset = queryset.annotate(**{
+            alias: F(field.lstrip('-')) for alias, field in zip(self.aliases, self.ordering)
+        }).order_by(*[
+            f'-{alias}' if field.startswith('-') else alias
+            for alias, field in zip(self.aliases, self.ordering)
+        ])
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if position is not None:
+            queryset = queryset.filter(self.after_position_q(position))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, view):
+        ordering = list(getattr(view, 'keyset_ordering', None) or self.default_ordering)
+        # Последним ключом всегда идёт pk — иначе порядок не уникален
+        if ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    def after_position_q(self, position):
+        """(a, b, c) после (x, y, z) с учётом направления каждого ключа."""
+        condition = Q()
+        equal = Q()
+        for alias, field, value in zip(self.aliases, self.ordering, position):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{alias}__{lookup}': value})
+            equal &= Q(**{alias: value})
+        return condition
+
+    def encode_cursor(self, item):
+        position = [encode_cursor_value(getattr(item, alias)) for alias in self.aliases]
+        raw = json.dumps(position, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            position = json.loads(raw)
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            return [decode_cursor_value(value) for value in position]
+        except (ValueError, TypeError, ArithmeticError):
+            raise NotFound('Неверный курсор.')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
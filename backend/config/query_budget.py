@@ -0,0 +1,45 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Бюджет SQL-запросов на action вьюсета: query_budget = {'list': 4, ...}.
+    В бюджет входят и запросы аутентификации (сессия + пользователь).
+    При превышении пишет warning в лог, а при QUERY_BUDGET_RAISE (включено
+    в config.test_settings) — падает с QueryBudgetExceeded.
+    """
+    query_budget = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        budget = self.query_budget.get(getattr(self, 'action', None))
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{type(self).__name__}.{self.action}: {counter.count} SQL-запросов '
+                f'при бюджете {budget} ({request.method} {request.get_full_path()})'
+            )
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
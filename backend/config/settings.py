@@ -45,10 +45,10 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'config.middleware.CoalescingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -150,6 +150,34 @@ if USE_S3:
         "BACKEND": "storages.backends.s3.S3Storage",
     }
 
+# Общий кэш: с REDIS_URL — Redis (один на все воркеры), иначе память процесса
+_redis_url = os.getenv("REDIS_URL")
+if _redis_url:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": _redis_url,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+# Кэш подписанных URL медиа (config.media): TTL не больше четверти срока жизни подписи,
+# чтобы URL из кэша оставался действительным ещё долго после выдачи. Только с REDIS_URL:
+# в памяти процесса замена файла не сбросит кэш других воркеров.
+# 0 — без кэша (нет Redis, локальное хранилище или публичный bucket: подписи нет).
+if USE_S3 and AWS_QUERYSTRING_AUTH and _redis_url:
+    MEDIA_URL_CACHE_TTL = min(
+        int(os.getenv("MEDIA_URL_CACHE_TTL", AWS_QUERYSTRING_EXPIRE // 4)),
+        AWS_QUERYSTRING_EXPIRE // 4,
+    )
+else:
+    MEDIA_URL_CACHE_TTL = 0
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
@@ -169,8 +197,9 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
     'content-type',
     'authorization',
     'x-csrftoken',
+    'idempotency-key',
 ]
-CORS_EXPOSE_HEADERS = ['Set-Cookie']
+CORS_EXPOSE_HEADERS = ['Set-Cookie', 'Idempotent-Replayed']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -185,13 +214,47 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
+    # Keyset-пагинация по ?cursor= (без него списки отдаются как раньше)
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.KeysetPagination',
 }
 
+# Бюджет SQL-запросов на эндпоинт (config.query_budget): превышение — warning в логе,
+# с QUERY_BUDGET_RAISE — ошибка (включено в config.test_settings).
+QUERY_BUDGET_RAISE = env_bool("QUERY_BUDGET_RAISE", False)
+
+# Уменьшенные копии изображений (accounts.images) строятся в пуле потоков после коммита;
+# False — сразу в том же потоке (тесты, отладка)
+IMAGE_VARIANTS_ASYNC = env_bool("IMAGE_VARIANTS_ASYNC", True)
+
+# Пользователь запроса кэшируется в памяти процесса на столько секунд (accounts.auth_cache).
+# Актуальность проверяется по версии в общем кэше, поэтому по умолчанию кэш включён
+# только с REDIS_URL: кэш в памяти одного процесса не видит изменений в других воркерах.
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL") or (30 if _redis_url else 0))
+
+# Лента новостей кэшируется целиком (accounts.news_feed), тоже только с общим кэшем.
+# В ленте подписанные URL картинок — держим её не дольше, чем кэшируются сами URL.
+NEWS_FEED_CACHE_TTL = int(os.getenv("NEWS_FEED_CACHE_TTL") or (300 if _redis_url else 0))
+if USE_S3 and AWS_QUERYSTRING_AUTH:
+    NEWS_FEED_CACHE_TTL = min(NEWS_FEED_CACHE_TTL, MEDIA_URL_CACHE_TTL)
+
+# Множества видимых пользователю соревнований (competitions.visibility) — тоже только с общим кэшем
+COMPETITION_VISIBILITY_CACHE_TTL = int(os.getenv("COMPETITION_VISIBILITY_CACHE_TTL") or (3600 if _redis_url else 0))
+
+# Сколько секунд хранится ответ на запрос с Idempotency-Key (competitions.idempotency)
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 86400))
+
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_AGE = 86400
-SESSION_SAVE_EVERY_REQUEST = True
+# Сессия пишется только при изменении данных или когда с прошлого продления прошла
+# эта доля SESSION_COOKIE_AGE (config.middleware.CoalescingSessionMiddleware)
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = float(os.getenv("SESSION_REFRESH_FRACTION", "0.1"))
+# cached_db — только с общим кэшем (Redis): кэш в памяти процесса не узнает о выходе
+# пользователя в другом воркере. signed_cookies — сессия целиком в подписанной cookie.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND") or ("cached_db" if _redis_url else "db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
 
 CSRF_COOKIE_HTTPONLY = False
 CSRF_COOKIE_SAMESITE = 'Lax'
@@ -0,0 +1,24 @@
+"""
+Настройки для тестов: python manage.py test --settings=config.test_settings
+
+SQLite в памяти, без Redis и S3; превышение бюджета SQL-запросов — ошибка.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',  # noqa: F405
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+QUERY_BUDGET_RAISE = True
+IMAGE_VARIANTS_ASYNC = False
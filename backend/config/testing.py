@@ -0,0 +1,40 @@
+"""Общая основа тестов API: администратор, тренер, зал, группа с пятью учениками."""
+import datetime
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from trainings.models import Group, GroupStudent, Gym
+
+
+class ApiTestCase(TestCase):
+    password = 'pass'
+
+    def setUp(self):
+        self.admin = self.create_user('admin', is_staff=True, first_name='Анна', last_name='Админова')
+        self.coach = self.create_user('coach', is_coach=True, first_name='Олег', last_name='Тренеров')
+        self.gym = Gym.objects.create(
+            name='Зал', address='ул. Спортивная, 1', work_start=datetime.time(8), work_end=datetime.time(22)
+        )
+        self.group = Group.objects.create(name='Младшая', coach=self.coach, gym=self.gym)
+        self.students = []
+        for index in range(5):
+            student = self.create_user(
+                f'student{index}', is_student=True, first_name=f'Иван{index}', last_name='Петров'
+            )
+            GroupStudent.objects.create(group=self.group, student=student)
+            self.students.append(student)
+        self.client = APIClient()
+        self.client.login(username='coach', password=self.password)
+
+    def create_user(self, username, **fields):
+        user = User.objects.create(username=username, **fields)
+        user.set_password(self.password)
+        user.save()
+        return user
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
@@ -0,0 +1,240 @@
+"""
+Минимальные чтение и потоковая запись XLSX без сторонних библиотек.
+
+Книга из одного листа собирается zipfile'ом прямо в поток: каждая строка
+сразу отдаётся клиенту, в памяти держится только текущий кусок архива.
+Чтение — первый лист, построчно через iterparse.
+"""
+import io
+import posixpath
+import re
+import zipfile
+import zlib
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+SHEET_TAIL = '</sheetData></worksheet>'
+
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _Sink(io.RawIOBase):
+    """Неперематываемый поток: zipfile пишет сюда, генератор забирает накопленное."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def column_letter(index):
+    """0 -> A, 25 -> Z, 26 -> AA."""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell(ref, value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(number, values):
+    cells = ''.join(_cell(f'{column_letter(i)}{number}', value) for i, value in enumerate(values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def stream_xlsx(rows, title='Лист1'):
+    """Генератор байтов XLSX-файла из итератора строк (списков значений)."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(title=escape(title[:31], {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(SHEET_HEAD.encode())
+            for number, values in enumerate(rows, start=1):
+                sheet.write(_row(number, values).encode())
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(SHEET_TAIL.encode())
+    yield sink.drain()
+
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+# Защита от zip-бомб: столько байт может занимать распакованная часть книги
+MAX_PART_SIZE = 100 * 1024 * 1024
+# Столбцов на листе Excel (XFD); ссылка дальше — повреждённый или подложный файл
+MAX_COLUMNS = 16384
+
+
+class XlsxError(ValueError):
+    pass
+
+
+def column_index(ref):
+    """'A1' -> 0, 'AB12' -> 27."""
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _open_part(archive, name):
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise XlsxError(f'В файле нет части {name}')
+    if info.file_size > MAX_PART_SIZE:
+        raise XlsxError('Файл слишком большой')
+    return archive.open(info)
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    with _open_part(archive, 'xl/sharedStrings.xml') as part:
+        root = ElementTree.parse(part).getroot()
+    return [''.join(t.text or '' for t in si.iter(f'{MAIN_NS}t')) for si in root.iter(f'{MAIN_NS}si')]
+
+
+def _first_sheet(archive):
+    with _open_part(archive, 'xl/workbook.xml') as part:
+        sheet = ElementTree.parse(part).getroot().find(f'{MAIN_NS}sheets/{MAIN_NS}sheet')
+    if sheet is None:
+        raise XlsxError('В книге нет листов')
+    with _open_part(archive, 'xl/_rels/workbook.xml.rels') as part:
+        rels = ElementTree.parse(part).getroot()
+    for rel in rels.iter(f'{PACKAGE_REL_NS}Relationship'):
+        target = rel.get('Target')
+        if target and rel.get('Id') == sheet.get(f'{REL_NS}id'):
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    raise XlsxError('Не найден первый лист книги')
+
+
+def _cell_value(cell, shared):
+    """Значение ячейки; ValueError — значение не соответствует типу ячейки."""
+    kind = cell.get('t', 'n')
+    if kind == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(f'{MAIN_NS}t'))
+    text = cell.findtext(f'{MAIN_NS}v')
+    if text is None:
+        return None
+    if kind == 's':
+        index = int(text)
+        if not 0 <= index < len(shared):
+            raise ValueError
+        return shared[index]
+    if kind == 'b':
+        return text == '1'
+    if kind in ('str', 'e'):
+        return text
+    return float(text)
+
+
+def _read_rows(archive, shared):
+    with _open_part(archive, _first_sheet(archive)) as part:
+        row_number = 0
+        for _, element in ElementTree.iterparse(part):
+            if element.tag != f'{MAIN_NS}row':
+                continue
+            row_ref = element.get('r') or ''
+            row_number = int(row_ref) if row_ref.isdigit() else row_number + 1
+            values = {}
+            for position, cell in enumerate(element.iter(f'{MAIN_NS}c')):
+                ref = cell.get('r')
+                index = column_index(ref) if ref else position
+                if not 0 <= index < MAX_COLUMNS:
+                    raise XlsxError(f'Строка {row_number}: неверная ссылка на ячейку {ref}')
+                try:
+                    values[index] = _cell_value(cell, shared)
+                except (ValueError, OverflowError):
+                    raise XlsxError(f'Строка {row_number}, ячейка {ref or position + 1}: некорректное значение')
+            element.clear()
+            yield [values.get(i) for i in range(max(values) + 1)] if values else []
+
+
+def read_xlsx(fileobj):
+    """Строки первого листа: списки значений (str, float, bool или None)."""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise XlsxError('Файл не является книгой XLSX')
+    with archive:
+        try:
+            shared = _shared_strings(archive)
+            yield from _read_rows(archive, shared)
+        except ElementTree.ParseError as exc:
+            raise XlsxError(f'Повреждённая книга: {exc}')
+        except (zipfile.BadZipFile, zlib.error, EOFError):
+            raise XlsxError('Повреждённый архив книги')
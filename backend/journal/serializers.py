@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from config.fieldsets import SparseFieldsetMixin
 from .models import Journal, ProgressNote, TechniqueRecord
 
-class JournalSerializer(serializers.ModelSerializer):
+class JournalSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     coach_name = serializers.CharField(source='coach.get_full_name', read_only=True)
     
@@ -10,7 +11,7 @@ class JournalSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class ProgressNoteSerializer(serializers.ModelSerializer):
+class ProgressNoteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     coach_name = serializers.CharField(source='coach.get_full_name', read_only=True)
     
@@ -19,7 +20,7 @@ class ProgressNoteSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class TechniqueRecordSerializer(serializers.ModelSerializer):
+class TechniqueRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     
     class Meta:
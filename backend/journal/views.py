@@ -3,8 +3,9 @@ from django_filters.rest_framework import DjangoFilterBackend
 from .models import Journal, ProgressNote, TechniqueRecord
 from .serializers import JournalSerializer, ProgressNoteSerializer, TechniqueRecordSerializer
 from accounts.permissions import IsCoach
+from config.fieldsets import SparseFieldsetViewMixin
 
-class JournalViewSet(viewsets.ModelViewSet):
+class JournalViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Journal.objects.all()
     serializer_class = JournalSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -12,6 +13,7 @@ class JournalViewSet(viewsets.ModelViewSet):
     filterset_fields = ['student', 'coach', 'date']
     search_fields = ['notes', 'student__first_name', 'student__last_name']
     ordering_fields = ['date', 'created_at']
+    keyset_ordering = ['-date', '-pk']
     
     def get_queryset(self):
         user = self.request.user
@@ -22,7 +24,7 @@ class JournalViewSet(viewsets.ModelViewSet):
             return Journal.objects.all()
         return Journal.objects.filter(student=user)
 
-class ProgressNoteViewSet(viewsets.ModelViewSet):
+class ProgressNoteViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = ProgressNote.objects.all()
     serializer_class = ProgressNoteSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -38,7 +40,7 @@ class ProgressNoteViewSet(viewsets.ModelViewSet):
             return ProgressNote.objects.all()
         return ProgressNote.objects.filter(student=user)
 
-class TechniqueRecordViewSet(viewsets.ModelViewSet):
+class TechniqueRecordViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = TechniqueRecord.objects.all()
     serializer_class = TechniqueRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
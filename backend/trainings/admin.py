@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import Gym, Group, GroupStudent, Training, Homework, Attendance
+from .models import Gym, Group, GroupStudent, Training, TrainingSchedule, Homework, Attendance, AttendanceStat
 
 admin.site.register(Gym)
 admin.site.register(Group)
 admin.site.register(GroupStudent)
 admin.site.register(Training)
+admin.site.register(TrainingSchedule)
 admin.site.register(Homework)
 admin.site.register(Attendance)
+admin.site.register(AttendanceStat)
\ No newline at end of file
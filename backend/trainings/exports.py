@@ -0,0 +1,109 @@
+import csv
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Attendance, Training
+
+User = get_user_model()
+
+PRESENT_MARK = '+'
+ABSENT_MARK = 'н'
+STUDENT_ORDERING = ('last_name', 'first_name', 'patronymic', 'pk')
+
+
+@contextmanager
+def _snapshot():
+    """
+    Транзакция, в которой все курсоры журнала видят одни и те же данные. На
+    PostgreSQL — REPEATABLE READ (READ COMMITTED даёт каждому запросу свой снимок);
+    уровень можно задать только первым запросом, поэтому внутри чужой транзакции
+    остаётся её уровень. SQLite читает в транзакции один снимок и так.
+    """
+    set_isolation = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if set_isolation:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def merge_marks(students, marks, columns, student_ids):
+    """
+    Сливает учеников и их отметки (оба потока в одном порядке) в строки журнала.
+    Отметки учеников, которых нет в student_ids, пропускаются: иначе слияние
+    встало бы на такой отметке и все следующие строки остались бы пустыми.
+    """
+    mark = next(marks, None)
+    for student_id, last_name, first_name, patronymic in students:
+        cells = [''] * len(columns)
+        present = total = 0
+        while mark is not None and (mark[0] == student_id or mark[0] not in student_ids):
+            if mark[0] == student_id:
+                cells[columns[mark[1]]] = PRESENT_MARK if mark[2] else ABSENT_MARK
+                present += mark[2]
+                total += 1
+            mark = next(marks, None)
+        name = ' '.join(part for part in (last_name, first_name, patronymic) if part)
+        yield [name] + cells + [present, total]
+
+
+def attendance_matrix_rows(group, date_from, date_to, chunk_size=2000):
+    """
+    Строки журнала группы за период: ученики × тренировки.
+    Ученики и отметки читаются двумя курсорами (iterator) в одном порядке и
+    сливаются на лету — в памяти только список столбцов-тренировок, id учеников
+    и одна строка. Все запросы идут в одном снимке БД (_snapshot).
+    """
+    with _snapshot():
+        trainings = list(
+            Training.objects.filter(group=group, date__gte=date_from, date__lte=date_to)
+            .order_by('date', 'time_start', 'pk')
+            .values_list('pk', 'date', 'time_start')
+        )
+        columns = {pk: i for i, (pk, _, _) in enumerate(trainings)}
+        per_day = Counter(day for _, day, _ in trainings)
+        yield ['Ученик'] + [
+            f'{day:%d.%m.%Y} {start:%H:%M}' if per_day[day] > 1 else f'{day:%d.%m.%Y}'
+            for _, day, start in trainings
+        ] + ['Присутствовал', 'Всего отметок']
+
+        students = (
+            User.objects.filter(
+                Q(training_groups__group=group, training_groups__is_active=True)
+                | Q(attendances__training_id__in=list(columns))
+            )
+            .distinct()
+            .order_by(*STUDENT_ORDERING)
+        )
+        student_ids = set(students.order_by().values_list('pk', flat=True))
+        marks = (
+            Attendance.objects.filter(training_id__in=list(columns))
+            .order_by(*[f'student__{field}' for field in STUDENT_ORDERING])
+            .values_list('student_id', 'training_id', 'present')
+            .iterator(chunk_size=chunk_size)
+        )
+        yield from merge_marks(
+            students.values_list('pk', 'last_name', 'first_name', 'patronymic').iterator(chunk_size=chunk_size),
+            marks,
+            columns,
+            student_ids,
+        )
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    # BOM и «;» — чтобы Excel с русской локалью сразу открыл файл по столбцам
+    writer = csv.writer(Echo(), delimiter=';')
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(row)
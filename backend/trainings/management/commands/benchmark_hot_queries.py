@@ -0,0 +1,216 @@
+import random
+import statistics
+import time
+from datetime import date, time as dt_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from accounts.search import normalize_search_text
+from trainings.models import Attendance, Group, GroupStudent, Gym, Homework, Training
+
+User = get_user_model()
+
+# Индексы из миграции 0015_hot_path_indexes, эффект которых меряем
+BENCHMARKED_INDEXES = [
+    (Training, 'training_date_start_idx'),
+    (Training, 'training_gym_date_idx'),
+    (Attendance, 'attendance_student_train_idx'),
+    (GroupStudent, 'groupstudent_active_stud_idx'),
+    (GroupStudent, 'groupstudent_active_group_idx'),
+    (Homework, 'homework_student_created_idx'),
+    (Homework, 'homework_training_created_idx'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетические данные, снимает планы и время горячих запросов '
+        'без индексов 0015_hot_path_indexes и с ними. Всё выполняется в транзакции '
+        'и откатывается — данные в БД не меняются. Но на время прогона (минуты) '
+        'удаляются настоящие индексы и в рабочие таблицы пишутся сотни тысяч строк: '
+        'на PostgreSQL таблицы тренировок, посещаемости, учеников групп и домашних '
+        'заданий заблокированы (ACCESS EXCLUSIVE) и для чтения. Запускайте на копии '
+        'БД; без DEBUG команда требует --force.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--trainings-per-group', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого запроса')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-plans', action='store_true', help='Не печатать планы запросов')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Запустить без DEBUG (на рабочей БД таблицы будут заблокированы на всё время прогона)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                f'DEBUG выключен, БД «{connection.settings_dict["NAME"]}» похожа на рабочую: бенчмарк '
+                'блокирует таблицы тренировок и посещаемости до конца прогона. Запустите его на копии '
+                'БД или добавьте --force.'
+            )
+        self.rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self.generate(options)
+                self.analyze()
+                queries = self.hot_queries()
+
+                self.set_indexes(present=False)
+                self.analyze()
+                before = self.measure(queries, options, 'без индексов')
+
+                self.set_indexes(present=True)
+                self.analyze()
+                after = self.measure(queries, options, 'с индексами')
+
+                self.report(queries, before, after)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Синтетические данные откатены.')
+
+    def generate(self, options):
+        rng = self.rng
+        start = time.perf_counter()
+        self.stdout.write('Генерация данных...')
+
+        coaches = User.objects.bulk_create([
+            User(username=f'bench_coach_{i}', first_name='Тренер', last_name=str(i),
+                 is_coach=True, is_student=False, password='!')
+            for i in range(max(options['groups'] // 4, 1))
+        ])
+        students = User.objects.bulk_create([
+            User(username=f'bench_student_{i}', first_name='Ученик', last_name=str(i), password='!',
+                 search_text=normalize_search_text(i, 'Ученик', f'bench_student_{i}'))
+            for i in range(options['students'])
+        ], batch_size=1000)
+        # Отдельный зал на группу: слоты разных групп не пересекаются
+        gyms = Gym.objects.bulk_create([
+            Gym(name=f'bench_gym_{i}', address='—', work_start=dt_time(7), work_end=dt_time(23))
+            for i in range(options['groups'])
+        ])
+        groups = Group.objects.bulk_create([
+            Group(name=f'bench_group_{i}', coach=coaches[i % len(coaches)], gym=gyms[i])
+            for i in range(options['groups'])
+        ])
+
+        memberships = []
+        members_by_group = {group.pk: [] for group in groups}
+        for student in students:
+            group = rng.choice(groups)
+            memberships.append(GroupStudent(group=group, student=student, is_active=True))
+            members_by_group[group.pk].append(student.pk)
+            # Часть учеников успела сменить группу: неактивные записи
+            if rng.random() < 0.3:
+                other = rng.choice(groups)
+                if other.pk != group.pk:
+                    memberships.append(GroupStudent(group=other, student=student, is_active=False))
+        GroupStudent.objects.bulk_create(memberships, batch_size=2000)
+
+        first_day = date.today() - timedelta(days=options['trainings_per_group'] * 2)
+        trainings = Training.objects.bulk_create([
+            Training(group=group, gym_id=group.gym_id, date=first_day + timedelta(days=2 * n),
+                     time_start=dt_time(18), time_end=dt_time(19, 30))
+            for group in groups
+            for n in range(options['trainings_per_group'])
+        ], batch_size=2000)
+
+        batch = []
+        homeworks = []
+        for training in trainings:
+            for student_id in members_by_group[training.group_id]:
+                batch.append(Attendance(training=training, student_id=student_id, present=rng.random() < 0.85))
+                if rng.random() < 0.02:
+                    homeworks.append(Homework(training=training, student_id=student_id, task='—', deadline=training.date))
+            if len(batch) >= 5000:
+                Attendance.objects.bulk_create(batch)
+                batch = []
+        Attendance.objects.bulk_create(batch)
+        Homework.objects.bulk_create(homeworks, batch_size=2000)
+
+        self.sample_student = rng.choice(students).pk
+        self.sample_group = rng.choice(groups)
+        self.sample_coach = self.sample_group.coach_id
+        self.stdout.write(
+            f'  учеников: {len(students)}, групп: {len(groups)}, тренировок: {len(trainings)}, '
+            f'отметок: {Attendance.objects.count()}, ДЗ: {len(homeworks)} '
+            f'({time.perf_counter() - start:.1f} с)'
+        )
+
+    def hot_queries(self):
+        today = date.today()
+        return [
+            ('Тренировки группы за месяц', Training.objects.filter(
+                group=self.sample_group, date__gte=today - timedelta(days=30), date__lte=today,
+            ).order_by('date', 'time_start')),
+            ('Календарь всех групп на неделю', Training.objects.filter(
+                date__gte=today - timedelta(days=7), date__lte=today,
+            ).order_by('date', 'time_start')),
+            ('Занятость зала по датам', Training.objects.filter(
+                gym_id=self.sample_group.gym_id, date__in=[today - timedelta(days=d) for d in range(0, 60, 2)],
+            )),
+            ('Посещаемость ученика', Attendance.objects.filter(
+                student_id=self.sample_student,
+            ).order_by('-training__date')[:50]),
+            ('Активная группа ученика', GroupStudent.objects.filter(
+                student_id=self.sample_student, is_active=True,
+            )),
+            ('Активные ученики группы', GroupStudent.objects.filter(
+                group=self.sample_group, is_active=True,
+            )),
+            ('ДЗ ученика', Homework.objects.filter(
+                student_id=self.sample_student,
+            ).order_by('-created_at')[:50]),
+            ('ДЗ групп тренера', Homework.objects.filter(
+                training__group__coach_id=self.sample_coach,
+            ).order_by('-created_at')[:50]),
+        ]
+
+    def set_indexes(self, present):
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for model, name in BENCHMARKED_INDEXES:
+                index = next(i for i in model._meta.indexes if i.name == name)
+                sql = index.create_sql(model, editor) if present else index.remove_sql(model, editor)
+                cursor.execute(str(sql))
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, queries, options, label):
+        # Меряем только выполнение SQL, без построения моделей Django
+        results = []
+        for title, queryset in queries:
+            sql, params = queryset.query.sql_with_params()
+            timings = []
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)  # прогрев кэша страниц
+                cursor.fetchall()
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - start) * 1000)
+            results.append(statistics.median(timings))
+            if not options['no_plans']:
+                self.stdout.write(f'\n--- {title} ({label}) ---')
+                self.stdout.write(queryset.explain())
+        return results
+
+    def report(self, queries, before, after):
+        self.stdout.write('\nМедиана, мс:')
+        self.stdout.write(f'{"запрос":<34} {"без индексов":>13} {"с индексами":>12} {"ускорение":>10}')
+        for (title, _), slow, fast in zip(queries, before, after):
+            speedup = slow / fast if fast else float('inf')
+            self.stdout.write(f'{title:<34} {slow:>13.2f} {fast:>12.2f} {speedup:>9.1f}x')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+from trainings.models import Attendance, AttendanceStat
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересобирает сводную таблицу посещаемости AttendanceStat из Attendance.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, help='Пересобрать только указанную группу')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        attendances = Attendance.objects.all()
+        stats = AttendanceStat.objects.all()
+        if options['group']:
+            attendances = attendances.filter(training__group_id=options['group'])
+            stats = stats.filter(group_id=options['group'])
+
+        rows = (
+            attendances
+            .annotate(month=TruncMonth('training__date'))
+            .values('student_id', 'training__group_id', 'month')
+            .annotate(present_count=Count('pk', filter=Q(present=True)), total_count=Count('pk'))
+            .order_by()
+        )
+
+        batch_size = options['batch_size']
+        created = 0
+        with transaction.atomic():
+            stats.delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(AttendanceStat(
+                    student_id=row['student_id'],
+                    group_id=row['training__group_id'],
+                    month=row['month'],
+                    present=row['present_count'],
+                    total=row['total_count'],
+                ))
+                if len(batch) >= batch_size:
+                    AttendanceStat.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                AttendanceStat.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Сводка посещаемости пересобрана: {created} строк.'))
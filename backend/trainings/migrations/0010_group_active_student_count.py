@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_active_student_count(apps, schema_editor):
+    Group = apps.get_model('trainings', 'Group')
+    GroupStudent = apps.get_model('trainings', 'GroupStudent')
+    counts = (
+        GroupStudent.objects.filter(group=models.OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('group')
+        .annotate(cnt=models.Count('pk'))
+        .values('cnt')
+    )
+    Group.objects.update(
+        active_student_count=Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0009_alter_training_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='active_student_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных учеников'),
+        ),
+        migrations.RunPython(fill_active_student_count, migrations.RunPython.noop),
+    ]
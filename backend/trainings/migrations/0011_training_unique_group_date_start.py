@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def check_duplicate_trainings(apps, schema_editor):
+    """
+    Раньше повторная тренировка группы в то же время создавалась без ошибки. Повторы
+    не удаляем (к ним может быть привязана посещаемость и домашние задания) — выводим
+    список, иначе AddConstraint упадёт с невнятной IntegrityError.
+    """
+    Training = apps.get_model('trainings', 'Training')
+    slots = defaultdict(list)
+    for pk, group_id, day, time_start in Training.objects.order_by('pk').values_list(
+        'pk', 'group_id', 'date', 'time_start'
+    ).iterator():
+        slots[(group_id, day, time_start)].append(pk)
+    duplicates = sorted((key, ids) for key, ids in slots.items() if len(ids) > 1)
+    if not duplicates:
+        return
+    lines = [
+        f"  группа {group_id}, {day} {time_start:%H:%M}: тренировки {', '.join(map(str, ids))}"
+        for (group_id, day, time_start), ids in duplicates[:50]
+    ]
+    raise RuntimeError(
+        'У групп есть повторяющиеся тренировки (показаны первые 50). '
+        'Объедините или удалите повторы и повторите migrate:\n' + '\n'.join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0010_group_active_student_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_trainings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='training',
+            constraint=models.UniqueConstraint(fields=('group', 'date', 'time_start'), name='training_unique_group_date_start'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0011_training_unique_group_date_start'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')], verbose_name='День недели')),
+                ('time_start', models.TimeField(verbose_name='Время начала')),
+                ('time_end', models.TimeField(verbose_name='Время окончания')),
+                ('topic', models.CharField(blank=True, max_length=255)),
+                ('valid_from', models.DateField(verbose_name='Действует с')),
+                ('valid_until', models.DateField(blank=True, null=True, verbose_name='Действует по')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='trainings.group')),
+            ],
+            options={
+                'verbose_name': 'Расписание группы',
+                'verbose_name_plural': 'Расписания групп',
+                'ordering': ['group', 'weekday', 'time_start'],
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_training_gym(apps, schema_editor):
+    Training = apps.get_model('trainings', 'Training')
+    Group = apps.get_model('trainings', 'Group')
+    Training.objects.update(
+        gym_id=models.Subquery(Group.objects.filter(pk=models.OuterRef('group_id')).values('gym_id')[:1])
+    )
+
+
+# Пересечение занятий в одном зале запрещено на уровне БД (только PostgreSQL:
+# GiST-индекс по диапазону времени). На SQLite проверку делает trainings.services.
+ADD_EXCLUSION_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist;",
+    """
+    ALTER TABLE trainings_training ADD CONSTRAINT training_gym_no_overlap
+        EXCLUDE USING gist (
+            gym_id WITH =,
+            tsrange(date + time_start, date + time_end, '[)') WITH &&
+        ) WHERE (time_end > time_start);
+    """,
+]
+
+DROP_EXCLUSION_SQL = "ALTER TABLE trainings_training DROP CONSTRAINT IF EXISTS training_gym_no_overlap;"
+
+
+# До этого ограничения пересечения не проверялись: уже пересекающиеся занятия
+# нужно развести вручную (перенести время или удалить лишнее — к ним может быть
+# привязана посещаемость), иначе ALTER TABLE упадёт с невнятной ошибкой
+OVERLAPS_SQL = """
+    SELECT a.id, b.id, a.gym_id, a.date, a.time_start, a.time_end, b.time_start, b.time_end
+    FROM trainings_training a
+    JOIN trainings_training b
+        ON b.gym_id = a.gym_id AND b.date = a.date AND b.id > a.id
+        AND b.time_start < a.time_end AND a.time_start < b.time_end
+    WHERE a.time_end > a.time_start AND b.time_end > b.time_start
+    ORDER BY a.date, a.gym_id
+    LIMIT 50
+"""
+
+
+def check_existing_overlaps(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(OVERLAPS_SQL)
+        overlaps = cursor.fetchall()
+    if overlaps:
+        lines = [
+            f'  зал {gym_id}, {day}: тренировка {first} ({start_a:%H:%M}–{end_a:%H:%M}) '
+            f'и {second} ({start_b:%H:%M}–{end_b:%H:%M})'
+            for first, second, gym_id, day, start_a, end_a, start_b, end_b in overlaps
+        ]
+        raise RuntimeError(
+            'В одном зале есть пересекающиеся тренировки (показаны первые 50). '
+            'Перенесите или удалите их и повторите migrate:\n' + '\n'.join(lines)
+        )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        check_existing_overlaps(schema_editor)
+        for sql in ADD_EXCLUSION_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_EXCLUSION_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0012_trainingschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='training',
+            name='gym',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trainings', to='trainings.gym'),
+        ),
+        migrations.RunPython(fill_training_gym, migrations.RunPython.noop),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
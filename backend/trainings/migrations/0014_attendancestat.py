@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trainings', '0013_training_gym'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('present', models.PositiveIntegerField(default=0, verbose_name='Присутствовал')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего отметок')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_stats', to='trainings.group')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Сводка посещаемости',
+                'verbose_name_plural': 'Сводки посещаемости',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attendancestat',
+            constraint=models.UniqueConstraint(fields=('student', 'group', 'month'), name='attendance_stat_unique_cell'),
+        ),
+    ]
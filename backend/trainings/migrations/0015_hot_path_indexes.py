@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trainings', '0014_attendancestat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'training'], name='attendance_student_train_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupstudent',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['student'], name='groupstudent_active_stud_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupstudent',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['group'], name='groupstudent_active_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['student', '-created_at'], name='homework_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['training', '-created_at'], name='homework_training_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['date', 'time_start'], name='training_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='training',
+            index=models.Index(fields=['gym', 'date'], name='training_gym_date_idx'),
+        ),
+    ]
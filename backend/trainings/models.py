@@ -1,9 +1,17 @@
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
 from django.conf import settings
 from django.utils import timezone
+from datetime import timedelta
 
 User = settings.AUTH_USER_MODEL
 
+# Членство учеников в группах изменено в обход save() (QuerySet.update, bulk_create).
+# Аргумент student_ids — затронутые ученики.
+memberships_changed = Signal()
+
 class Gym(models.Model):
     name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
@@ -24,6 +32,10 @@ class Group(models.Model):
     gym = models.ForeignKey(Gym, on_delete=models.CASCADE)
     min_age = models.PositiveIntegerField(null=True, blank=True, verbose_name='Возраст от')
     max_age = models.PositiveIntegerField(null=True, blank=True, verbose_name='Возраст до')
+    # Денормализованный счётчик активных учеников (для сортировки/фильтрации без агрегации).
+    # При save()/delete() GroupStudent пересчитывается сигналами, при QuerySet.update и
+    # bulk_create — явным вызовом refresh_student_counts.
+    active_student_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных учеников')
     
     class Meta:
         verbose_name = 'Группа'
@@ -32,8 +44,36 @@ class Group(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Зал денормализован в Training для ограничения на пересечение слотов
+        Training.objects.filter(group_id=self.pk).exclude(gym_id=self.gym_id).update(gym_id=self.gym_id)
+
+    @staticmethod
+    def active_students_subquery():
+        """Подзапрос с числом активных учеников группы (для annotate/update)."""
+        counts = (
+            GroupStudent.objects.filter(group=models.OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('group')
+            .annotate(cnt=models.Count('pk'))
+            .values('cnt')
+        )
+        return Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0
+        )
+
+    @classmethod
+    def refresh_student_counts(cls, group_ids):
+        """Пересчитывает active_student_count для указанных групп одним UPDATE."""
+        group_ids = {gid for gid in group_ids if gid}
+        if group_ids:
+            cls.objects.filter(pk__in=group_ids).update(active_student_count=cls.active_students_subquery())
+
 class Training(models.Model):
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='trainings')
+    # Копия group.gym: по (gym, время) в PostgreSQL стоит exclusion-ограничение
+    gym = models.ForeignKey(Gym, on_delete=models.CASCADE, related_name='trainings', null=True, editable=False)
     date = models.DateField()
     time_start = models.TimeField(verbose_name='Время начала')
     time_end = models.TimeField(verbose_name='Время окончания')
@@ -44,10 +84,89 @@ class Training(models.Model):
         verbose_name = 'Тренировка'
         verbose_name_plural = 'Тренировки'
         ordering = ['date', 'time_start']
+        constraints = [
+            # Уникальный индекс заодно обслуживает фильтр по (group, date, time_start)
+            models.UniqueConstraint(fields=['group', 'date', 'time_start'], name='training_unique_group_date_start'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'time_start'], name='training_date_start_idx'),
+            models.Index(fields=['gym', 'date'], name='training_gym_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.group} - {self.date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._gym_group_id = instance.__dict__.get('group_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Зал берётся из группы, только если группа новая или сменилась: из уже
+        # загруженной группы или одним values_list, без запроса на каждое сохранение
+        group_changed = self.group_id != getattr(self, '_gym_group_id', None)
+        if group_changed or ('gym_id' in self.__dict__ and self.gym_id is None):
+            group_field = self._meta.get_field('group')
+            if group_field.is_cached(self) and self.group.pk == self.group_id:
+                self.gym_id = self.group.gym_id
+            else:
+                self.gym_id = Group.objects.filter(pk=self.group_id).values_list('gym_id', flat=True).first()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'group' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'gym'}
+        super().save(*args, **kwargs)
+        self._gym_group_id = self.group_id
+
+class TrainingSchedule(models.Model):
+    """Еженедельный слот группы. Занятия по нему разворачиваются на лету и
+    сохраняются в Training только при первой записи (посещаемость, ДЗ, тема)."""
+    WEEKDAY_CHOICES = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    ]
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='schedules')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name='День недели')
+    time_start = models.TimeField(verbose_name='Время начала')
+    time_end = models.TimeField(verbose_name='Время окончания')
+    topic = models.CharField(max_length=255, blank=True)
+    valid_from = models.DateField(verbose_name='Действует с')
+    valid_until = models.DateField(null=True, blank=True, verbose_name='Действует по')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Расписание группы'
+        verbose_name_plural = 'Расписания групп'
+        ordering = ['group', 'weekday', 'time_start']
+
+    def __str__(self):
+        return f"{self.group} - {self.get_weekday_display()} {self.time_start:%H:%M}"
+
+    def occurs_on(self, day):
+        return (
+            day.weekday() == self.weekday
+            and day >= self.valid_from
+            and (self.valid_until is None or day <= self.valid_until)
+        )
+
+    def occurrences(self, date_from, date_to):
+        """Даты занятий в окне [date_from, date_to]."""
+        start = max(date_from, self.valid_from)
+        end = date_to if self.valid_until is None else min(date_to, self.valid_until)
+        day = start + timedelta(days=(self.weekday - start.weekday()) % 7)
+        while day <= end:
+            yield day
+            day += timedelta(days=7)
+
+    def occurrence_key(self, day):
+        return f"{self.pk}:{day.isoformat()}"
+
 class Homework(models.Model):
     training = models.ForeignKey(Training, on_delete=models.CASCADE, related_name='homeworks', null=True, blank=True)
     student = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'is_student': True}, related_name='homeworks')
@@ -60,6 +179,10 @@ class Homework(models.Model):
         verbose_name = 'Домашнее задание'
         verbose_name_plural = 'Домашние задания'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', '-created_at'], name='homework_student_created_idx'),
+            models.Index(fields=['training', '-created_at'], name='homework_training_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student} - {self.task[:50]}"
@@ -76,6 +199,9 @@ class Attendance(models.Model):
         verbose_name_plural = 'Посещаемость'
         unique_together = ['training', 'student']
         ordering = ['-training__date']
+        indexes = [
+            models.Index(fields=['student', 'training'], name='attendance_student_train_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student} - {self.training.date}"
@@ -90,6 +216,49 @@ class GroupStudent(models.Model):
         verbose_name = 'Ученик группы'
         verbose_name_plural = 'Ученики групп'
         unique_together = ['group', 'student']
+        indexes = [
+            models.Index(fields=['student'], condition=models.Q(is_active=True), name='groupstudent_active_stud_idx'),
+            models.Index(fields=['group'], condition=models.Q(is_active=True), name='groupstudent_active_group_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.student} в {self.group}"
\ No newline at end of file
+        return f"{self.student} в {self.group}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_group_id = instance.__dict__.get('group_id')
+        return instance
+
+
+def refresh_membership_counts(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete GroupStudent: счётчик новой и прежней группы (админка, каскадное удаление)."""
+    if raw:
+        return
+    Group.refresh_student_counts({instance.group_id, getattr(instance, '_counted_group_id', None)})
+    instance._counted_group_id = instance.group_id
+
+
+class AttendanceStat(models.Model):
+    """Сводка посещаемости: ученик × группа × месяц. Обновляется при записи Attendance."""
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_stats')
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='attendance_stats')
+    month = models.DateField(verbose_name='Месяц')
+    present = models.PositiveIntegerField(default=0, verbose_name='Присутствовал')
+    total = models.PositiveIntegerField(default=0, verbose_name='Всего отметок')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Сводка посещаемости'
+        verbose_name_plural = 'Сводки посещаемости'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'group', 'month'], name='attendance_stat_unique_cell'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.group} - {self.month:%m.%Y}: {self.present}/{self.total}"
+
+
+post_save.connect(refresh_membership_counts, sender=GroupStudent)
+post_delete.connect(refresh_membership_counts, sender=GroupStudent)
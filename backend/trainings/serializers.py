@@ -1,12 +1,15 @@
 from rest_framework import serializers
-from .models import Gym, Group, Training, Homework, Attendance, GroupStudent
+from django.contrib.auth import get_user_model
+from .models import Gym, Group, Training, TrainingSchedule, Homework, Attendance, AttendanceStat, GroupStudent
+from .services import find_group_move_conflicts, find_gym_conflicts, find_schedule_conflicts
+from config.fieldsets import SparseFieldsetMixin
 
-class GymSerializer(serializers.ModelSerializer):
+class GymSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Gym
         fields = '__all__'
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     coach_name = serializers.CharField(source='coach.get_full_name', read_only=True)
     gym_name = serializers.CharField(source='gym.name', read_only=True)
     gym_address = serializers.CharField(source='gym.address', read_only=True)
@@ -17,26 +20,98 @@ class GroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = ['id', 'name', 'coach', 'coach_name', 'gym', 'gym_name', 'gym_address',
-                 'gym_work_start', 'gym_work_end', 'min_age', 'max_age', 'student_count']
+                 'gym_work_start', 'gym_work_end', 'min_age', 'max_age', 'student_count',
+                 'active_student_count']
+        read_only_fields = ['active_student_count']
+        # В списке приходит аннотацией, иначе считается отдельным запросом
+        field_dependencies = {'student_count': []}
     
+    def validate(self, attrs):
+        # Зал денормализован в тренировках группы (Group.save): при переезде они не должны
+        # пересечься с занятиями нового зала
+        gym = attrs.get('gym')
+        if self.instance is not None and gym is not None and gym.pk != self.instance.gym_id:
+            errors = find_group_move_conflicts(self.instance, gym)
+            if errors:
+                raise serializers.ValidationError({'gym': errors})
+        return attrs
+
     def get_student_count(self, obj):
+        # В списке число учеников приходит аннотацией из GroupViewSet.get_queryset
+        annotated = getattr(obj, 'annotated_student_count', None)
+        if annotated is not None:
+            return annotated
         return obj.students.filter(is_active=True).count()
 
-class TrainingSerializer(serializers.ModelSerializer):
+class TrainingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     group_name = serializers.CharField(source='group.name', read_only=True)
     coach_name = serializers.CharField(source='group.coach.get_full_name', read_only=True)
     gym_name = serializers.CharField(source='group.gym.name', read_only=True)
     gym_address = serializers.CharField(source='group.gym.address', read_only=True)
     gym_work_start = serializers.TimeField(source='group.gym.work_start', read_only=True)
     gym_work_end = serializers.TimeField(source='group.gym.work_end', read_only=True)
+    occurrence = serializers.SerializerMethodField()
+    is_virtual = serializers.SerializerMethodField()
     
     class Meta:
         model = Training
         fields = ['id', 'group', 'group_name', 'coach_name', 'gym_name', 'gym_address',
-                 'gym_work_start', 'gym_work_end', 'date', 'time_start', 'time_end', 'topic', 'created_at']
+                 'gym_work_start', 'gym_work_end', 'date', 'time_start', 'time_end', 'topic', 'created_at',
+                 'occurrence', 'is_virtual']
+        read_only_fields = ['created_at']
+        field_dependencies = {'occurrence': [], 'is_virtual': []}
+
+    def validate(self, attrs):
+        group = attrs.get('group', getattr(self.instance, 'group', None))
+        slot = tuple(
+            attrs.get(name, getattr(self.instance, name, None))
+            for name in ('date', 'time_start', 'time_end')
+        )
+        if group and all(slot):
+            error = find_gym_conflicts(group, [slot], exclude_ids=[getattr(self.instance, 'pk', None)])[0]
+            if error:
+                raise serializers.ValidationError(error)
+        return attrs
+
+    def get_occurrence(self, obj):
+        # Ключ занятия из расписания; для сохранённых тренировок — None
+        return getattr(obj, 'occurrence_key', None)
+
+    def get_is_virtual(self, obj):
+        return obj.pk is None
+
+
+class TrainingScheduleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    group_name = serializers.CharField(source='group.name', read_only=True)
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+
+    class Meta:
+        model = TrainingSchedule
+        fields = ['id', 'group', 'group_name', 'weekday', 'weekday_display', 'time_start', 'time_end',
+                 'topic', 'valid_from', 'valid_until', 'created_at']
         read_only_fields = ['created_at']
 
-class HomeworkSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        time_start = attrs.get('time_start', getattr(self.instance, 'time_start', None))
+        time_end = attrs.get('time_end', getattr(self.instance, 'time_end', None))
+        if time_start and time_end and time_end <= time_start:
+            raise serializers.ValidationError({'time_end': 'Время окончания должно быть позже времени начала.'})
+        valid_from = attrs.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_until = attrs.get('valid_until', getattr(self.instance, 'valid_until', None))
+        if valid_from and valid_until and valid_until < valid_from:
+            raise serializers.ValidationError({'valid_until': 'Дата окончания раньше даты начала.'})
+        group = attrs.get('group', getattr(self.instance, 'group', None))
+        weekday = attrs.get('weekday', getattr(self.instance, 'weekday', None))
+        if group and weekday is not None and time_start and time_end and valid_from:
+            error = find_schedule_conflicts(
+                group, weekday, time_start, time_end, valid_from, valid_until,
+                exclude_id=getattr(self.instance, 'pk', None),
+            )
+            if error:
+                raise serializers.ValidationError(error)
+        return attrs
+
+class HomeworkSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     training_date = serializers.SerializerMethodField()
     training_topic = serializers.SerializerMethodField()
@@ -46,6 +121,7 @@ class HomeworkSerializer(serializers.ModelSerializer):
         fields = ['id', 'training', 'training_date', 'training_topic', 'student', 
                  'student_name', 'task', 'deadline', 'completed', 'created_at']
         read_only_fields = ['created_at']
+        field_dependencies = {'training_date': ['training__date'], 'training_topic': ['training__topic']}
     
     def get_training_date(self, obj):
         return obj.training.date if obj.training else None
@@ -53,7 +129,7 @@ class HomeworkSerializer(serializers.ModelSerializer):
     def get_training_topic(self, obj):
         return obj.training.topic if obj.training else None
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     training_date = serializers.DateField(source='training.date', read_only=True)
     training_time_start = serializers.TimeField(source='training.time_start', read_only=True)
@@ -66,7 +142,59 @@ class AttendanceSerializer(serializers.ModelSerializer):
                  'student', 'student_name', 'present', 'notes', 'created_at']
         read_only_fields = ['created_at']
 
-class GroupStudentSerializer(serializers.ModelSerializer):
+class AttendanceBulkItemSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    present = serializers.BooleanField(default=True)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class AttendanceBulkSerializer(serializers.Serializer):
+    """Отметка посещаемости всей группы за тренировку одним запросом."""
+    training = serializers.PrimaryKeyRelatedField(queryset=Training.objects.select_related('group'))
+    records = AttendanceBulkItemSerializer(many=True, allow_empty=False)
+
+    def validate_records(self, records):
+        student_ids = [r['student'] for r in records]
+        if len(set(student_ids)) != len(student_ids):
+            raise serializers.ValidationError('Ученик указан в списке несколько раз.')
+        existing = set(
+            get_user_model().objects.filter(pk__in=student_ids).values_list('pk', flat=True)
+        )
+        missing = [sid for sid in student_ids if sid not in existing]
+        if missing:
+            raise serializers.ValidationError(f'Ученики не найдены: {missing}')
+        return records
+
+    def validate(self, attrs):
+        # Отметки попадают в сводки и журнал группы — только для учеников этой группы
+        training = attrs['training']
+        members = set(
+            GroupStudent.objects.filter(group_id=training.group_id).values_list('student_id', flat=True)
+        )
+        errors = [
+            {} if record['student'] in members else {'student': ['Ученик не состоит в группе этой тренировки.']}
+            for record in attrs['records']
+        ]
+        if any(errors):
+            raise serializers.ValidationError({'records': errors})
+        return attrs
+
+
+class AttendanceStatSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.get_full_name', read_only=True)
+    group_name = serializers.CharField(source='group.name', read_only=True)
+    rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttendanceStat
+        fields = ['id', 'student', 'student_name', 'group', 'group_name', 'month', 'present', 'total', 'rate']
+        field_dependencies = {'rate': ['present', 'total']}
+
+    def get_rate(self, obj):
+        return round(obj.present / obj.total, 4) if obj.total else None
+
+
+class GroupStudentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     group_name = serializers.CharField(source='group.name', read_only=True)
     student_first_name = serializers.CharField(source='student.first_name', read_only=True)
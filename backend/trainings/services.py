@@ -0,0 +1,344 @@
+import copy
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Attendance, AttendanceStat, GroupStudent, Training, TrainingSchedule
+
+User = get_user_model()
+
+
+TRAINING_INSERT_FIELDS = ('group', 'gym', 'date', 'time_start', 'time_end', 'topic', 'created_at')
+
+
+def insert_trainings(group, dates, time_start, time_end, topic=''):
+    """
+    Вставляет тренировки группы на список дат одним INSERT ... ON CONFLICT DO NOTHING.
+    Дубликаты отсекает уникальный индекс (group, date, time_start), а в PostgreSQL ещё и
+    exclusion-ограничение на пересечение слотов в зале, а не предварительные exists()-проверки.
+    Возвращает (созданные тренировки, отклонённые даты).
+    """
+    if not dates:
+        return [], []
+
+    now = timezone.now()
+    opts = Training._meta
+    fields = [opts.get_field(name) for name in TRAINING_INSERT_FIELDS]
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(f.column) for f in fields)
+    returning_columns = f"{qn(opts.pk.column)}, {qn(opts.get_field('date').column)}"
+    returning = connection.features.can_return_rows_from_bulk_insert
+    batch_size = max(connection.ops.bulk_batch_size(fields, dates), 1)
+
+    inserted_ids = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(dates), batch_size):
+            batch = dates[start:start + batch_size]
+            params = []
+            for d in batch:
+                values = (group.pk, group.gym_id, d, time_start, time_end, topic, now)
+                params.extend(
+                    f.get_db_prep_save(v, connection) for f, v in zip(fields, values)
+                )
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(batch))
+            sql = (
+                f'INSERT INTO {qn(opts.db_table)} ({columns}) VALUES {placeholders} '
+                'ON CONFLICT DO NOTHING'
+            )
+            if returning:
+                cursor.execute(f'{sql} RETURNING {returning_columns}', params)
+                inserted_ids.update((str(row_date), pk) for pk, row_date in cursor.fetchall())
+            else:
+                cursor.execute(sql, params)
+
+    if not returning:
+        # Без RETURNING отличаем свои строки по общему created_at этой вставки
+        inserted_ids = {
+            str(d): pk for pk, d in Training.objects.filter(
+                group=group, time_start=time_start, date__in=dates, created_at=now
+            ).values_list('pk', 'date')
+        }
+
+    created, duplicates = [], []
+    for d in dates:
+        pk = inserted_ids.get(d.isoformat())
+        if pk is None:
+            duplicates.append(d)
+            continue
+        created.append(Training(
+            pk=pk, group=group, gym_id=group.gym_id, date=d, time_start=time_start, time_end=time_end,
+            topic=topic, created_at=now,
+        ))
+    return created, duplicates
+
+
+class GymIntervalIndex:
+    """
+    Занятые интервалы зала по датам: отсортированы по началу, плюс префиксный
+    максимум окончаний. Проверка пересечения — бинарный поиск, O(log n).
+    """
+
+    def __init__(self, intervals):
+        by_date = defaultdict(list)
+        for day, start, end, label in intervals:
+            by_date[day].append((start, end, label))
+        self._starts, self._max_end = {}, {}
+        for day, items in by_date.items():
+            items.sort(key=lambda item: item[0])
+            self._starts[day] = [start for start, _, _ in items]
+            max_end, best = [], None
+            for start, end, label in items:
+                if best is None or end > best[0]:
+                    best = (end, label)
+                max_end.append(best)
+            self._max_end[day] = max_end
+
+    def find_overlap(self, day, start, end):
+        """Подпись интервала, пересекающегося с [start, end), или None."""
+        starts = self._starts.get(day)
+        if not starts:
+            return None
+        idx = bisect_left(starts, end)
+        if idx == 0:
+            return None
+        latest_end, label = self._max_end[day][idx - 1]
+        return label if latest_end > start else None
+
+
+def find_gym_conflicts(group, slots, exclude_ids=()):
+    """
+    Проверяет слоты (date, time_start, time_end) группы: часы работы зала и
+    пересечения с другими тренировками в этом зале и между собой.
+    Возвращает список той же длины: текст ошибки или None. Один запрос к БД.
+    """
+    gym = group.gym
+    errors = [None] * len(slots)
+    if not slots:
+        return errors
+
+    busy = (
+        Training.objects.filter(gym_id=gym.pk, date__in={day for day, _, _ in slots})
+        .exclude(pk__in=[pk for pk in exclude_ids if pk])
+        .values_list('date', 'time_start', 'time_end', 'group__name')
+    )
+    index = GymIntervalIndex(
+        (day, start, end, f'{name} {start:%H:%M}–{end:%H:%M}')
+        for day, start, end, name in busy
+        if end > start
+    )
+
+    # Сами новые слоты тоже не должны пересекаться: проверяем по возрастанию начала
+    latest_new_end = {}
+    for i in sorted(range(len(slots)), key=lambda i: (slots[i][0], slots[i][1])):
+        day, start, end = slots[i]
+        if end <= start:
+            errors[i] = 'Время окончания должно быть позже времени начала.'
+        elif start < gym.work_start or (gym.work_end is not None and end > gym.work_end):
+            work_end = f'{gym.work_end:%H:%M}' if gym.work_end else '…'
+            errors[i] = f'{day.isoformat()}: вне часов работы зала ({gym.work_start:%H:%M}–{work_end}).'
+        else:
+            overlap = index.find_overlap(day, start, end)
+            if overlap:
+                errors[i] = f'{day.isoformat()}: зал «{gym.name}» занят ({overlap}).'
+            elif latest_new_end.get(day) and latest_new_end[day] > start:
+                errors[i] = f'{day.isoformat()}: слоты в запросе пересекаются.'
+            else:
+                latest_new_end[day] = max(end, latest_new_end.get(day, end))
+    return errors
+
+
+def find_group_move_conflicts(group, gym, limit=10):
+    """
+    Ошибки для тренировок группы при переезде в зал gym: пересечения с занятиями
+    этого зала и часы его работы. Не больше limit сообщений.
+    """
+    moved = copy.copy(group)
+    moved.gym = gym
+    slots = list(Training.objects.filter(group_id=group.pk).values_list('date', 'time_start', 'time_end'))
+    errors = [error for error in find_gym_conflicts(moved, slots) if error]
+    return errors[:limit]
+
+
+def find_schedule_conflicts(group, weekday, time_start, time_end, valid_from, valid_until=None, exclude_id=None):
+    """Проверяет еженедельный слот: часы работы зала и пересечение с расписаниями других групп в зале."""
+    gym = group.gym
+    if time_start < gym.work_start or (gym.work_end is not None and time_end > gym.work_end):
+        return 'Слот вне часов работы зала.'
+    overlapping = TrainingSchedule.objects.filter(
+        group__gym_id=gym.pk,
+        weekday=weekday,
+        time_start__lt=time_end,
+        time_end__gt=time_start,
+    ).filter(
+        models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=valid_from)
+    )
+    if valid_until is not None:
+        overlapping = overlapping.filter(valid_from__lte=valid_until)
+    if exclude_id:
+        overlapping = overlapping.exclude(pk=exclude_id)
+    other = overlapping.select_related('group').first()
+    if other:
+        return f'Зал «{gym.name}» занят по расписанию: {other}.'
+    return None
+
+
+def expand_schedules(schedules, date_from, date_to, existing=()):
+    """
+    Разворачивает расписания в несохранённые Training на окно дат.
+    Слоты, для которых уже есть настоящая тренировка (existing), пропускаются.
+    """
+    taken = {(t.group_id, t.date, t.time_start) for t in existing}
+    virtual = []
+    for schedule in schedules:
+        for day in schedule.occurrences(date_from, date_to):
+            if (schedule.group_id, day, schedule.time_start) in taken:
+                continue
+            training = Training(
+                group=schedule.group, date=day, time_start=schedule.time_start,
+                time_end=schedule.time_end, topic=schedule.topic, created_at=None,
+            )
+            training.occurrence_key = schedule.occurrence_key(day)
+            virtual.append(training)
+    return virtual
+
+
+def resolve_occurrence(key):
+    """Разбирает ключ занятия из расписания вида '<schedule_id>:<YYYY-MM-DD>'."""
+    try:
+        schedule_id, day = str(key).split(':', 1)
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+        schedule = TrainingSchedule.objects.select_related('group__coach', 'group__gym').get(pk=int(schedule_id))
+    except (ValueError, TrainingSchedule.DoesNotExist):
+        raise ValueError(f'Неверный идентификатор занятия: {key}')
+    if not schedule.occurs_on(day):
+        raise ValueError(f'По расписанию нет занятия на {day.isoformat()}')
+    return schedule, day
+
+
+def materialize_occurrence(schedule, day, topic=None):
+    """Создаёт (или возвращает существующую) тренировку для занятия из расписания."""
+    try:
+        training, created = Training.objects.get_or_create(
+            group=schedule.group,
+            date=day,
+            time_start=schedule.time_start,
+            defaults={
+                'time_end': schedule.time_end,
+                'topic': schedule.topic if topic is None else topic,
+            },
+        )
+    except IntegrityError:
+        # Слот пересёкся с другой тренировкой в зале (exclusion-ограничение)
+        raise ValueError(f'{day.isoformat()}: время в зале уже занято.')
+    if not created and topic is not None and training.topic != topic:
+        training.topic = topic
+        training.save(update_fields=['topic'])
+    return training
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def attendance_stat_key(student_id, training):
+    """Ячейка сводки посещаемости: (ученик, группа, месяц)."""
+    return student_id, training.group_id, month_start(training.date)
+
+
+def training_stat_keys(training):
+    """Ячейки сводки, которые затрагивают все отметки тренировки (при её переносе/удалении)."""
+    return {
+        attendance_stat_key(student_id, training)
+        for student_id in training.attendances.values_list('student_id', flat=True)
+    }
+
+
+def refresh_attendance_stats(keys):
+    """
+    Пересчитывает только затронутые ячейки AttendanceStat: один агрегирующий
+    запрос по Attendance этих учеников/групп/месяцев и один upsert.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    students_by_bucket = defaultdict(set)
+    for student_id, group_id, month in keys:
+        students_by_bucket[(group_id, month)].add(student_id)
+    condition = Q()
+    for (group_id, month), student_ids in students_by_bucket.items():
+        condition |= Q(
+            training__group_id=group_id,
+            training__date__gte=month,
+            training__date__lt=next_month(month),
+            student_id__in=student_ids,
+        )
+
+    rows = (
+        Attendance.objects.filter(condition)
+        .annotate(month=TruncMonth('training__date'))
+        .values('student_id', 'training__group_id', 'month')
+        .annotate(present_count=Count('pk', filter=Q(present=True)), total_count=Count('pk'))
+        .order_by()
+    )
+    stats = [
+        AttendanceStat(
+            student_id=row['student_id'],
+            group_id=row['training__group_id'],
+            month=row['month'],
+            present=row['present_count'],
+            total=row['total_count'],
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        if stats:
+            AttendanceStat.objects.bulk_create(
+                stats,
+                update_conflicts=True,
+                unique_fields=['student', 'group', 'month'],
+                update_fields=['present', 'total', 'updated_at'],
+            )
+        # Ячейки, в которых не осталось отметок, удаляем
+        emptied = keys - {(stat.student_id, stat.group_id, stat.month) for stat in stats}
+        if emptied:
+            empty_condition = Q()
+            for student_id, group_id, month in emptied:
+                empty_condition |= Q(student_id=student_id, group_id=group_id, month=month)
+            AttendanceStat.objects.filter(empty_condition).delete()
+
+
+def years_ago(day, years):
+    """Та же дата years лет назад (29 февраля -> 28 февраля)."""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def unassigned_students(group=None):
+    """
+    Ученики без активной группы: анти-join NOT EXISTS по GroupStudent вместо
+    выгрузки id в Python и NOT IN (...). С group — только подходящие ей по возрасту
+    (без даты рождения в группу с ограничением по возрасту не попадают).
+    """
+    in_group = GroupStudent.objects.filter(student=OuterRef('pk'), is_active=True)
+    queryset = User.objects.filter(is_student=True).filter(~Exists(in_group))
+    if group is not None and (group.min_age is not None or group.max_age is not None):
+        today = timezone.localdate()
+        if group.min_age is not None:
+            queryset = queryset.filter(date_of_birth__lte=years_ago(today, group.min_age))
+        if group.max_age is not None:
+            queryset = queryset.filter(date_of_birth__gt=years_ago(today, group.max_age + 1))
+    return queryset.order_by('last_name', 'first_name', 'pk')
@@ -0,0 +1,588 @@
+import csv
+import datetime
+import io
+import zipfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from config.query_budget import QueryBudgetExceeded
+from config.testing import ApiTestCase
+from trainings.models import Attendance, AttendanceStat, Group, GroupStudent, Gym, Homework, Training, TrainingSchedule
+from trainings.exports import merge_marks
+from trainings.views import TrainingViewSet
+
+
+def day(offset):
+    return datetime.date(2026, 1, 1) + datetime.timedelta(days=offset)
+
+
+class TrainingQueryBudgetTests(ApiTestCase):
+    """Списки и карточка тренировки укладываются в query_budget (QUERY_BUDGET_RAISE в тестах)."""
+
+    def setUp(self):
+        super().setUp()
+        # Тренировки разных групп, тренеров и залов: N+1 по любой связи превысит бюджет
+        for index in range(12):
+            coach = User.objects.create(username=f'coach{index}', is_coach=True, first_name=f'Тренер{index}')
+            gym = Gym.objects.create(name=f'Зал {index}', address='адрес', work_start=datetime.time(8))
+            group = Group.objects.create(name=f'Группа {index}', coach=coach, gym=gym)
+            Training.objects.create(
+                group=group, date=day(index), time_start=datetime.time(10), time_end=datetime.time(11)
+            )
+        self.client.logout()
+        self.client.login(username='admin', password=self.password)
+
+    def test_list_within_budget(self):
+        response = self.client.get('/api/trainings/trainings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 12)
+        self.assertEqual(len({item['coach_name'] for item in response.json()}), 12)
+
+    def test_list_with_date_window_within_budget(self):
+        response = self.client.get('/api/trainings/trainings/?date_after=2026-01-01&date_before=2026-01-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 12)
+
+    def test_retrieve_within_budget(self):
+        training = Training.objects.first()
+        response = self.client.get(f'/api/trainings/trainings/{training.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_budget_exceeded_raises(self):
+        with mock.patch.object(TrainingViewSet, 'query_budget', {'list': 2}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/trainings/trainings/')
+
+
+class KeysetPaginationTests(ApiTestCase):
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_pages_through_submillisecond_timestamps(self):
+        created = timezone.now().replace(microsecond=0)
+        training = Training.objects.create(
+            group=self.group, date=day(0), time_start=datetime.time(10), time_end=datetime.time(11)
+        )
+        homeworks = [
+            Homework.objects.create(
+                training=training, student=self.students[0], task=f'Задание {index}', deadline=day(30),
+                created_at=created + datetime.timedelta(microseconds=70 * index),
+            )
+            for index in range(12)
+        ]
+        ids = self.collect_pages('/api/trainings/homeworks/?cursor=&page_size=5')
+        self.assertEqual(ids, [homework.pk for homework in reversed(homeworks)])
+
+    def test_pages_by_date_and_time(self):
+        trainings = [
+            Training.objects.create(
+                group=self.group, date=day(index // 3), time_start=datetime.time(8 + index % 3),
+                time_end=datetime.time(9 + index % 3),
+            )
+            for index in range(10)
+        ]
+        ids = self.collect_pages('/api/trainings/trainings/?cursor=&page_size=4')
+        self.assertEqual(ids, [training.pk for training in trainings])
+
+    def test_invalid_cursor(self):
+        for cursor in ('!!!', 'eyJhIjoxfQ', 'W3siZGF0ZSI6Inh4In0sMV0'):
+            response = self.client.get(f'/api/trainings/trainings/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+
+
+class GymConflictTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_group = Group.objects.create(name='Старшая', coach=self.coach, gym=self.gym)
+        Training.objects.create(
+            group=self.group, date=day(4), time_start=datetime.time(18), time_end=datetime.time(19, 30)
+        )
+
+    def post_training(self, group, date, start, end):
+        return self.client.post('/api/trainings/trainings/', {
+            'group': group.pk, 'date': date.isoformat(), 'time_start': start, 'time_end': end,
+        }, format='json')
+
+    def test_training_copies_group_gym(self):
+        self.assertEqual(Training.objects.get().gym_id, self.gym.pk)
+
+    def test_save_reads_gym_only_when_group_changes(self):
+        training = Training.objects.get()
+        training.topic = 'Ката'
+        with self.assertNumQueries(1):
+            training.save()
+        with self.assertNumQueries(1):
+            Training.objects.create(
+                group=self.other_group, date=day(6), time_start=datetime.time(10), time_end=datetime.time(11)
+            )
+        new_gym = Gym.objects.create(name='Новый зал', address='адрес', work_start=datetime.time(8))
+        Group.objects.filter(pk=self.other_group.pk).update(gym=new_gym)
+        training.group_id = self.other_group.pk
+        with self.assertNumQueries(2):
+            training.save(update_fields=['group'])
+        self.assertEqual(Training.objects.get(pk=training.pk).gym_id, new_gym.pk)
+
+    def test_overlap_and_working_hours(self):
+        self.assertEqual(self.post_training(self.other_group, day(4), '19:00', '20:00').status_code, 400)
+        self.assertEqual(self.post_training(self.other_group, day(4), '19:30', '20:00').status_code, 201)
+        self.assertEqual(self.post_training(self.other_group, day(5), '07:00', '08:30').status_code, 400)
+
+    def test_bulk_create_skips_busy_dates(self):
+        dates = [day(offset).isoformat() for offset in range(30)]
+        response = self.client.post('/api/trainings/trainings/bulk_create/', {
+            'group': self.other_group.pk, 'time_start': '18:30', 'time_end': '19:00', 'dates': dates,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 29)
+        self.assertEqual(len(response.json()['errors']), 1)
+
+    def test_schedule_overlap(self):
+        response = self.client.post('/api/trainings/schedules/', {
+            'group': self.group.pk, 'weekday': 0, 'time_start': '18:00', 'time_end': '19:30',
+            'valid_from': '2026-01-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/trainings/schedules/', {
+            'group': self.other_group.pk, 'weekday': 0, 'time_start': '19:00', 'time_end': '20:30',
+            'valid_from': '2025-01-01', 'valid_until': '2026-02-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_move_checks_new_gym(self):
+        new_gym = Gym.objects.create(name='Новый зал', address='адрес', work_start=datetime.time(8))
+        resident = Group.objects.create(name='Местная', coach=self.coach, gym=new_gym)
+        Training.objects.create(
+            group=resident, date=day(4), time_start=datetime.time(19), time_end=datetime.time(20)
+        )
+        self.client.login(username='admin', password=self.password)
+        url = f'/api/trainings/groups/{self.group.pk}/'
+        response = self.client.patch(url, {'gym': new_gym.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('gym', response.json())
+        self.assertEqual(Training.objects.get(group=self.group).gym_id, self.gym.pk)
+
+        Training.objects.filter(group=resident).update(time_start=datetime.time(20), time_end=datetime.time(21))
+        response = self.client.patch(url, {'gym': new_gym.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Training.objects.get(group=self.group).gym_id, new_gym.pk)
+
+
+class StudentCountTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Group.objects.create(name='Старшая', coach=self.coach, gym=self.gym)
+
+    def counts(self):
+        return list(Group.objects.filter(pk__in=[self.group.pk, self.other.pk])
+                    .order_by('pk').values_list('active_student_count', flat=True))
+
+    def test_plain_save_and_delete_refresh_counts(self):
+        self.assertEqual(self.counts(), [5, 0])
+        membership = GroupStudent.objects.get(student=self.students[0])
+        membership.is_active = False
+        membership.save()
+        self.assertEqual(self.counts(), [4, 0])
+        membership.is_active = True
+        membership.group = self.other
+        membership.save()
+        self.assertEqual(self.counts(), [4, 1])
+        membership.delete()
+        self.assertEqual(self.counts(), [4, 0])
+
+    def test_cascade_delete_refreshes_counts(self):
+        self.students[1].delete()
+        self.assertEqual(self.counts(), [4, 0])
+        self.group.delete()
+        self.assertEqual(Group.objects.get(pk=self.other.pk).active_student_count, 0)
+
+    def test_api_moves_student_between_groups(self):
+        self.client.login(username='admin', password=self.password)
+        response = self.client.post(
+            '/api/trainings/group-students/', {'group': self.other.pk, 'student': self.students[0].pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(), [4, 1])
+
+        membership = GroupStudent.objects.get(group=self.group, student=self.students[0])
+        response = self.client.patch(
+            f'/api/trainings/group-students/{membership.pk}/', {'is_active': True}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(), [5, 0])
+
+        response = self.client.delete(f'/api/trainings/group-students/{membership.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counts(), [4, 0])
+
+
+class AttendanceBulkTests(ApiTestCase):
+    url = '/api/trainings/attendances/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        self.training = Training.objects.create(
+            group=self.group, date=day(4), time_start=datetime.time(18), time_end=datetime.time(19)
+        )
+
+    def records(self, students):
+        return [{'student': student.pk, 'present': index % 2 == 0, 'notes': f'заметка {index}'}
+                for index, student in enumerate(students)]
+
+    def post(self, records):
+        return self.client.post(self.url, {'training': self.training.pk, 'records': records}, format='json')
+
+    def test_upsert_roster(self):
+        Attendance.objects.create(training=self.training, student=self.students[0], present=False)
+        response = self.post(self.records(self.students))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+        attendances = Attendance.objects.filter(training=self.training)
+        self.assertEqual(attendances.count(), 5)
+        self.assertEqual(attendances.filter(present=True).count(), 3)
+        self.assertEqual(attendances.get(student=self.students[0]).notes, 'заметка 0')
+
+    def test_query_count_does_not_grow_with_roster(self):
+        # Первый запрос прогревает сессию и пользователя
+        self.post(self.records(self.students[:1]))
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.post(self.records(self.students[:2])).status_code, 200)
+        for index in range(5, 15):
+            student = self.create_user(f'student{index}', is_student=True)
+            GroupStudent.objects.create(group=self.group, student=student)
+        students = list(User.objects.filter(training_groups__group=self.group))
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.post(self.records(students)).status_code, 200)
+        self.assertEqual(len(large), len(small))
+
+    def test_invalid_rosters(self):
+        records = self.records(self.students)
+        self.assertEqual(self.post(records + records[:1]).status_code, 400)
+        self.assertEqual(self.post([{'student': 9999}]).status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_students_outside_group_are_rejected_per_record(self):
+        outsider = self.create_user('outsider', is_student=True)
+        response = self.post([{'student': self.students[0].pk}, {'student': outsider.pk}])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['records']
+        self.assertEqual(errors[0], {})
+        self.assertIn('student', errors[1])
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_former_member_can_still_be_marked(self):
+        GroupStudent.objects.filter(student=self.students[4]).update(is_active=False)
+        self.assertEqual(self.post([{'student': self.students[4].pk}]).status_code, 200)
+
+    def test_other_coach_is_forbidden(self):
+        other = self.create_user('other', is_coach=True)
+        response = self.client_for(other).post(
+            self.url, {'training': self.training.pk, 'records': self.records(self.students)}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkCreateTrainingTests(ApiTestCase):
+    url = '/api/trainings/trainings/bulk_create/'
+
+    def post(self, dates, **extra):
+        return self.client.post(self.url, {
+            'group': self.group.pk, 'time_start': '10:00', 'time_end': '11:30', 'dates': dates, **extra,
+        }, format='json')
+
+    def test_creates_missing_dates_and_reports_the_rest(self):
+        Training.objects.create(group=self.group, date=day(2), time_start=datetime.time(10), time_end=datetime.time(11))
+        dates = [day(offset).isoformat() for offset in range(20)]
+        response = self.post(dates + ['31.01.2026', dates[0]], topic='Кихон')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['created'], 19)
+        self.assertEqual(len(body['errors']), 3)
+        self.assertEqual(body['trainings'][0]['coach_name'], 'Олег Тренеров')
+        self.assertEqual(Training.objects.filter(group=self.group, topic='Кихон').count(), 19)
+
+    def test_query_count_does_not_grow_with_dates(self):
+        self.post([day(0).isoformat()])
+        with CaptureQueriesContext(connection) as few:
+            self.post([day(offset).isoformat() for offset in range(1, 4)])
+        with CaptureQueriesContext(connection) as many:
+            self.post([day(offset).isoformat() for offset in range(10, 110)])
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(Training.objects.count(), 104)
+
+    def test_database_rejects_duplicate_slot(self):
+        Training.objects.create(group=self.group, date=day(0), time_start=datetime.time(10), time_end=datetime.time(11))
+        with self.assertRaises(IntegrityError):
+            Training.objects.bulk_create([
+                Training(group=self.group, gym=self.gym, date=day(0), time_start=datetime.time(10),
+                         time_end=datetime.time(12)),
+            ])
+
+
+class ScheduleTests(ApiTestCase):
+    list_url = '/api/trainings/trainings/?date_after=2026-01-01&date_before=2026-03-31'
+
+    def setUp(self):
+        super().setUp()
+        # Понедельники с 5 января: 13 занятий до конца марта
+        self.schedule = TrainingSchedule.objects.create(
+            group=self.group, weekday=0, time_start=datetime.time(18), time_end=datetime.time(19, 30),
+            valid_from=day(0), topic='Ката'
+        )
+        Training.objects.create(
+            group=self.group, date=day(4), time_start=datetime.time(18), time_end=datetime.time(19, 30), topic='Разминка'
+        )
+
+    def occurrence(self, date):
+        return f'{self.schedule.pk}:{date.isoformat()}'
+
+    def test_list_merges_saved_and_virtual_trainings(self):
+        data = self.client.get(self.list_url).json()
+        self.assertEqual(len(data), 13)
+        self.assertEqual(data[0]['topic'], 'Разминка')
+        self.assertFalse(data[0]['is_virtual'])
+        self.assertTrue(data[1]['is_virtual'])
+        self.assertEqual(data[1]['occurrence'], self.occurrence(day(11)))
+        self.assertEqual(data[1]['topic'], 'Ката')
+        self.assertEqual(Training.objects.count(), 1)
+
+    def test_writes_materialize_occurrence(self):
+        response = self.client.post('/api/trainings/attendances/bulk/', {
+            'occurrence': self.occurrence(day(11)), 'records': [{'student': self.students[0].pk}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/trainings/homeworks/', {
+            'occurrence': self.occurrence(day(18)), 'student': self.students[0].pk,
+            'task': 'Повторить ката', 'deadline': '2026-02-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/trainings/trainings/materialize/', {
+            'occurrence': self.occurrence(day(18)), 'topic': 'Кумитэ',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['topic'], 'Кумитэ')
+        self.assertEqual(Training.objects.count(), 3)
+        self.assertEqual(len(self.client.get(self.list_url).json()), 13)
+
+    def test_failed_write_does_not_materialize(self):
+        response = self.client.post('/api/trainings/attendances/bulk/', {
+            'occurrence': self.occurrence(day(11)), 'records': [{'student': 9999}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/trainings/homeworks/', {
+            'occurrence': self.occurrence(day(18)), 'student': self.students[0].pk, 'deadline': '2026-02-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Training.objects.count(), 1)
+
+    def test_invalid_occurrence(self):
+        for occurrence in (self.occurrence(day(19)), f'{self.schedule.pk}:2025-12-29', 'мусор'):
+            with self.subTest(occurrence=occurrence):
+                response = self.client.post(
+                    '/api/trainings/trainings/materialize/', {'occurrence': occurrence}, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Training.objects.count(), 1)
+
+
+class AttendanceStatTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainings = [
+            Training.objects.create(group=self.group, date=day(offset), time_start=datetime.time(18),
+                                    time_end=datetime.time(19))
+            for offset in (4, 11)
+        ]
+        records = [{'student': student.pk, 'present': index < 3} for index, student in enumerate(self.students)]
+        for training in self.trainings:
+            self.client.post('/api/trainings/attendances/bulk/', {'training': training.pk, 'records': records},
+                             format='json')
+
+    def stat(self, student, month=datetime.date(2026, 1, 1)):
+        stat = AttendanceStat.objects.filter(student=student, group=self.group, month=month).first()
+        return (stat.present, stat.total) if stat else None
+
+    def snapshot(self):
+        return sorted(AttendanceStat.objects.values_list('student', 'group', 'month', 'present', 'total'))
+
+    def test_bulk_marks_are_counted(self):
+        self.assertEqual(self.stat(self.students[0]), (2, 2))
+        self.assertEqual(self.stat(self.students[4]), (0, 2))
+
+    def test_update_and_delete_adjust_counts(self):
+        attendance = Attendance.objects.get(training=self.trainings[0], student=self.students[0])
+        response = self.client.patch(f'/api/trainings/attendances/{attendance.pk}/', {'present': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stat(self.students[0]), (1, 2))
+        self.client.delete(f'/api/trainings/attendances/{attendance.pk}/')
+        self.assertEqual(self.stat(self.students[0]), (1, 1))
+
+    def test_training_move_and_delete_move_counts(self):
+        url = f'/api/trainings/trainings/{self.trainings[1].pk}/'
+        self.assertEqual(self.client.patch(url, {'date': '2026-02-02'}, format='json').status_code, 200)
+        self.assertEqual(self.stat(self.students[1]), (1, 1))
+        self.assertEqual(self.stat(self.students[1], datetime.date(2026, 2, 1)), (1, 1))
+        self.client.delete(url)
+        self.assertFalse(AttendanceStat.objects.filter(month=datetime.date(2026, 2, 1)).exists())
+
+    def test_rebuild_matches_incremental_counts(self):
+        expected = self.snapshot()
+        AttendanceStat.objects.all().delete()
+        call_command('rebuild_attendance_stats', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_rebuild_repairs_bypassed_writes(self):
+        Attendance.objects.filter(student=self.students[2]).update(present=False)
+        self.assertEqual(self.stat(self.students[2]), (2, 2))
+        call_command('rebuild_attendance_stats', stdout=io.StringIO())
+        self.assertEqual(self.stat(self.students[2]), (0, 2))
+
+    def test_summary(self):
+        response = self.client.get('/api/trainings/attendance-stats/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{
+            'group': self.group.pk, 'group_name': 'Младшая', 'month': '2026-01-01',
+            'present': 6, 'total': 10, 'rate': 0.6,
+        }])
+
+
+class HotQueryBenchmarkTests(ApiTestCase):
+    def test_benchmark_runs_and_rolls_back(self):
+        before = (User.objects.count(), Training.objects.count(), Attendance.objects.count())
+        out = io.StringIO()
+        call_command('benchmark_hot_queries', students=30, groups=2, trainings_per_group=5, repeat=1,
+                     no_plans=True, force=True, stdout=out)
+        self.assertIn('с индексами', out.getvalue())
+        self.assertEqual((User.objects.count(), Training.objects.count(), Attendance.objects.count()), before)
+        # Индексы, снятые на время замера, возвращены на место
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Training._meta.db_table)
+        self.assertLessEqual({index.name for index in Training._meta.indexes}, set(constraints))
+
+    def test_refuses_without_debug_or_force(self):
+        with self.assertRaisesMessage(CommandError, '--force'):
+            call_command('benchmark_hot_queries', stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+
+
+class AttendanceExportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        trainings = [
+            Training.objects.create(group=self.group, date=day(offset), time_start=datetime.time(10),
+                                    time_end=datetime.time(11))
+            for offset in range(3)
+        ]
+        Attendance.objects.create(training=trainings[0], student=self.students[1], present=True)
+        Attendance.objects.create(training=trainings[1], student=self.students[1], present=False)
+        Attendance.objects.create(training=trainings[2], student=self.students[3], present=True)
+        # Ученик ушёл из группы, но его отметки остаются в журнале
+        former = self.create_user('former', first_name='Пётр', last_name='Ушедший')
+        Attendance.objects.create(training=trainings[2], student=former, present=True)
+        self.url = f'/api/trainings/attendances/export/?group={self.group.pk}&date_after=2026-01-01&date_before=2026-01-31'
+
+    def test_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(text), delimiter=';'))
+        self.assertEqual(rows, [
+            ['Ученик', '01.01.2026', '02.01.2026', '03.01.2026', 'Присутствовал', 'Всего отметок'],
+            ['Петров Иван0', '', '', '', '0', '0'],
+            ['Петров Иван1', '+', 'н', '', '1', '2'],
+            ['Петров Иван2', '', '', '', '0', '0'],
+            ['Петров Иван3', '', '', '+', '1', '1'],
+            ['Петров Иван4', '', '', '', '0', '0'],
+            ['Ушедший Пётр', '', '', '+', '1', '1'],
+        ])
+
+    def test_orphan_mark_does_not_stall_merge(self):
+        # Отметка ученика, которого нет в потоке учеников (членство изменилось во время выгрузки)
+        students = iter([(1, 'Алексеев', 'Иван', ''), (3, 'Яковлев', 'Пётр', '')])
+        marks = iter([(1, 10, True), (2, 10, True), (2, 11, False), (3, 11, True)])
+        rows = list(merge_marks(students, marks, {10: 0, 11: 1}, student_ids={1, 3}))
+        self.assertEqual(rows, [['Алексеев Иван', '+', '', 1, 1], ['Яковлев Пётр', '', '+', 1, 1]])
+
+    def test_xlsx(self):
+        response = self.client.get(self.url + '&file_format=xlsx')
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertIn('Ушедший Пётр', archive.read('xl/worksheets/sheet1.xml').decode())
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url + '&file_format=pdf').status_code, 400)
+        base = f'/api/trainings/attendances/export/?group={self.group.pk}'
+        self.assertEqual(self.client.get(base + '&date_after=2026-02-01&date_before=2026-01-01').status_code, 400)
+        self.assertEqual(self.client.get(base).status_code, 400)
+        self.assertEqual(self.client_for(self.students[0]).get(self.url).status_code, 403)
+
+
+class SparseFieldsetTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.coach)
+        for offset in range(3):
+            self.training = Training.objects.create(
+                group=self.group, date=day(offset), time_start=datetime.time(10), time_end=datetime.time(11)
+            )
+            Homework.objects.create(training=self.training, student=self.students[0], task='Ката', deadline=day(7))
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def training_select(self, queries):
+        return [sql for sql in queries if 'FROM "trainings_training"' in sql][-1]
+
+    def test_fields_prune_joins(self):
+        data, queries = self.get('/api/trainings/trainings/?fields=id,date')
+        self.assertEqual(set(data[0]), {'id', 'date'})
+        self.assertNotIn('JOIN', self.training_select(queries))
+        data, queries = self.get('/api/trainings/trainings/?fields=id,coach_name')
+        self.assertEqual(data[0]['coach_name'], 'Олег Тренеров')
+        self.assertNotIn('trainings_gym', self.training_select(queries))
+
+    def test_omit_and_retrieve(self):
+        data, _ = self.get('/api/trainings/trainings/?omit=gym_address,coach_name,topic')
+        self.assertNotIn('topic', data[0])
+        self.assertIn('gym_name', data[0])
+        data, _ = self.get(f'/api/trainings/trainings/{self.training.pk}/?fields=id,group_name')
+        self.assertEqual(data, {'id': self.training.pk, 'group_name': 'Младшая'})
+
+    def test_related_fields_do_not_add_queries(self):
+        data, queries = self.get('/api/trainings/homeworks/?fields=id,training_date,student_name')
+        self.assertEqual(len(data), 3)
+        self.assertEqual(len(queries), len(self.get('/api/trainings/homeworks/?fields=id')[1]))
+        data, _ = self.get('/api/trainings/groups/?fields=id,name,student_count')
+        self.assertEqual(data[0], {'id': self.group.pk, 'name': 'Младшая', 'student_count': 5})
+        data, _ = self.get('/api/trainings/group-students/?fields=student_name')
+        self.assertEqual(data[0], {'student_name': 'Иван0 Петров'})
+
+    def test_write_response_is_sparse(self):
+        response = self.client.patch(
+            f'/api/trainings/trainings/{self.training.pk}/?fields=id,topic', {'topic': 'Кумитэ'}, format='json'
+        )
+        self.assertEqual(response.json(), {'id': self.training.pk, 'topic': 'Кумитэ'})
+
+    def test_user_and_profile_fields(self):
+        data, _ = self.get('/api/auth/users/?fields=id,last_name,age,avatar_variants')
+        self.assertEqual(set(data['results'][0]), {'id', 'last_name', 'age', 'avatar_variants'})
+        data, _ = self.get('/api/auth/profiles/?fields=id,user,grade')
+        self.assertEqual(set(data[0]), {'id', 'user', 'grade'})
+        self.assertIn('username', data[0]['user'])
+        data, _ = self.get('/api/auth/users/me/?fields=id')
+        self.assertEqual(data, {'id': self.coach.pk})
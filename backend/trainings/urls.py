@@ -1,16 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    GymViewSet, GroupViewSet, TrainingViewSet, 
-    HomeworkViewSet, AttendanceViewSet, GroupStudentViewSet
+    GymViewSet, GroupViewSet, TrainingViewSet, TrainingScheduleViewSet,
+    HomeworkViewSet, AttendanceViewSet, AttendanceStatViewSet, GroupStudentViewSet
 )
 
 router = DefaultRouter()
 router.register('gyms', GymViewSet)
 router.register('groups', GroupViewSet)
 router.register('trainings', TrainingViewSet)
+router.register('schedules', TrainingScheduleViewSet)
 router.register('homeworks', HomeworkViewSet)
 router.register('attendances', AttendanceViewSet)
+router.register('attendance-stats', AttendanceStatViewSet)
 router.register('group-students', GroupStudentViewSet, basename='groupstudent')
 
 urlpatterns = [
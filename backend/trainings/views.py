@@ -1,17 +1,73 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import datetime, time as dt_time
-from .models import Gym, Group, Training, Homework, Attendance, GroupStudent
+from .models import (
+    Gym, Group, Training, TrainingSchedule, Homework, Attendance, AttendanceStat, GroupStudent, memberships_changed
+)
 from .serializers import (
-    GymSerializer, GroupSerializer, TrainingSerializer, 
-    HomeworkSerializer, AttendanceSerializer, GroupStudentSerializer
+    GymSerializer, GroupSerializer, TrainingSerializer, TrainingScheduleSerializer,
+    HomeworkSerializer, AttendanceSerializer, AttendanceBulkSerializer, AttendanceStatSerializer,
+    GroupStudentSerializer
+)
+from .services import (
+    insert_trainings, find_gym_conflicts, expand_schedules, resolve_occurrence, materialize_occurrence,
+    attendance_stat_key, training_stat_keys, refresh_attendance_stats, unassigned_students
 )
+from .exports import attendance_matrix_rows, stream_csv
 from accounts.permissions import IsCoachOrAdmin
+from accounts.search import UserSearchFilter
+from accounts.serializers import UserSerializer
+from accounts.views import UserPageNumberPagination
+from config.fieldsets import SparseFieldsetViewMixin
+from config.query_budget import QueryBudgetMixin
+from config.xlsx import CONTENT_TYPE as XLSX_CONTENT_TYPE, stream_xlsx
+
+# Максимальное окно, на которое список тренировок разворачивает расписания
+MAX_SCHEDULE_WINDOW_DAYS = 731
+
+
+def _materialize_for_user(user, occurrence, topic=None):
+    """Сохраняет занятие из расписания в Training (только тренер группы или админ)."""
+    try:
+        schedule, day = resolve_occurrence(occurrence)
+        if not user.is_staff and not (user.is_coach and schedule.group.coach_id == user.id):
+            raise PermissionDenied('Можно изменять занятия только своих групп.')
+        return materialize_occurrence(schedule, day, topic)
+    except ValueError as exc:
+        raise ValidationError({'occurrence': str(exc)})
+
+
+def _data_with_training(request):
+    """Если вместо training передан occurrence (занятие из расписания), подставляет сохранённую тренировку."""
+    data = request.data
+    occurrence = data.get('occurrence')
+    if not occurrence or data.get('training'):
+        return data
+    training = _materialize_for_user(request.user, occurrence)
+    data = data.copy()
+    data['training'] = training.pk
+    return data
 
-class GymViewSet(viewsets.ModelViewSet):
+
+class OccurrenceCreateMixin:
+    """create(), принимающий occurrence вместо training."""
+    def create(self, request, *args, **kwargs):
+        # Занятие сохраняется в Training только вместе с записью: при ошибке валидации — откат
+        with transaction.atomic():
+            serializer = self.get_serializer(data=_data_with_training(request))
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+class GymViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Gym.objects.all()
     serializer_class = GymSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -22,24 +78,48 @@ class GymViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return [permissions.IsAdminUser()]
 
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['coach', 'gym']
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = {
+        'coach': ['exact'],
+        'gym': ['exact'],
+        'active_student_count': ['exact', 'gte', 'lte'],
+    }
     search_fields = ['name']
+    ordering_fields = ['name', 'active_student_count']
+    keyset_ordering = ['name', 'pk']
     
     def get_queryset(self):
         user = self.request.user
         is_coach = user.is_coach or user.is_staff
+        queryset = Group.objects.select_related('coach', 'gym').annotate(
+            annotated_student_count=Group.active_students_subquery()
+        )
         if user.is_student and not is_coach:
-            return Group.objects.filter(students__student=user, students__is_active=True).distinct()
+            return queryset.filter(students__student=user, students__is_active=True).distinct()
         elif is_coach and not user.is_staff:
-            return Group.objects.filter(coach=user)
-        return Group.objects.all()
+            return queryset.filter(coach=user)
+        return queryset
 
-class TrainingViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], pagination_class=UserPageNumberPagination)
+    def candidates(self, request, pk=None):
+        """Кого можно добавить в группу: ученики без активной группы, подходящие по возрасту (?search=, count)."""
+        group = self.get_object()
+        user = request.user
+        if not (user.is_staff or group.coach_id == user.id):
+            return Response(
+                {'detail': 'Добавлять учеников может только тренер группы или администратор.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        queryset = UserSearchFilter().filter_queryset(request, unassigned_students(group), self)
+        page = self.paginate_queryset(queryset)
+        serializer = UserSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+class TrainingViewSet(SparseFieldsetViewMixin, QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = Training.objects.all()
     serializer_class = TrainingSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -47,12 +127,18 @@ class TrainingViewSet(viewsets.ModelViewSet):
     filterset_fields = ['group', 'date']
     ordering_fields = ['date', 'time_start']
     ordering = ['date', 'time_start']
+    keyset_ordering = ['date', 'time_start', 'pk']
+    # Сессия + пользователь + сами тренировки (группа, тренер и зал — одним JOIN)
+    # + расписания групп, если запрошено окно дат
+    query_budget = {'list': 4, 'retrieve': 3}
+    # list() с окном дат сверяет тренировки с расписаниями и сортирует их
+    sparse_dependencies = ('group', 'date', 'time_start')
     
     def get_queryset(self):
         user = self.request.user
         is_coach = user.is_coach or user.is_staff
         
-        queryset = Training.objects.all()
+        queryset = Training.objects.select_related('group__coach', 'group__gym')
         
         date_after = self.request.query_params.get('date_after')
         date_before = self.request.query_params.get('date_before')
@@ -79,6 +165,81 @@ class TrainingViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old = serializer.instance
+        moved = {
+            name for name in ('group', 'date')
+            if name in serializer.validated_data and serializer.validated_data[name] != getattr(old, name)
+        }
+        keys = training_stat_keys(old) if moved else set()
+        instance = serializer.save()
+        if moved:
+            refresh_attendance_stats(keys | training_stat_keys(instance))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        keys = training_stat_keys(instance)
+        instance.delete()
+        refresh_attendance_stats(keys)
+
+    def _schedule_window(self):
+        """Окно (date_after, date_before), на которое нужно развернуть расписания, или None."""
+        params = self.request.query_params
+        try:
+            date_from = datetime.strptime(params['date_after'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(params['date_before'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return None
+        if (date_to - date_from).days > MAX_SCHEDULE_WINDOW_DAYS:
+            raise ValidationError({'date_before': f'Окно дат не должно превышать {MAX_SCHEDULE_WINDOW_DAYS} дней.'})
+        return date_from, date_to
+
+    def _visible_schedules(self):
+        user = self.request.user
+        is_coach = user.is_coach or user.is_staff
+        schedules = TrainingSchedule.objects.select_related('group__coach', 'group__gym')
+        group_filter = self.request.query_params.get('group')
+        if group_filter:
+            schedules = schedules.filter(group_id=group_filter)
+        if user.is_student and not is_coach:
+            schedules = schedules.filter(
+                group__students__student=user,
+                group__students__is_active=True
+            ).distinct()
+        elif is_coach and not user.is_staff and group_filter:
+            schedules = schedules.filter(group__coach=user)
+        return schedules
+
+    def list(self, request, *args, **kwargs):
+        window = self._schedule_window()
+        if window is None:
+            return super().list(request, *args, **kwargs)
+
+        # Сохранённые тренировки + занятия из расписаний, развёрнутые на запрошенное окно.
+        # Окно ограничено MAX_SCHEDULE_WINDOW_DAYS, поэтому ответ не пагинируется.
+        trainings = list(self.filter_queryset(self.get_queryset()))
+        virtual = expand_schedules(self._visible_schedules(), *window, existing=trainings)
+        items = sorted(
+            trainings + virtual,
+            key=lambda t: (t.date, t.time_start),
+            reverse=request.query_params.get('ordering', '').startswith('-'),
+        )
+        return Response(self.get_serializer(items, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def materialize(self, request):
+        """Сохраняет занятие из расписания как тренировку: occurrence, topic?."""
+        occurrence = request.data.get('occurrence')
+        if not occurrence:
+            return Response(
+                {'detail': 'Укажите занятие (occurrence).'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        topic = request.data.get('topic')
+        training = _materialize_for_user(request.user, occurrence, topic.strip() if topic is not None else None)
+        return Response(self.get_serializer(training).data, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """Создание тренировок на несколько дат: group, time_start, time_end, topic?, dates[]."""
@@ -103,7 +264,7 @@ class TrainingViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            group = Group.objects.get(pk=group_id)
+            group = Group.objects.select_related('coach', 'gym').get(pk=group_id)
         except Group.DoesNotExist:
             return Response(
                 {'detail': 'Группа не найдена.'},
@@ -132,10 +293,10 @@ class TrainingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        created = []
         errors = []
-
-        for i, d in enumerate(dates):
+        parsed_dates = []
+        seen = set()
+        for d in dates:
             if isinstance(d, str):
                 try:
                     dt = datetime.strptime(d, '%Y-%m-%d').date()
@@ -145,27 +306,62 @@ class TrainingViewSet(viewsets.ModelViewSet):
             else:
                 errors.append(f'Ожидается строка даты, получено: {d}')
                 continue
-
-            if Training.objects.filter(group=group, date=dt, time_start=time_start_obj).exists():
-                errors.append(f'Тренировка уже есть: {d}')
+            if dt in seen:
+                errors.append(f'Дата указана несколько раз: {d}')
                 continue
+            seen.add(dt)
+            parsed_dates.append(dt)
 
-            training = Training.objects.create(
-                group=group,
-                date=dt,
-                time_start=time_start_obj,
-                time_end=time_end_obj,
-                topic=topic,
-            )
-            created.append(TrainingSerializer(training).data)
+        # Часы работы зала и пересечения с другими группами — одним запросом на весь сезон
+        conflicts = find_gym_conflicts(group, [(d, time_start_obj, time_end_obj) for d in parsed_dates])
+        errors.extend(error for error in conflicts if error)
+        free_dates = [d for d, error in zip(parsed_dates, conflicts) if not error]
+
+        created, rejected = insert_trainings(group, free_dates, time_start_obj, time_end_obj, topic)
+        errors.extend(f'Тренировка уже есть или время занято: {d.isoformat()}' for d in rejected)
 
         return Response({
             'created': len(created),
-            'trainings': created,
+            'trainings': TrainingSerializer(created, many=True).data,
             'errors': errors if errors else None,
         }, status=status.HTTP_201_CREATED)
 
-class HomeworkViewSet(viewsets.ModelViewSet):
+class TrainingScheduleViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = TrainingSchedule.objects.all()
+    serializer_class = TrainingScheduleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['group', 'weekday']
+
+    def get_permissions(self):
+        if self.action in ('list', 'retrieve'):
+            return [permissions.IsAuthenticated()]
+        return [IsCoachOrAdmin()]
+
+    def get_queryset(self):
+        user = self.request.user
+        is_coach = user.is_coach or user.is_staff
+        queryset = TrainingSchedule.objects.select_related('group')
+        if user.is_student and not is_coach:
+            return queryset.filter(group__students__student=user, group__students__is_active=True).distinct()
+        elif is_coach and not user.is_staff:
+            return queryset.filter(group__coach=user)
+        return queryset
+
+    def _check_group(self, group):
+        user = self.request.user
+        if not user.is_staff and group.coach_id != user.id:
+            raise PermissionDenied('Можно задавать расписание только своим группам.')
+
+    def perform_create(self, serializer):
+        self._check_group(serializer.validated_data['group'])
+        serializer.save()
+
+    def perform_update(self, serializer):
+        self._check_group(serializer.validated_data.get('group', serializer.instance.group))
+        serializer.save()
+
+class HomeworkViewSet(SparseFieldsetViewMixin, OccurrenceCreateMixin, viewsets.ModelViewSet):
     queryset = Homework.objects.all()
     serializer_class = HomeworkSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -173,6 +369,7 @@ class HomeworkViewSet(viewsets.ModelViewSet):
     filterset_fields = ['training', 'student', 'completed']
     ordering_fields = ['deadline', 'created_at']
     ordering = ['-created_at']
+    keyset_ordering = ['-created_at', '-pk']
     
     def get_queryset(self):
         user = self.request.user
@@ -189,7 +386,7 @@ class HomeworkViewSet(viewsets.ModelViewSet):
         response['X-Current-User-Id'] = str(request.user.id)
         return response
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(SparseFieldsetViewMixin, OccurrenceCreateMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -197,6 +394,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     filterset_fields = ['training', 'student', 'present']
     ordering_fields = ['training__date']
     ordering = ['-training__date']
+    keyset_ordering = ['-training__date', '-pk']
     
     def get_queryset(self):
         user = self.request.user
@@ -209,7 +407,162 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             )
         return Attendance.objects.all()
 
-class GroupStudentViewSet(viewsets.ModelViewSet):
+    # Каждая запись отметки сразу обновляет затронутые ячейки AttendanceStat
+    @transaction.atomic
+    def perform_create(self, serializer):
+        instance = serializer.save()
+        refresh_attendance_stats([attendance_stat_key(instance.student_id, instance.training)])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old = serializer.instance
+        keys = {attendance_stat_key(old.student_id, old.training)}
+        instance = serializer.save()
+        keys.add(attendance_stat_key(instance.student_id, instance.training))
+        refresh_attendance_stats(keys)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        key = attendance_stat_key(instance.student_id, instance.training)
+        instance.delete()
+        refresh_attendance_stats([key])
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Отметка посещаемости за тренировку: training (или occurrence), records[{student, present, notes}] — upsert одним запросом."""
+        user = request.user
+        if not (user.is_coach or user.is_staff):
+            return Response(
+                {'detail': 'Только тренер или администратор может отмечать посещаемость.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Занятие из расписания сохраняется в Training только вместе с отметками:
+        # ошибки ниже бросаются исключениями и откатывают его
+        with transaction.atomic():
+            serializer = AttendanceBulkSerializer(data=_data_with_training(request))
+            serializer.is_valid(raise_exception=True)
+            training = serializer.validated_data['training']
+            records = serializer.validated_data['records']
+
+            if not user.is_staff and training.group.coach_id != user.id:
+                raise PermissionDenied('Можно отмечать посещаемость только в своих группах.')
+
+            rows = [
+                Attendance(
+                    training=training,
+                    student_id=record['student'],
+                    present=record['present'],
+                    notes=record['notes'],
+                )
+                for record in records
+            ]
+            Attendance.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['training', 'student'],
+                update_fields=['present', 'notes'],
+            )
+            refresh_attendance_stats(attendance_stat_key(row.student_id, training) for row in rows)
+
+        saved = Attendance.objects.filter(
+            training=training,
+            student_id__in=[record['student'] for record in records],
+        ).select_related('training', 'student')
+        return Response(
+            AttendanceSerializer(saved, many=True, context=self.get_serializer_context()).data,
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Журнал группы за период потоком: ?group=&date_after=&date_before=&file_format=csv|xlsx.
+        Файл отдаётся построчно (StreamingHttpResponse), память не зависит от длины периода.
+        """
+        params = request.query_params
+        file_format = params.get('file_format', 'csv')
+        if file_format not in ('csv', 'xlsx'):
+            return Response({'detail': 'Формат должен быть csv или xlsx.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            date_from = datetime.strptime(params['date_after'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(params['date_before'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Укажите период: date_after и date_before в формате YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if date_from > date_to:
+            return Response({'detail': 'date_after не может быть позже date_before.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_id = params.get('group', '')
+        group = Group.objects.filter(pk=group_id).first() if group_id.isdigit() else None
+        if group is None:
+            return Response({'detail': 'Группа не найдена.'}, status=status.HTTP_404_NOT_FOUND)
+        user = request.user
+        if not (user.is_staff or (user.is_coach and group.coach_id == user.id)):
+            return Response(
+                {'detail': 'Выгружать журнал может только тренер группы или администратор.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        rows = attendance_matrix_rows(group, date_from, date_to)
+        if file_format == 'xlsx':
+            response = StreamingHttpResponse(stream_xlsx(rows, title=group.name), content_type=XLSX_CONTENT_TYPE)
+        else:
+            response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="attendance_{group.pk}_{date_from:%Y%m%d}_{date_to:%Y%m%d}.{file_format}"'
+        )
+        return response
+
+class AttendanceStatViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """Статистика посещаемости из сводной таблицы AttendanceStat (без сканирования Attendance)."""
+    queryset = AttendanceStat.objects.all()
+    serializer_class = AttendanceStatSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {
+        'group': ['exact'],
+        'student': ['exact'],
+        'month': ['exact', 'gte', 'lte'],
+    }
+    ordering_fields = ['month', 'present', 'total']
+    ordering = ['-month']
+    keyset_ordering = ['-month', '-pk']
+
+    def get_queryset(self):
+        user = self.request.user
+        is_coach = user.is_coach or user.is_staff
+        queryset = AttendanceStat.objects.select_related('student', 'group')
+        if user.is_student and not is_coach:
+            return queryset.filter(student=user)
+        elif is_coach and not user.is_staff:
+            return queryset.filter(group__coach=user)
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Итоги по группам и месяцам: present, total, rate."""
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .values('group', 'group__name', 'month')
+            .annotate(present_sum=Sum('present'), total_sum=Sum('total'))
+            .order_by('-month', 'group__name')
+        )
+        return Response([
+            {
+                'group': row['group'],
+                'group_name': row['group__name'],
+                'month': row['month'],
+                'present': row['present_sum'],
+                'total': row['total_sum'],
+                'rate': round(row['present_sum'] / row['total_sum'], 4) if row['total_sum'] else None,
+            }
+            for row in rows
+        ])
+
+class GroupStudentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = GroupStudent.objects.all()
     serializer_class = GroupStudentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -240,28 +593,43 @@ class GroupStudentViewSet(viewsets.ModelViewSet):
                 {'detail': 'Укажите группу и ученика.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        # Ученик может быть только в одной группе: снимаем с других групп
-        GroupStudent.objects.filter(student_id=student_id).exclude(group_id=group_id).update(is_active=False)
-
-        existing = GroupStudent.objects.filter(
-            group_id=group_id,
-            student_id=student_id
-        ).first()
-
-        if existing:
-            existing.is_active = True
-            existing.save()
-            serializer = self.get_serializer(existing)
-            from rest_framework.response import Response
-            from rest_framework import status
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        with transaction.atomic():
+            # Ученик может быть только в одной группе: снимаем с других групп
+            other_memberships = GroupStudent.objects.filter(
+                student_id=student_id, is_active=True
+            ).exclude(group_id=group_id)
+            affected_groups = set(other_memberships.values_list('group_id', flat=True))
+            other_memberships.update(is_active=False)
+            Group.refresh_student_counts(affected_groups)
+            memberships_changed.send(sender=GroupStudent, student_ids=[student_id])
+
+            # Счётчик группы самого членства пересчитывается сигналом post_save
+            existing = GroupStudent.objects.filter(
+                group_id=group_id,
+                student_id=student_id
+            ).first()
+
+            if existing:
+                existing.is_active = True
+                existing.save()
+                serializer = self.get_serializer(existing)
+                from rest_framework.response import Response
+                from rest_framework import status
+                return Response(serializer.data, status=status.HTTP_200_OK)
 
-        return super().create(request, *args, **kwargs)
+            return super().create(request, *args, **kwargs)
 
+    @transaction.atomic
     def perform_update(self, serializer):
         instance = serializer.save()
         if instance.is_active:
-            GroupStudent.objects.filter(student_id=instance.student_id).exclude(pk=instance.pk).update(is_active=False)
+            other_memberships = GroupStudent.objects.filter(
+                student_id=instance.student_id, is_active=True
+            ).exclude(pk=instance.pk)
+            affected_groups = set(other_memberships.values_list('group_id', flat=True))
+            other_memberships.update(is_active=False)
+            Group.refresh_student_counts(affected_groups)
+            memberships_changed.send(sender=GroupStudent, student_ids=[instance.student_id])
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()